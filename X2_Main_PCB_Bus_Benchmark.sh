@@ -0,0 +1,5 @@
+#!/bin/bash
+# launcher.sh
+
+sudo python3 /home/pi/Documents/GitHub/X2Tester/x2MainPCBTester.py -bench Telemetry -count 1000
+
@@ -0,0 +1,5 @@
+#The tester's modules sit in the repo root rather than in a package, so put it on the path
+import os
+import sys
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,191 @@
+#Unit tests for the Modbus helpers in x2MainPCBTester.py, run against the simulated X2 in this process
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import x2MainPCBTester as Tester
+import x2mbAsync as MbAsync
+import x2mbPrefetch as Prefetch
+import x2mbRegisters as Reg
+import x2mbSimulator as Sim
+import x2mbTransport as Mb
+
+folder=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Sends requests straight to a powered simulated X2 and keeps them so they can be checked
+class SimulatorBus:
+    def __init__(self,writeRead=True):
+        board=Sim.X2Board(random.Random(0))
+        board.bootTime=0
+        board.setInput("IO1",1)
+        self.simulator=Sim.Simulator(board,Sim.TNode(),19200,0,0,writeRead)
+        self.requests=[]
+        self.serial=None #Only answered through transact
+
+    def transact(self,request,responseLength,timeout):
+        self.requests.append(bytes(request))
+        [response,delay]=self.simulator.respond(bytes(request))
+        return Mb.checkResponse(request,response or b"",responseLength)
+
+    def close(self):
+        self.simulator.close()
+
+class WriteReadTest(unittest.TestCase):
+    def device(self,writeRead):
+        bus=SimulatorBus(writeRead)
+        self.addCleanup(bus.close)
+        return Mb.MbDevice(bus,Sim.universalAddress)
+
+    def testWriteAndReadInOneRequest(self):
+        device=self.device(True)
+        result=Tester.mbWriteReadRetries(device,Reg.mbReg["33SEPIC_OF"][0],[1],["VCC33_V"],retries=2)
+        self.assertEqual(result[0],[1])
+        self.assertAlmostEqual(result[1]["VCC33_V"],3.3,places=1) #Read after the rail was switched on
+        self.assertEqual([request[1] for request in device.bus.requests],[Mb.FC_READ_WRITE])
+        self.assertTrue(device.writeRead)
+
+    def testFirmwareWithoutItGetsTwoRequests(self):
+        device=self.device(False)
+        result=Tester.mbWriteReadRetries(device,Reg.mbReg["33SEPIC_OF"][0],[1],["VCC33_V"],retries=2)
+        self.assertAlmostEqual(result[1]["VCC33_V"],3.3,places=1)
+        self.assertEqual([request[1] for request in device.bus.requests],
+                         [Mb.FC_READ_WRITE,Mb.FC_WRITE_MULTIPLE,Mb.FC_READ_INPUT]) #The illegal function isn't retried
+        self.assertFalse(device.writeRead)
+        device.bus.requests=[]
+        Tester.mbWriteReadRetries(device,Reg.mbReg["33SEPIC_OF"][0],[0],["VCC33_V"],retries=2)
+        self.assertEqual([request[1] for request in device.bus.requests],[Mb.FC_WRITE_MULTIPLE,Mb.FC_READ_INPUT])
+
+    def testOtherExceptionsAreRetried(self):
+        device=self.device(True)
+        self.assertFalse(Tester.mbWriteReadRetries(device,Reg.telemetryStart,[1],["VCC33_V"],retries=2)) #Telemetry can't be written
+        self.assertEqual(len(device.bus.requests),2)
+        self.assertIsNone(device.writeRead)
+
+#Awaitable version of the simulated bus that lets other work run before each answer
+class SimulatorAsyncBus(MbAsync.AsyncBus):
+    async def transact(self,request,responseLength,timeout=None):
+        await asyncio.sleep(0)
+        return self.bus.transact(request,responseLength,timeout)
+
+class AsyncRetryTest(unittest.TestCase):
+    def device(self,writeRead=True):
+        bus=SimulatorBus(writeRead)
+        self.addCleanup(bus.close)
+        device=Mb.MbDevice(bus,Sim.universalAddress)
+        device.asyncBus=SimulatorAsyncBus(bus)
+        self.addCleanup(device.asyncBus.close)
+        return device
+
+    def testSameStatusBothWays(self):
+        device=self.device()
+        statuses=[Tester.checkStatus(device,2,"WiFiPwr_OF","Wi-Fi Power"),Tester.checkStatus(device,2,"RS485ComTest","RS-485")]
+        self.assertEqual([status[0] for status in statuses],[1,0])
+        self.assertEqual(device.asyncBus.run(Tester.checkStatusAsync(device,2,"WiFiPwr_OF","Wi-Fi Power"),
+                                             Tester.checkStatusAsync(device,2,"RS485ComTest","RS-485")),statuses)
+
+    def testPrefetchAnswersBothWays(self):
+        device=self.device()
+        device.cache=Prefetch.ReadCache()
+        [request,responseLength]=Mb.getReadFrame(device.address,Reg.mbReg["Add"][0],1)
+        for transactRetries in (Tester.mbTransactRetries,lambda *args: device.asyncBus.run(Tester.mbTransactRetriesAsync(*args))[0]):
+            device.cache.store(request,Mb.appendCrc(bytes([device.address,4,2,0,7])))
+            self.assertEqual(transactRetries(device,"Add",request,responseLength,2)[3:5],bytes([0,7]))
+        self.assertEqual(device.bus.requests,[])
+
+    def testIllegalFunctionIsRaisedBothWays(self):
+        device=self.device(False)
+        [request,responseLength]=Mb.getWriteReadFrame(device.address,Reg.mbReg["33SEPIC_OF"][0],[1],Reg.telemetryStart,2)
+        self.assertRaises(Mb.SlaveException,Tester.mbTransactRetries,device,"33SEPIC_OF",request,responseLength,3)
+        self.assertRaises(Mb.SlaveException,device.asyncBus.run,Tester.mbTransactRetriesAsync(device,"33SEPIC_OF",request,responseLength,3))
+        self.assertEqual(len(device.bus.requests),2) #Not retried either way
+
+#The fixture's pins with every board already powered, so powerOn has nothing to do
+class PoweredGpio:
+    HIGH=1
+    LOW=0
+
+    def input(self,pin):
+        return 1
+
+#Simulated bus with a T-Node passthrough that forwards frames at a given baud rate and can reject large reads
+class PassthroughBus(SimulatorBus):
+    def __init__(self,baud,maxRegisters=125):
+        SimulatorBus.__init__(self)
+        self.simulator.tnode.setPower(1)
+        self.simulator.tnode.readyTime=0
+        self.baud=baud
+        self.maxRegisters=maxRegisters
+
+    def transact(self,request,responseLength,timeout):
+        if(request[0]==Sim.TNode.address):
+            if(request[1]==Mb.FC_READ_INPUT and request[5]>self.maxRegisters):
+                raise Mb.SlaveException(2) #Illegal data address
+            time.sleep((len(request)+responseLength)*10.0/self.baud)
+        return SimulatorBus.transact(self,request,responseLength,timeout)
+
+class PassthroughTest(unittest.TestCase):
+    def passthrough(self,bus,baud):
+        self.addCleanup(bus.close)
+        return Tester.testRS485Passthrough(PoweredGpio(),{"IO1":0,"IO4":0},Mb.MbDevice(bus,Sim.universalAddress,0.5),2,
+                                           Mb.MbDevice(bus,Sim.TNode.address,0.5),[1,16],3,0.01,baud)
+
+    def testForwardingIsTimedAtTheBusBaudRate(self):
+        self.assertEqual(self.passthrough(PassthroughBus(9600),9600)[0],"Pass")
+        self.assertTrue(self.passthrough(PassthroughBus(9600),19200)[0].startswith("Fail-Passthrough added"))
+
+    def testRejectedReadsFailTheSize(self):
+        result=self.passthrough(PassthroughBus(19200,maxRegisters=8),19200)
+        self.assertEqual(result[0],"Fail-3 reads of 16 registers were rejected with a Modbus exception")
+        self.assertEqual(result[1],0) #Rejected reads weren't lost
+
+#Simulated bus whose reads are never answered
+class SilentReadBus(SimulatorBus):
+    def transact(self,request,responseLength,timeout):
+        if(request[1]==Mb.FC_READ_INPUT):
+            raise IOError("No communication with the instrument (no answer)")
+        return SimulatorBus.transact(self,request,responseLength,timeout)
+
+class ModuleReadTest(unittest.TestCase):
+    def device(self,bus):
+        self.addCleanup(bus.close)
+        device=Mb.MbDevice(bus,Sim.universalAddress)
+        device.switches=Mb.SwitchBank() #The shadow of the switch bank main gives the X2
+        return device
+
+    def testOnlyTheNeededRegisterIsRead(self):
+        device=self.device(SimulatorBus())
+        result=Tester.test33SEPIC(PoweredGpio(),{"IO1":0},device,2)
+        self.assertEqual(result[0],"Pass")
+        reads=[request for request in device.bus.requests if request[1]==Mb.FC_READ_INPUT]
+        self.assertEqual(reads,[Mb.getReadFrame(Sim.universalAddress,Reg.mbReg["VCC33_V"].reg,Reg.mbReg["VCC33_V"].numReg)[0]])
+
+    def testFailedSensorReadFailsEveryReading(self):
+        result=Tester.testpressTempHum(PoweredGpio(),{"IO1":0},self.device(SilentReadBus()),2)
+        self.assertEqual([result[i].split("-")[0] for i in (0,1,3,5)],["Fail"]*4)
+        self.assertEqual([result[i] for i in (2,4,6)],[-999999]*3)
+
+class CleanupTest(unittest.TestCase):
+    def setUp(self):
+        self.folder=tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree,self.folder,ignore_errors=True)
+
+    def testFailedSetupStillExits(self):
+        with socket.socket() as probe: #A loopback port nothing is listening on, like a simulator that is down
+            probe.bind(('127.0.0.1',0))
+            port=probe.getsockname()[1]
+        run=subprocess.run([sys.executable,os.path.join(folder,"x2MainPCBTester.py"),"-admin","-sim","localhost:%d" % port,
+                            "-results",self.folder+os.sep,"-desktop",self.folder+os.sep],
+                           cwd=self.folder,env=dict(os.environ,PYTHONPATH=os.pathsep.join(sys.path)),input="\n",
+                           stdout=subprocess.PIPE,stderr=subprocess.STDOUT,universal_newlines=True,timeout=60)
+        self.assertEqual(run.returncode,0,run.stdout)
+        self.assertTrue("Connection refused" in run.stdout,run.stdout) #Reported by the error handler
+        self.assertTrue("Cleaning up and exiting..." in run.stdout,run.stdout)
+
+if __name__=='__main__':
+    unittest.main()
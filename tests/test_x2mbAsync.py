@@ -0,0 +1,59 @@
+#Unit tests for x2mbAsync.py
+import asyncio
+import os
+import threading
+import tty
+import unittest
+import x2mbAsync as MbAsync
+import x2mbTransport as Mb
+from test_x2mbTransport import PtySlave,readRequest,readResponse
+
+#A blocking bus whose queue can be held by the test. It has no port since requests never get that far
+class HeldBus(Mb.BusQueue):
+    def __init__(self):
+        Mb.BusQueue.__init__(self)
+        self.serial=None
+        self.timeout=0.5
+
+@unittest.skipUnless(hasattr(os,"openpty"),"The bus test needs a pseudo-terminal")
+class AsyncBusTest(unittest.TestCase):
+    def setUp(self):
+        [self.master,slave]=os.openpty()
+        tty.setraw(slave)
+        self.bus=Mb.MbBus(os.ttyname(slave),timeout=0.5)
+        os.close(slave) #The bus has its own handle
+        self.asyncBus=MbAsync.AsyncBus(self.bus)
+        self.slave=PtySlave(self.master)
+        self.slave.start()
+
+    def tearDown(self):
+        self.asyncBus.close()
+        self.bus.close() #The slave's reads fail once no one has the port open
+        self.slave.join(5)
+        os.close(self.master)
+
+    #Decodes the response before the next request reuses the buffer
+    async def read(self,timeout=None):
+        return bytes(await self.asyncBus.transact(readRequest,7,timeout))
+
+    def testRequestsRunTogether(self):
+        self.assertEqual(self.asyncBus.run(self.read(),self.read(0.3)),[readResponse,readResponse])
+        self.assertEqual(self.bus.transact(readRequest,7,0.5),readResponse) #The blocking bus's queue was left in turn
+
+class CancelTest(unittest.TestCase):
+    def testCancelledRequestGivesUpItsPlace(self):
+        bus=HeldBus()
+        asyncBus=MbAsync.AsyncBus(bus)
+        self.addCleanup(asyncBus.close)
+        bus.acquire() #Another thread is using the bus
+        async def cancelled():
+            await asyncio.wait_for(asyncBus.transact(readRequest,7),0.1)
+        self.assertRaises(asyncio.TimeoutError,asyncBus.run,cancelled())
+        bus.release()
+        nextRequest=threading.Thread(target=bus.acquire,daemon=True)
+        nextRequest.start()
+        nextRequest.join(2)
+        self.assertFalse(nextRequest.is_alive()) #Not stuck behind the cancelled request's ticket
+
+if __name__=='__main__':
+    unittest.main()
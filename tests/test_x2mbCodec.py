@@ -0,0 +1,59 @@
+#Unit tests for the typed register codec in x2mbCodec.py
+import struct
+import unittest
+import x2mbCodec as Codec
+import x2mbRegisters as Reg
+
+class KeyCodecTest(unittest.TestCase):
+    def testFloatIsUpperWordFirst(self):
+        self.assertEqual(Codec.decode("VCC33_V",struct.pack(">f",3.25)),3.25)
+        [upper,lower]=struct.unpack(">HH",struct.pack(">f",3.25))
+        self.assertEqual(Codec.encode("VCC33_V",3.25),[upper,lower])
+
+    def testSeveralValuesGiveAList(self):
+        data=struct.pack(">3f",1013.5,21.25,40.5)
+        self.assertEqual(Codec.decode("ReadInternalSens",data),[1013.5,21.25,40.5])
+
+    def testClockHasASignedOffset(self):
+        words=Codec.encode("SetTime",[1700000000,-18000])
+        self.assertEqual(len(words),4)
+        self.assertEqual(Codec.decode("ReadTime",struct.pack(">4H",*words)),[1700000000,-18000])
+
+    def testTimeAndStatus(self):
+        self.assertEqual(Codec.decode("MagIntTest0",struct.pack(">HH",0x6553,0xF100)),0x6553F100)
+        self.assertEqual(Codec.encode("K64LED",1),[1])
+        self.assertEqual(Codec.decode("K64LED",b"\x00\x01"),1)
+
+    def testDecodeFromOffset(self):
+        self.assertEqual(Codec.decode("Valid",b"\xff\x00\x00\x3f",2),0x3F)
+
+class BlockCodecTest(unittest.TestCase):
+    def testRegistersBetweenKeysAreSkipped(self):
+        codec=Codec.Codec(["VCC33_V","Valid"])
+        gap=Reg.mbReg["Valid"][0]-Reg.mbReg["VCC33_V"][0]-2
+        self.assertEqual(codec.numReg,2+gap+1)
+        data=struct.pack(">f",3.5)+b"\xaa\xbb"*gap+b"\x00\x07"
+        self.assertEqual(codec.decode(data),{"VCC33_V":3.5,"Valid":7})
+        self.assertEqual(codec.encode({"VCC33_V":3.5,"Valid":7}),list(struct.unpack(">%dH" % codec.numReg,struct.pack(">f",3.5)+b"\x00\x00"*gap+b"\x00\x07")))
+
+    def testTelemetryBlock(self):
+        block=Reg.mbReg.plan(Reg.telemetryBlock)[0]
+        codec=Codec.block(block)
+        self.assertIs(Codec.block(block),codec) #Compiled once
+        self.assertEqual(codec.numReg,Reg.telemetryNumReg)
+        values={}
+        for key in Reg.telemetryBlock:
+            if(Reg.mbReg[key].type=="float"):
+                values[key]=[0.5*(i+1) for i in range(0,Reg.mbReg[key].numReg//2)]
+                if(len(values[key])==1):
+                    values[key]=values[key][0]
+            else:
+                values[key]=3
+        self.assertEqual(codec.decode(struct.pack(">%dH" % codec.numReg,*codec.encode(values))),values)
+
+    def testWords(self):
+        self.assertIs(Codec.words(3),Codec.words(3))
+        self.assertEqual(Codec.words(2).unpack(b"\x00\x01\x00\x02"),(1,2))
+
+if __name__=='__main__':
+    unittest.main()
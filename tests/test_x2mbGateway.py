@@ -0,0 +1,112 @@
+#Unit tests for the request handling in x2mbGateway.py
+#The bus is replaced by a stand-in that records requests so no serial port is needed
+import asyncio
+import unittest
+import x2mbGateway as Gateway
+import x2mbTransport as Mb
+
+#Answers every request with the given response frame or raises the given exception
+class RecordingBus:
+    def __init__(self,response=None,error=None):
+        self.response=response
+        self.error=error
+        self.requests=[] #[Request, Response length, Timeout]
+
+    def transact(self,request,responseLength,timeout):
+        self.requests.append([bytes(request),responseLength,timeout])
+        if(self.error is not None):
+            raise self.error
+        return self.response
+
+readPdu=bytes([4,0x75,0x00,0,1])
+
+class ForwardTest(unittest.TestCase):
+    def testReadIsForwarded(self):
+        bus=RecordingBus(response=Mb.appendCrc(bytes([252,4,2,0,1])))
+        gateway=Gateway.Gateway(bus,0.5)
+        self.assertEqual(gateway.forward(252,readPdu,0.3),bytes([4,2,0,1]))
+        self.assertEqual(bus.requests,[[Mb.appendCrc(bytes([252])+readPdu),7,0.3]])
+
+    def testEmptyPdu(self):
+        bus=RecordingBus()
+        self.assertEqual(Gateway.Gateway(bus,0.5).forward(252,b"",0.5),bytes([0x80,Mb.ILLEGAL_DATA_VALUE]))
+        self.assertEqual(bus.requests,[])
+
+    def testShortPdu(self):
+        bus=RecordingBus()
+        self.assertEqual(Gateway.Gateway(bus,0.5).forward(252,bytes([4,0x75]),0.5),bytes([0x84,Mb.ILLEGAL_DATA_VALUE]))
+        self.assertEqual(bus.requests,[])
+
+    def testUnknownFunctionCode(self):
+        bus=RecordingBus()
+        self.assertEqual(Gateway.Gateway(bus,0.5).forward(252,bytes([43,14,1,0]),0.5),bytes([43|0x80,Mb.ILLEGAL_FUNCTION]))
+        self.assertEqual(bus.requests,[])
+
+    def testSlaveExceptionIsPassedOn(self):
+        gateway=Gateway.Gateway(RecordingBus(error=Mb.SlaveException(2)),0.5)
+        self.assertEqual(gateway.forward(252,readPdu,0.5),bytes([0x84,2]))
+
+    def testNoAnswerIsTargetFailure(self):
+        gateway=Gateway.Gateway(RecordingBus(error=IOError("No answer")),0.5)
+        self.assertEqual(gateway.forward(252,readPdu,0.5),bytes([0x84,0x0B]))
+
+#Runs a gateway on a loopback port and sends it raw Modbus TCP requests
+class ClientTest(unittest.TestCase):
+    def setUp(self):
+        self.bus=RecordingBus(response=Mb.appendCrc(bytes([252,4,2,0,1])))
+        self.gateway=Gateway.Gateway(self.bus,0.5)
+
+    def exchange(self,requests,responses):
+        async def run():
+            server=await asyncio.start_server(self.gateway.handleClient,'127.0.0.1',0)
+            scheduler=asyncio.ensure_future(self.gateway.schedule())
+            port=server.sockets[0].getsockname()[1]
+            [reader,writer]=await asyncio.open_connection('127.0.0.1',port)
+            for [transactionId,protocol,pdu] in requests:
+                writer.write(Mb.mbapHeader.pack(transactionId,protocol,len(pdu)+1,252)+pdu)
+            received=[]
+            for i in range(0,responses):
+                header=await asyncio.wait_for(reader.readexactly(Mb.mbapHeader.size),5)
+                [transactionId,protocol,length,unit]=Mb.mbapHeader.unpack(header)
+                received.append([transactionId,protocol,await reader.readexactly(length-1)])
+            writer.close()
+            await writer.wait_closed()
+            while(self.gateway.clients): #Let the gateway see the disconnect
+                await asyncio.sleep(0.01)
+            scheduler.cancel()
+            await asyncio.gather(scheduler,return_exceptions=True)
+            server.close()
+            await server.wait_closed()
+            return received
+        loop=asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            return loop.run_until_complete(run())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def testRequestIsAnswered(self):
+        self.assertEqual(self.exchange([[7,0,readPdu]],1),[[7,0,bytes([4,2,0,1])]])
+
+    def testOtherProtocolsAreDiscarded(self):
+        self.assertEqual(self.exchange([[1,7,readPdu],[2,0,readPdu]],1),[[2,0,bytes([4,2,0,1])]])
+        self.assertEqual(len(self.bus.requests),1)
+
+    def testTimeoutIsSetPerConnection(self):
+        timeoutPdu=Mb.gatewayTimeoutPdu.pack(Mb.FC_GATEWAY_TIMEOUT,700)
+        self.assertEqual(self.exchange([[1,0,timeoutPdu],[2,0,readPdu]],2),[[1,0,timeoutPdu],[2,0,bytes([4,2,0,1])]])
+        self.assertEqual(self.bus.requests[0][2],0.7)
+
+    def testInvalidTimeoutIsRefused(self):
+        timeoutPdu=Mb.gatewayTimeoutPdu.pack(Mb.FC_GATEWAY_TIMEOUT,0)
+        self.assertEqual(self.exchange([[1,0,timeoutPdu],[2,0,readPdu]],2),
+                         [[1,0,bytes([Mb.FC_GATEWAY_TIMEOUT|0x80,Mb.ILLEGAL_DATA_VALUE])],[2,0,bytes([4,2,0,1])]])
+        self.assertEqual(self.bus.requests[0][2],0.5)
+
+    def testBusErrorDoesNotStopTheGateway(self):
+        self.bus.error=RuntimeError("Port went away")
+        self.assertEqual(self.exchange([[1,0,readPdu]],1),[[1,0,bytes([0x84,Mb.SERVER_DEVICE_FAILURE])]])
+
+if __name__=='__main__':
+    unittest.main()
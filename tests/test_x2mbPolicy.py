@@ -0,0 +1,151 @@
+#Unit tests for x2mbPolicy.py
+import os
+import shutil
+import tempfile
+import unittest
+import x2mbPolicy as Policy
+import x2mbTrace as Trace
+
+class TimeoutPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.folder=tempfile.mkdtemp()
+        self.fileName=os.path.join(self.folder,"mbPolicy.json")
+        self.policy=Policy.TimeoutPolicy(self.fileName)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    #Records the same latency a number of times on the first attempt
+    def fill(self,key,latency,count):
+        for i in range(0,count):
+            self.policy.record(key,latency,True,0)
+
+    def testDefaultsUntilEnoughHistory(self):
+        self.fill("VCC33_V",0.02,Policy.TimeoutPolicy.minSamples-1)
+        self.assertEqual(self.policy.timeout("VCC33_V",0.5),0.5)
+        self.assertEqual(self.policy.retries("VCC33_V",5),5)
+
+    def testTimeoutFromP99(self):
+        self.fill("VCC33_V",0.1,Policy.TimeoutPolicy.minSamples)
+        self.assertAlmostEqual(self.policy.timeout("VCC33_V",0.5),0.1*1.5+0.05)
+
+    def testTimeoutIsClamped(self):
+        self.fill("Fast",0.0,Policy.TimeoutPolicy.minSamples)
+        self.fill("Slow",10.0,Policy.TimeoutPolicy.minSamples)
+        self.assertEqual(self.policy.timeout("Fast",0.5),Policy.TimeoutPolicy.minTimeout)
+        self.assertEqual(self.policy.timeout("Slow",0.5),Policy.TimeoutPolicy.maxTimeout)
+
+    def testRetriesFromLatestAttemptNeeded(self):
+        self.fill("VCC33_V",0.02,Policy.TimeoutPolicy.minSamples)
+        self.assertEqual(self.policy.retries("VCC33_V",5),Policy.TimeoutPolicy.minRetries)
+        self.policy.record("VCC33_V",0.02,True,2) #Once needed a third attempt
+        self.assertEqual(self.policy.retries("VCC33_V",5),4)
+        self.assertEqual(self.policy.retries("VCC33_V",3),3) #Never more than the program setting
+
+    def testFailuresAreNotLatencies(self):
+        self.policy.record("VCC33_V",0.5,False,0)
+        self.assertEqual(self.policy.history["VCC33_V"]["latency"],[])
+        self.assertEqual(self.policy.history["VCC33_V"]["failures"],1)
+
+    def testHistoryIsBounded(self):
+        self.fill("VCC33_V",0.02,Policy.TimeoutPolicy.historyLength+10)
+        self.assertEqual(len(self.policy.history["VCC33_V"]["latency"]),Policy.TimeoutPolicy.historyLength)
+
+    def testSaveAndLoad(self):
+        self.fill("VCC33_V",0.1,Policy.TimeoutPolicy.minSamples)
+        self.policy.save()
+        self.assertEqual(Policy.TimeoutPolicy(self.fileName).timeout("VCC33_V",0.5),self.policy.timeout("VCC33_V",0.5))
+
+    def testCorruptFileIsReset(self):
+        with open(self.fileName,'w') as out_policy:
+            out_policy.write("{not json")
+        self.assertEqual(Policy.TimeoutPolicy(self.fileName).history,{})
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker=Policy.CircuitBreaker(threshold=3)
+
+    def testOpensAfterTimeoutsInARow(self):
+        self.breaker.recordTimeout()
+        self.breaker.recordTimeout()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.recordTimeout()
+        self.assertFalse(self.breaker.allow())
+
+    def testResponseResetsTheCount(self):
+        self.breaker.recordTimeout()
+        self.breaker.recordTimeout()
+        self.breaker.recordResponse()
+        self.breaker.recordTimeout()
+        self.assertTrue(self.breaker.allow())
+
+    def testPowerEventAllowsOneProbe(self):
+        for i in range(0,3):
+            self.breaker.recordTimeout()
+        self.breaker.powerEvent()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.recordTimeout() #The probe timed out too
+        self.assertFalse(self.breaker.allow())
+        self.breaker.powerEvent()
+        self.breaker.recordResponse() #The probe was answered
+        self.breaker.recordTimeout()
+        self.assertTrue(self.breaker.allow())
+
+    def testPowerEventOnClosedBreakerKeepsTheCount(self):
+        self.breaker.recordTimeout()
+        self.breaker.powerEvent()
+        self.assertEqual(self.breaker.timeouts,1)
+
+    def testNewShortCircuitsAreReportedOnce(self):
+        self.assertFalse(self.breaker.newShortCircuits())
+        self.breaker.recordShortCircuit()
+        self.assertTrue(self.breaker.newShortCircuits())
+        self.assertFalse(self.breaker.newShortCircuits())
+
+class WifiContentionTest(unittest.TestCase):
+    def setUp(self):
+        self.wifi=Policy.WifiContention(interferenceTimeout=1.0)
+
+    def testPowerOnMayBringTheWifiUp(self):
+        self.assertFalse(self.wifi.possible())
+        self.wifi.powerEvent(252)
+        self.assertTrue(self.wifi.possible())
+        self.assertTrue(self.wifi.needsOff(252))
+        self.assertEqual(self.wifi.timeout(0.5),1.0)
+        self.assertEqual(self.wifi.timeout(2.0),2.0) #Never lowered
+
+    def testOffWriteEndsTheContention(self):
+        self.wifi.powerEvent(252)
+        self.wifi.switched(252,0,True)
+        self.assertFalse(self.wifi.possible())
+        self.assertFalse(self.wifi.needsOff(252))
+        self.assertEqual(self.wifi.timeout(0.5),0.5)
+
+    def testFailedWriteMayHaveReachedTheBoard(self):
+        self.wifi.powerEvent(252)
+        self.wifi.switched(252,0,True)
+        self.wifi.switched(252,1,False)
+        self.assertTrue(self.wifi.possible())
+
+    def testAnyBoardOnTheBusCounts(self):
+        self.wifi.powerEvent(1)
+        self.wifi.powerEvent(2)
+        self.wifi.switched(1,0,True)
+        self.assertTrue(self.wifi.possible())
+        self.wifi.powerOff(2)
+        self.assertFalse(self.wifi.possible())
+        self.wifi.wake(1)
+        self.assertTrue(self.wifi.possible())
+        self.assertEqual(self.wifi.wakes,3)
+
+    def testTransactionsAreCountedByContention(self):
+        self.wifi.record(Trace.OK)
+        self.wifi.powerEvent(252)
+        self.wifi.record(Trace.TIMEOUT)
+        self.wifi.record(Trace.OK)
+        summary=self.wifi.summary()
+        self.assertIn("may have been on: 2, failed: 1 (50.0%)",summary)
+        self.assertIn("was off: 1, failed: 0 (0.0%)",summary)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#Unit tests for the read cache and prefetching prompt in x2mbPrefetch.py
+import time
+import unittest
+import x2mbPrefetch as Prefetch
+
+class ReadCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache=Prefetch.ReadCache(ttl=5.0)
+
+    def testResponseIsUsedOnce(self):
+        self.cache.store(b"request",b"response")
+        self.assertEqual(self.cache.take(bytearray(b"request")),b"response")
+        self.assertIsNone(self.cache.take(b"request"))
+        self.assertEqual([self.cache.prefetched,self.cache.hits,self.cache.discarded],[1,1,0])
+
+    def testOldResponseIsDiscarded(self):
+        self.cache.ttl=0.0
+        self.cache.store(b"request",b"response")
+        time.sleep(0.01)
+        self.assertIsNone(self.cache.take(b"request"))
+        self.assertEqual([self.cache.hits,self.cache.discarded],[0,1])
+
+    def testFresherReadReplacesTheOldOne(self):
+        self.cache.store(b"request",b"old")
+        self.cache.store(b"request",b"new")
+        self.assertEqual(self.cache.take(b"request"),b"new")
+        self.assertEqual(self.cache.discarded,1)
+
+    def testInvalidateClearsResponsesAndSchedule(self):
+        self.cache.schedule(["VCC33_V"])
+        self.cache.store(b"request",b"response")
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.keys)
+        self.assertIsNone(self.cache.take(b"request"))
+        self.assertEqual(self.cache.discarded,1)
+
+    def testEmptyScheduleIsNothing(self):
+        self.cache.schedule([])
+        self.assertIsNone(self.cache.keys)
+
+class PrefetchingInputTest(unittest.TestCase):
+    def setUp(self):
+        self.cache=Prefetch.ReadCache()
+        self.reads=[]
+
+    def read(self,keys):
+        self.reads.append(keys)
+
+    def testNothingScheduledReadsNothing(self):
+        prompt=Prefetch.PrefetchingInput(lambda text: "y",self.cache,self.read)
+        self.assertEqual(prompt("Retry?"),"y")
+        self.assertEqual(self.reads,[])
+
+    def testReadsAreBoundedWhileWaiting(self):
+        self.cache.schedule(["VCC33_V"])
+        prompt=Prefetch.PrefetchingInput(lambda text: time.sleep(0.3) or "n",self.cache,self.read,refreshInterval=0.01,maxReads=3)
+        self.assertEqual(prompt("Retry?"),"n")
+        self.assertEqual(self.reads,[["VCC33_V"]]*3)
+
+    def testReadingStopsWhenTheOperatorAnswers(self):
+        self.cache.schedule(["VCC33_V"])
+        def answer(text):
+            while(not self.reads): #Answer once the first read has been made
+                time.sleep(0.01)
+            return "y"
+        prompt=Prefetch.PrefetchingInput(answer,self.cache,self.read,refreshInterval=10)
+        started=time.time()
+        self.assertEqual(prompt("Retry?"),"y")
+        self.assertLess(time.time()-started,5) #Didn't wait out the refresh interval
+        self.assertEqual(len(self.reads),1)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#Unit tests for the compiled register table and bus plans in x2mbRegisters.py
+import unittest
+import x2mbRegisters as Reg
+
+#     { "Key" :[(Register #), (# of Registers), (Function Code), (Type), (Access)] }
+table={ "A"   :[0x100,          2,                4,               "float",  "r"     ]
+       ,"B"   :[0x102,          1,                4,               "status", "r"     ]
+       ,"C"   :[0x10B,          2,                4,               "float",  "r"     ] #8 unused registers after B
+       ,"D"   :[0x116,          1,                4,               "status", "r"     ] #9 unused registers after C
+       ,"S1"  :[0x200,          1,                16,              "status", "rw"    ]
+       ,"S2"  :[0x201,          1,                16,              "status", "rw"    ]
+       ,"S4"  :[0x203,          1,                16,              "status", "rw"    ]
+       ,"Set" :[0x300,          4,                16,              "clock",  "w"     ]
+       ,"Read":[0x300,          4,                4,               "clock",  "r"     ]
+       ,"Copy":[0x102,          1,                4,               "uint16", "r"     ] #Same registers as B without being an alias
+      }
+
+class RegisterMapTest(unittest.TestCase):
+    def setUp(self):
+        self.mbReg=Reg.RegisterMap(table,[("Set","Read")])
+
+    def testEntriesKeepTheTableOrder(self):
+        self.assertEqual(self.mbReg["A"][0],0x100)
+        self.assertEqual(self.mbReg["A"].numReg,2)
+        self.assertEqual(self.mbReg["S1"].access,"rw")
+
+    def testAliasesAndPlaceholders(self):
+        self.assertFalse(self.mbReg["Read"].placeholder)
+        self.assertTrue(self.mbReg["Copy"].placeholder)
+        self.assertEqual(self.mbReg.placeholders,["Copy"])
+
+    def testPartialOverlapIsRefused(self):
+        overlapping=dict(table)
+        overlapping["Bad"]=[0x101,2,4,"float","r"]
+        self.assertRaises(ValueError,Reg.RegisterMap,overlapping,[])
+
+    def testReadsJoinAcrossSmallGaps(self):
+        self.assertEqual(self.mbReg.plan(["D","B","A","C"]),
+                         [Reg.Block(0x100,0x0D,4,("A","B","C")),Reg.Block(0x116,1,4,("D",))])
+
+    def testWritesOnlyJoinNeighbours(self):
+        self.assertEqual(self.mbReg.plan(["S4","S1","S2"],16),
+                         [Reg.Block(0x200,2,16,("S1","S2")),Reg.Block(0x203,1,16,("S4",))])
+
+    def testBlocksStayUnderTheLimit(self):
+        long={}
+        for i in range(0,70):
+            long["F%d" % i]=[0x1000+2*i,2,4,"float","r"]
+        blocks=Reg.RegisterMap(long,[]).plan(sorted(long))
+        self.assertEqual([block.numReg for block in blocks],[122,18])
+
+    def testPlansAreWorkedOutOnce(self):
+        self.assertIs(self.mbReg.plan(["A","B"]),self.mbReg.plan(["A","B"]))
+
+    def testPlaceholderCantBeUsed(self):
+        self.assertRaises(ValueError,self.mbReg.plan,["Copy"])
+
+    def testAccessModeIsChecked(self):
+        self.assertRaises(ValueError,self.mbReg.plan,["A"],16)
+        self.assertRaises(ValueError,self.mbReg.plan,["Set"])
+
+class TesterTableTest(unittest.TestCase):
+    def testTelemetryAndSwitchBankAreSingleBlocks(self):
+        self.assertEqual(len(Reg.mbReg.plan(Reg.telemetryBlock)),1)
+        self.assertEqual(len(Reg.mbReg.plan(Reg.switchBank,16)),1)
+        self.assertEqual(Reg.regKey[(Reg.telemetryStart,Reg.telemetryNumReg,4)],"Telemetry")
+
+    def testSetAndReadTimeStaySeparate(self):
+        register=Reg.mbReg["SetTime"]
+        self.assertEqual(Reg.regKey[(register.reg,register.numReg,16)],"SetTime")
+        self.assertEqual(Reg.regKey[(register.reg,register.numReg,4)],"ReadTime")
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#Unit tests for recording a run and replaying it with x2mbReplay.py
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import x2mbReplay as Replay
+import x2mbTransport as Mb
+
+readRequest=Mb.getReadFrame(252,0x7500,1)[0]
+slowRequest=Mb.getReadFrame(252,0x7501,1)[0]
+rejectedRequest=Mb.getReadFrame(252,0x1234,1)[0]
+silentRequest=Mb.getReadFrame(7,0x7500,1)[0]
+readResponse=Mb.appendCrc(bytes([252,4,2,0,1]))
+
+#Answers the requests above the way a board would
+class BoardBus:
+    def transact(self,request,responseLength,timeout):
+        if(request==rejectedRequest):
+            raise Mb.SlaveException(2)
+        if(request==silentRequest):
+            raise IOError("No communication with the instrument (no answer)")
+        if(request==slowRequest):
+            time.sleep(0.05)
+        return readResponse
+
+#Reads back whatever was last written to a pin
+class BoardGpio:
+    def __init__(self):
+        self.pins={}
+
+    def input(self,pin):
+        return self.pins.get(pin,0)
+
+    def output(self,pin,value):
+        self.pins[pin]=value
+
+class RecordReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.folder=tempfile.mkdtemp()
+        self.fileName=os.path.join(self.folder,"run.jsonl.gz")
+        recorder=Replay.Recorder(self.fileName)
+        bus=Replay.RecordingBus(BoardBus(),recorder)
+        for request in (readRequest,slowRequest,rejectedRequest,silentRequest):
+            try:
+                bus.transact(request,7,0.5)
+            except (IOError,ValueError):
+                pass
+        gpio=Replay.RecordingGpio(BoardGpio(),recorder)
+        gpio.output(11,1)
+        gpio.input(11)
+        Replay.RecordingInput(lambda prompt: "AB10",recorder)("Serial Number: ")
+        recorder.close()
+        self.recording=Replay.Recording(self.fileName,originalLatency=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def testResponsesAreReplayedByRequest(self):
+        bus=Replay.ReplayBus(self.recording)
+        self.assertEqual(bus.transact(readRequest,7,0.5),readResponse)
+        self.assertEqual(bus.transact(readRequest,7,0.5),readResponse) #The last answer is reused
+
+    def testErrorsAreReplayed(self):
+        bus=Replay.ReplayBus(self.recording)
+        with self.assertRaises(Mb.SlaveException) as context:
+            bus.transact(rejectedRequest,7,0.5)
+        self.assertEqual(context.exception.code,2)
+        self.assertRaises(IOError,bus.transact,silentRequest,7,0.5)
+
+    def testUnrecordedRequestIsNotAnswered(self):
+        self.assertRaises(IOError,Replay.ReplayBus(self.recording).transact,Mb.getReadFrame(252,0x7502,1)[0],7,0.5)
+
+    def testShorterTimeoutTimesOut(self):
+        bus=Replay.ReplayBus(self.recording)
+        self.assertRaises(IOError,bus.transact,slowRequest,7,0.01)
+        self.assertEqual(bus.transact(slowRequest,7,0.5),readResponse)
+
+    def testPinsAndAnswersAreReplayed(self):
+        gpio=Replay.ReplayGpio(self.recording)
+        self.assertEqual(gpio.input(11),1) #An input pin answers from the recording
+        gpio.setup(12,gpio.OUT)
+        gpio.output(12,1)
+        self.assertEqual(gpio.input(12),1) #An output pin reads back what was written
+        answers=Replay.ReplayInput(self.recording)
+        self.assertEqual(answers("Serial Number: "),"AB10")
+        self.assertRaises(EOFError,answers,"Serial Number: ")
+
+if __name__=='__main__':
+    unittest.main()
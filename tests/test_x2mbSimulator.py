@@ -0,0 +1,135 @@
+#Tests for x2mbSimulator.py. The smoke test runs a whole board through x2MainPCBTester.py against the simulator
+#and takes about a minute, since the tester waits on the board's power up times like it would on the fixture
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import x2mbSimulator as Sim
+import x2mbTransport as Mb
+
+folder=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Operator answers: keep the module list, serial number, the LED and Wi-Fi questions, no retry, then stop
+answers="\nAB10\ny\ny\ny\ny\nn\n\n-1\n\n\n\n"
+
+#Multi-drop answers: keep the module list, one board's serial number, connect the harness, disconnect, then stop
+multiDropAnswers="\nAB10\n\n\n-1\n\n"
+
+#Returns a loopback port nothing is listening on
+def freePort():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1',0))
+        return probe.getsockname()[1]
+
+@unittest.skipUnless(os.name=="posix","The simulator needs a pseudo-terminal")
+class SimulatorSmokeTest(unittest.TestCase):
+    def setUp(self):
+        self.folder=tempfile.mkdtemp()
+        self.env=dict(os.environ,PYTHONPATH=os.pathsep.join(sys.path)) #Same packages as the test run
+        self.port=freePort()
+        self.simulator=subprocess.Popen([sys.executable,os.path.join(folder,"x2mbSimulator.py"),"-control",str(self.port)],
+                                        cwd=self.folder,env=self.env,stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+        deadline=time.time()+10
+        while True: #Wait for the fixture control port to come up
+            try:
+                socket.create_connection(('127.0.0.1',self.port),1).close()
+                break
+            except OSError:
+                if(time.time()>deadline or self.simulator.poll() is not None):
+                    self.tearDown()
+                    self.fail("The simulator didn't start")
+                time.sleep(0.1)
+
+    def tearDown(self):
+        self.simulator.kill()
+        self.simulator.wait()
+        shutil.rmtree(self.folder,ignore_errors=True)
+
+    def testBoardPasses(self):
+        results=os.path.join(self.folder,"results")+os.sep
+        desktop=os.path.join(self.folder,"desktop")+os.sep
+        os.makedirs(desktop)
+        run=subprocess.run([sys.executable,os.path.join(folder,"x2MainPCBTester.py"),"-admin","-sim","localhost:%d" % self.port,
+                            "-results",results,"-desktop",desktop],
+                           cwd=self.folder,env=self.env,input=answers,stdout=subprocess.PIPE,stderr=subprocess.STDOUT,
+                           universal_newlines=True,timeout=300)
+        self.assertEqual(run.returncode,0,run.stdout[-2000:])
+        self.assertTrue("ITTERATION START FOR SN: AB10" in run.stdout,run.stdout[-2000:]) #Only the end of the output, it's long
+        self.assertTrue("Failures: 0" in run.stdout,run.stdout[-2000:])
+        self.assertTrue(any(name.endswith("_PCBTestResults.csv") for name in os.listdir(results)))
+
+    def testMultiDropNamesTheModulesItDoesntRun(self):
+        results=os.path.join(self.folder,"results")+os.sep
+        desktop=os.path.join(self.folder,"desktop")+os.sep
+        os.makedirs(desktop)
+        run=subprocess.run([sys.executable,os.path.join(folder,"x2MainPCBTester.py"),"-multiDrop","1","-sim","localhost:%d" % self.port,
+                            "-results",results,"-desktop",desktop],
+                           cwd=self.folder,env=self.env,input=multiDropAnswers,stdout=subprocess.PIPE,stderr=subprocess.STDOUT,
+                           universal_newlines=True,timeout=120)
+        self.assertEqual(run.returncode,0,run.stdout[-2000:])
+        self.assertTrue("Use Type: Multi-Drop" in run.stdout,run.stdout[-2000:])
+        self.assertFalse("An invalid selection was made" in run.stdout)
+        [fileName]=[name for name in os.listdir(results) if name.endswith("_PCBTestResultsMultiDrop.csv")]
+        with open(os.path.join(results,fileName)) as in_records:
+            [header,row]=[line.rstrip(",\n").split(",") for line in in_records]
+        self.assertEqual(header[-1],"Modules Not Tested In Multi-Drop")
+        self.assertEqual(row[0:2],["AB10","100"])
+        self.assertEqual(row[-1].split(" ")[0:3],["Mod1","Mod2","Mod3"])
+
+#Returns whether a fault happens on each of a number of requests for the keys
+def pattern(faults,fault,keys,count=50):
+    return [bool(faults.happening(fault,set(keys))) for i in range(0,count)]
+
+class FaultsTest(unittest.TestCase):
+    def testUnknownFaultIsRefused(self):
+        self.assertRaises(ValueError,Sim.Faults,[{"fault":"melt"}])
+
+    def testSeedRepeatsTheFaults(self):
+        entries=[{"fault":"drop","rate":0.5}]
+        self.assertEqual(pattern(Sim.Faults(entries,seed=3),"drop",["Add"]),pattern(Sim.Faults(entries,seed=3),"drop",["Add"]))
+        self.assertNotEqual(pattern(Sim.Faults(entries,seed=3),"drop",["Add"]),pattern(Sim.Faults(entries,seed=4),"drop",["Add"]))
+
+    def testAddingAFaultDoesNotMoveTheOthers(self):
+        drop={"fault":"drop","rate":0.5}
+        crc={"fault":"crc","rate":0.5}
+        alone=Sim.Faults([drop],seed=1)
+        both=Sim.Faults([drop,crc],seed=1)
+        for i in range(0,50):
+            self.assertEqual(bool(alone.happening("drop",{"Add"})),bool(both.happening("drop",{"Add"})))
+            both.happening("crc",{"Add"})
+
+    def testFaultsOnlyHitTheirKeys(self):
+        faults=Sim.loadFaults("stuckRail")
+        values={"VCC33_V":3.3,"Valid":7}
+        faults.apply(values,{"Valid"})
+        self.assertEqual(values["VCC33_V"],3.3)
+        faults.apply(values,{"VCC33_V","Valid"})
+        self.assertEqual(values,{"VCC33_V":3.05,"Valid":7})
+        self.assertEqual(faults.counts["stuck"],1)
+
+    def testCorruptedFrameIsStillFound(self):
+        response=Mb.appendCrc(bytes([252,4,2,0,1]))
+        corrupted=Sim.Faults([{"fault":"crc"}]).frame(response,{"Add"})
+        self.assertFalse(Mb.checkCrc(corrupted))
+        self.assertEqual(corrupted[0:2],response[0:2])
+        self.assertIsNone(Sim.Faults([{"fault":"drop"}]).frame(response,{"Add"}))
+
+    def testProfilesAndFilesCanBeJoined(self):
+        fileName=os.path.join(tempfile.mkdtemp(),"faults.json")
+        try:
+            with open(fileName,'w') as out_faults:
+                json.dump([{"fault":"late","keys":["Add"],"delay":0.2}],out_faults)
+            faults=Sim.loadFaults("dropFrames,%s" % fileName)
+        finally:
+            shutil.rmtree(os.path.dirname(fileName))
+        self.assertEqual([settings["fault"] for [settings,rng] in faults.entries],["drop","late"])
+        self.assertEqual(faults.apply({},{"Add"}),0.2)
+        self.assertEqual(faults.apply({},{"VCC33_V"}),0)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#Unit tests for the latency histogram and transaction totals in x2mbTrace.py
+import unittest
+import x2mbTrace as Trace
+
+class LatencyHistogramTest(unittest.TestCase):
+    def setUp(self):
+        self.histogram=Trace.LatencyHistogram()
+
+    def testEmpty(self):
+        self.assertIsNone(self.histogram.percentile(50))
+        self.assertIsNone(self.histogram.mean())
+
+    def testPercentilesAreWithinTheResolution(self):
+        for i in range(1,101):
+            self.histogram.record(i/1000.0) #1ms to 100ms
+        for percent in (1,50,90,99):
+            exact=percent/1000.0
+            self.assertGreaterEqual(self.histogram.percentile(percent),exact)
+            self.assertLessEqual(self.histogram.percentile(percent),exact*(1+Trace.LatencyHistogram.resolution))
+        self.assertEqual(self.histogram.percentile(100),0.1)
+
+    def testPercentileNeverPassesTheMaximum(self):
+        self.histogram.record(0.0123)
+        self.assertEqual(self.histogram.percentile(50),0.0123)
+
+    def testSmallValuesShareTheFirstBucket(self):
+        self.histogram.record(0.0)
+        self.histogram.record(0.00005)
+        self.assertEqual(self.histogram.counts,{0:2})
+        self.assertLessEqual(self.histogram.percentile(99),Trace.LatencyHistogram.lowest)
+
+    def testMeanAndCount(self):
+        for value in (0.01,0.02,0.03):
+            self.histogram.record(value)
+        self.assertEqual(self.histogram.count,3)
+        self.assertAlmostEqual(self.histogram.mean(),0.02)
+        self.assertEqual(self.histogram.max,0.03)
+
+class TracerTest(unittest.TestCase):
+    def testBoardAndBatchTotals(self):
+        tracer=Trace.Tracer()
+        tracer.record("VCC33_V",252,4,8,9,0.02,0,Trace.OK)
+        tracer.record("VCC33_V",252,4,8,0,0.5,1,Trace.TIMEOUT)
+        entry=tracer.board[(252,"VCC33_V",4)]
+        self.assertEqual(entry.outcomes[Trace.OK],1)
+        self.assertEqual(entry.outcomes[Trace.TIMEOUT],1)
+        self.assertEqual(entry.retries,1)
+        self.assertEqual(entry.latency.count,1) #Timeouts aren't latencies
+        self.assertAlmostEqual(entry.busTime,0.52)
+        self.assertIn("VCC33_V",tracer.endBoard())
+        self.assertEqual(tracer.board,{})
+        self.assertIn("(1 boards)",tracer.endBatch())
+        self.assertEqual(tracer.batch[(252,"VCC33_V",4)].outcomes[Trace.OK],1)
+
+if __name__=='__main__':
+    unittest.main()
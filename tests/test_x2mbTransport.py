@@ -0,0 +1,252 @@
+#Unit tests for x2mbTransport.py
+import os
+import threading
+import time
+import tty
+import unittest
+import x2mbRegisters as Reg
+import x2mbTransport as Mb
+
+#Read of 1 input register at 0x7500 from slave 252 and a matching response holding 0x0001
+readRequest=Mb.appendCrc(bytes([252,4,0x75,0x00,0,1]))
+readResponse=Mb.appendCrc(bytes([252,4,2,0,1]))
+
+class CrcTest(unittest.TestCase):
+    def testKnownValue(self):
+        self.assertEqual(Mb.calculateCrc(b"123456789"),0x4B37) #CRC-16/MODBUS check value
+
+    def testAppendSendsLowByteFirst(self):
+        self.assertEqual(Mb.appendCrc(bytes.fromhex("010300000001")),bytes.fromhex("010300000001840a"))
+
+    def testCheck(self):
+        self.assertTrue(Mb.checkCrc(readResponse))
+        corrupt=bytearray(readResponse)
+        corrupt[3]^=0x01
+        self.assertFalse(Mb.checkCrc(bytes(corrupt)))
+        self.assertFalse(Mb.checkCrc(b"\x00\x00")) #Too short to hold a frame
+
+class FrameTest(unittest.TestCase):
+    def testReadFrame(self):
+        [request,responseLength]=Mb.getReadFrame(252,0x7500,1)
+        self.assertEqual(request,readRequest)
+        self.assertEqual(responseLength,7)
+        self.assertIs(Mb.getReadFrame(252,0x7500,1)[0],request) #Built once and cached
+
+    def testWriteFrame(self):
+        [request,responseLength]=Mb.getWriteFrame(20,0x7500,[1,0x1234])
+        self.assertEqual(request,Mb.appendCrc(bytes([20,16,0x75,0x00,0,2,4,0,1,0x12,0x34])))
+        self.assertEqual(responseLength,8)
+
+    def testExpectedResponseLength(self):
+        self.assertEqual(Mb.expectedResponseLength(readRequest),7)
+        self.assertEqual(Mb.expectedResponseLength(Mb.getWriteFrame(252,0x7500,[1,0])[0]),8)
+        self.assertIsNone(Mb.expectedResponseLength(Mb.appendCrc(bytes([252,43,14,1,0]))))
+
+    def testMinimumPduLengthCoversEveryFunctionCode(self):
+        for functionCode in Mb.minimumPduLength:
+            pdu=bytes([functionCode])+bytes(Mb.minimumPduLength[functionCode]-1)
+            self.assertIsNotNone(Mb.expectedResponseLength(bytes([1])+pdu))
+
+    def testWriteReadFrame(self):
+        [request,responseLength]=Mb.getWriteReadFrame(252,0x7500,[1],0x750C,2)
+        self.assertEqual(request,Mb.appendCrc(bytes([252,23,0x75,0x0C,0,2,0x75,0x00,0,1,2,0,1])))
+        self.assertEqual(responseLength,9)
+        self.assertEqual(Mb.expectedResponseLength(Mb.getWriteReadFrame(252,0x7500,[1],0x750C,3)[0]),11)
+
+class FindResponseTest(unittest.TestCase):
+    def testFindsResponseAfterNoise(self):
+        buffer=b"\x00\xff\x13"+readResponse
+        self.assertEqual(Mb.findResponse(buffer,readRequest,7),[3,3+len(readResponse)])
+
+    def testSkipsStaleFrameFromAnotherSlave(self):
+        stale=Mb.appendCrc(bytes([20,4,2,0,5]))
+        buffer=stale+readResponse
+        self.assertEqual(Mb.findResponse(buffer,readRequest,7),[len(stale),len(buffer)])
+
+    def testPartialResponseWaitsForMore(self):
+        self.assertEqual(Mb.findResponse(readResponse[:4],readRequest,7),[0,None])
+
+    def testExceptionResponse(self):
+        exception=Mb.appendCrc(bytes([252,0x84,2]))
+        self.assertEqual(Mb.findResponse(exception,readRequest,7),[0,5])
+
+    def testNothingFound(self):
+        self.assertEqual(Mb.findResponse(b"\x01\x02\x03",readRequest,7),[3,None])
+
+#Stands in for a serial port with bytes already waiting in its input buffer
+class LatePort:
+    def __init__(self,name,pending=b""):
+        self.port=name
+        self.baudrate=19200
+        self.pending=bytearray(pending)
+
+    @property
+    def in_waiting(self):
+        return len(self.pending)
+
+    def read(self,size):
+        data=bytes(self.pending[0:size])
+        del self.pending[0:size]
+        return data
+
+class StaleFrameTest(unittest.TestCase):
+    def testCountsCompleteFrames(self):
+        frames=(Mb.appendCrc(bytes([20,4,2,0,5]))+b"\x00" #A read response then noise
+                +Mb.appendCrc(bytes([252,16,0x75,0x00,0,1])) #A write echo
+                +Mb.appendCrc(bytes([252,0x84,2]))) #An exception
+        self.assertEqual(Mb.countStaleFrames("count",frames),3)
+        self.assertEqual(Mb.countStaleFrames("count",frames[0:6]),0) #Cut short
+        self.assertEqual(Mb.staleFrames["count"],3)
+
+    def testLateFramesAreDrainedBeforeSending(self):
+        port=LatePort("drain",Mb.appendCrc(bytes([20,4,2,0,5])))
+        Mb.latestReadTimes["drain"]=time.time()
+        startTime=time.time()
+        Mb.waitForSilence(port)
+        self.assertGreaterEqual(time.time()-startTime,Mb.silentPeriod(19200))
+        self.assertEqual(port.pending,b"")
+        self.assertEqual(Mb.staleFrames["drain"],1)
+
+    def testQuietBusIsNotHeldUp(self):
+        startTime=time.time()
+        Mb.waitForSilence(LatePort("quiet"))
+        self.assertLess(time.time()-startTime,0.05)
+        self.assertNotIn("quiet",Mb.staleFrames)
+
+class CheckResponseTest(unittest.TestCase):
+    def testValidResponse(self):
+        self.assertEqual(Mb.checkResponse(readRequest,readResponse,7),readResponse)
+
+    def testNoAnswer(self):
+        self.assertRaises(IOError,Mb.checkResponse,readRequest,b"",7)
+
+    def testWrongSlave(self):
+        self.assertRaises(ValueError,Mb.checkResponse,readRequest,Mb.appendCrc(bytes([20,4,2,0,1])),7)
+
+    def testSlaveException(self):
+        with self.assertRaises(Mb.SlaveException) as context:
+            Mb.checkResponse(readRequest,Mb.appendCrc(bytes([252,0x84,2])),7)
+        self.assertEqual(context.exception.code,2)
+
+    def testCorruptResponse(self):
+        self.assertRaises(Mb.CrcError,Mb.checkResponse,readRequest,readResponse[:-1]+b"\x00",7)
+
+#Answers read requests on the other end of a pseudo-terminal like the X2 would
+#Requests for any other slave get no answer
+class PtySlave(threading.Thread):
+    def __init__(self,master):
+        threading.Thread.__init__(self,daemon=True)
+        self.master=master
+
+    def run(self):
+        received=b""
+        while True:
+            try:
+                received+=os.read(self.master,Mb.maxFrameLength)
+            except OSError:
+                return #The port was closed
+            while(len(received)>=len(readRequest)):
+                request=received[0:len(readRequest)]
+                received=received[len(readRequest):]
+                if(request==readRequest):
+                    os.write(self.master,readResponse)
+
+@unittest.skipUnless(hasattr(os,"openpty"),"The bus test needs a pseudo-terminal")
+class MbBusTest(unittest.TestCase):
+    def setUp(self):
+        [self.master,slave]=os.openpty()
+        tty.setraw(slave)
+        self.bus=Mb.MbBus(os.ttyname(slave),timeout=0.5)
+        os.close(slave) #The bus has its own handle
+        self.slave=PtySlave(self.master)
+        self.slave.start()
+
+    def tearDown(self):
+        self.bus.close() #The slave's reads fail once no one has the port open
+        self.slave.join(5)
+        os.close(self.master)
+
+    def testTimeoutsDontReconfigureThePort(self):
+        reconfigured=[]
+        reconfigure=self.bus.serial._reconfigure_port
+        self.bus.serial._reconfigure_port=lambda *args,**kwargs: reconfigured.append(1) or reconfigure(*args,**kwargs)
+        for timeout in (0.2,0.5,0.3):
+            self.assertEqual(bytes(self.bus.transact(readRequest,7,timeout)),readResponse)
+        self.assertEqual(reconfigured,[])
+
+    def testResponseIsReadStraightIntoTheBuffer(self):
+        self.bus.serial.readinto=None #pyserial's readinto copies, so it mustn't be used
+        response=self.bus.transact(readRequest,7,0.5)
+        self.assertEqual(bytes(response),readResponse)
+        self.assertIs(response.obj,self.bus._buffers.buffer)
+
+    def testDeadlineIsKept(self):
+        startTime=time.time()
+        self.assertRaises(IOError,self.bus.transact,Mb.getReadFrame(7,0x7500,1)[0],7,0.2)
+        self.assertGreaterEqual(time.time()-startTime,0.2)
+        self.assertLess(time.time()-startTime,0.2+0.1)
+
+#Register of a switch in the bank
+def switchReg(key):
+    return Reg.mbReg[key][0]
+
+class SwitchBankTest(unittest.TestCase):
+    def setUp(self):
+        self.bank=Mb.SwitchBank()
+        self.allOff=[0]*Reg.switchBankNumReg
+
+    def testUnknownStatesSplitWrites(self):
+        self.assertEqual(self.bank.plan({"33SEPIC_OF":1,"5VLDO_OF":1}),
+                         [[switchReg("33SEPIC_OF"),[1]],[switchReg("5VLDO_OF"),[1]]])
+
+    def testKnownStatesBetweenChangesAreRewritten(self):
+        self.bank.update(Reg.switchBankStart,self.allOff,True)
+        self.assertEqual(self.bank.plan({"5VLDO_OF":1,"33SEPIC_OF":1}),[[switchReg("33SEPIC_OF"),[1,0,1]]])
+
+    def testFailedWriteForgetsTheStates(self):
+        self.bank.update(Reg.switchBankStart,self.allOff,True)
+        self.bank.update(switchReg("12SEPIC_OF"),[1],False)
+        self.assertEqual(self.bank.plan({"33SEPIC_OF":1,"5VLDO_OF":1}),
+                         [[switchReg("33SEPIC_OF"),[1]],[switchReg("5VLDO_OF"),[1]]])
+
+    def testInvalidate(self):
+        self.bank.update(Reg.switchBankStart,self.allOff,True)
+        self.bank.invalidate()
+        self.assertEqual(self.bank.state,[None]*Reg.switchBankNumReg)
+
+    def testOnlySwitchesCanBePlanned(self):
+        self.assertRaises(ValueError,self.bank.plan,{"Add":1})
+
+    def testUnchangedSwitchesAreSkipped(self):
+        self.bank.update(Reg.switchBankStart,self.allOff,True)
+        self.assertEqual(self.bank.plan({"33SEPIC_OF":0,"12SEPIC_OF":1}),[[switchReg("12SEPIC_OF"),[1]]])
+        self.assertEqual(self.bank.plan({"33SEPIC_OF":False}),[])
+        self.assertEqual(self.bank.skipped,2)
+
+    def testVerifyCountsDrift(self):
+        self.bank.update(switchReg("33SEPIC_OF"),[0,0],True)
+        readBack=[1]*Reg.switchBankNumReg
+        self.bank.verify(readBack) #Only the two known switches can have drifted
+        self.assertEqual(self.bank.drifted,2)
+        self.assertEqual(self.bank.state,readBack)
+
+    def testVerifyIsDueAfterTheInterval(self):
+        bank=Mb.SwitchBank(verifyInterval=2)
+        bank.plan({"33SEPIC_OF":1})
+        self.assertFalse(bank.verifyDue())
+        bank.plan({"33SEPIC_OF":0})
+        self.assertTrue(bank.verifyDue())
+        bank.verify(self.allOff)
+        self.assertFalse(bank.verifyDue())
+        self.assertFalse(Mb.SwitchBank().verifyDue()) #Never read back by default
+
+    def testForgottenSwitchSplitsWrites(self):
+        self.bank.update(Reg.switchBankStart,self.allOff,True)
+        self.bank.forget("WiFiPwr_OF")
+        self.assertIsNone(self.bank.value("WiFiPwr_OF"))
+        self.assertEqual(self.bank.value("PriPwr_OF"),0)
+        self.assertEqual(self.bank.plan({"PriPwr_OF":1,"Trigger1_OF":1}),
+                         [[switchReg("PriPwr_OF"),[1]],[switchReg("Trigger1_OF"),[1]]])
+
+if __name__=='__main__':
+    unittest.main()
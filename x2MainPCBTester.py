@@ -28,22 +28,42 @@
 #
 
 #Imports
+import asyncio
 import datetime
 import time
 import os
-import spidev
+import builtins
 import x2mbRegisters as Reg
-import minimalmodbus
-import RPi.GPIO as GPIO
-from wifi import Cell
-import struct
+import x2mbTransport as Mb
+import x2mbAsync as MbAsync
+import x2mbPolicy as Pol
+import x2mbTrace as Trace
+import x2mbCodec as Codec
+import x2mbReplay as Replay
+import x2mbSimulator as Sim
+import x2mbPrefetch as Prefetch
 import shutil
+import threading
 import logging
 import logging.handlers
 import sys
 
+#The Pi hardware libraries are only needed to test boards. A recorded run can be replayed
+#and a simulated board tested without them.
+try:
+    import spidev
+    import RPi.GPIO as GPIO
+    from wifi import Cell
+except ImportError:
+    spidev = GPIO = Cell = None
+
 
 def main():
+    global GPIO,Cell #Swapped for recording or replaying versions with -record and -replay
+    #Set up inside the try. Anything still None when it fails is skipped by the cleanup.
+    x2 = tnode = bus = pinDict = None
+    out_records = None #Results file, opened once testing starts
+    recorder = None #Trace file, opened with -record
     try: #Put everything in a try statement to allow the capturing and handling of errors
         
         ##############################
@@ -53,6 +73,7 @@ def main():
         #Device Parameters
         snlen = 4 #length of the serial number
         mbRetries = 3 #Number of retries on modbus commands
+        breakerTimeouts = 6 #Number of modbus timeouts in a row before the X2 is treated as not responding
         wifiRetries = 3 #Number of times to search for a Wi-Fi network before giving up
         wifiNetwork = "X2 Logger" #Partial Wi-Fi SSID name for which to scan
 
@@ -64,34 +85,129 @@ def main():
         bytesize=8
         stopbits=1
         modbusTimeout=0.5
-        comPort = '/dev/ttyUSB0'
+        wifiTimeout=1 #Shortest Modbus timeout while a board's Wi-Fi module may be on
+        comPort = getOption("-port",'/dev/ttyUSB0')
+        gateway = getOption("-gateway",None) #host:port of x2mbGateway.py if it owns the port instead
+        simulator = getOption("-sim",None) #host:port of x2mbSimulator.py's fixture control to test a simulated board instead
+        resultsFolder = getOption("-results","/home/pi/Documents/X2_PCB_Test_Results/") #Location of the results files
+        desktopFolder = getOption("-desktop","/home/pi/Desktop/") #Location the module list is copied to for editing
+        policyFolder = resultsFolder #Location of the learned Modbus timeouts and retries
+        verifySwitches = int(getOption("-verifySwitches",0)) #Read the switch bank back after this many changes (0=never)
+        prefetch = ("-noPrefetch" not in sys.argv) #Read the first registers of the section to retry while the operator answers the retry prompt
+
+        #Bus Benchmark Parameters (x2MainPCBTester.py -bench <mbReg key or Telemetry> [-count N | -seconds T])
+        benchKey = getOption("-bench",None) #Register to read over and over instead of testing boards
+        benchCount = int(getOption("-count",1000)) #Number of reads on each device
+        benchSeconds = float(getOption("-seconds",0)) #Read for this long on each device instead (0=use the count)
+
+        #Fault Benchmark Parameters (x2MainPCBTester.py -faultBench <x2mbSimulator.py fault profiles> -sim localhost:5021 [-rounds N])
+        faultBench = getOption("-faultBench",None) #Fault profiles to time the retry logic against, joined with commas
+        faultRounds = int(getOption("-rounds",30)) #Times a board's worth of reads is made for each profile
+        faultSeed = int(getOption("-faultSeed",0)) #Seed for the injected faults so runs can be compared
+
+        #Address Scan Parameters (x2MainPCBTester.py -scan <known good address>)
+        scanReference = getOption("-scan",None) #Address that is known to answer, used to time the scan
+
+        #RS-485 Passthrough Benchmark Parameters (module 17)
+        passthroughBurst = int(getOption("-passthroughBurst",20)) #Reads at each payload size, directly and through the passthrough
+        passthroughSizes = [1,16,32,64] #Registers read at each step
+        passthroughMargin = 0.025 #Seconds the passthrough may add on top of forwarding the frames
+
+        #Multi-Drop Parameters (x2MainPCBTester.py -multiDrop <number of boards>)
+        multiDropBoards = int(getOption("-multiDrop",0)) #Boards tested together on one bus (0=one board at a time)
+        multiDropBase = 100 #Address given to the first board. Keeps clear of the T-Node (20) and universal (252) addresses.
+
+        #Record/Replay Parameters (x2MainPCBTester.py -record <file> or -replay <file> [-replayLatency zero])
+        recordFile = getOption("-record",None) #Save every hardware interaction in this run to a trace file
+        replayFile = getOption("-replay",None) #Answer from a trace file instead of the hardware
+        replayLatency = getOption("-replayLatency","original") #original=wait as long as the hardware did; zero=answer right away
 
         ################################
         ## Setup Devices & Interfaces ##
         ################################
         
-        #Open SPI bus for use by the ADC chip
-        spi = spidev.SpiDev()
-        spi.open(0,0)
+        #Answer everything from a recorded run instead of the hardware
+        if(replayFile):
+            recording = Replay.Recording(replayFile,replayLatency!="zero")
+            spi = Replay.ReplaySpi(recording)
+            bus = Replay.ReplayBus(recording,baud,modbusTimeout)
+            GPIO = Replay.ReplayGpio(recording)
+            Cell = Replay.ReplayCell(recording)
+            builtins.input = Replay.ReplayInput(recording)
+        else:
+            if(simulator):
+                #Use the simulated fixture's pins, ADC and Wi-Fi, and its port unless another one was given
+                [simulatorHost,simulatorPort]=simulator.split(":")
+                simControl = Sim.SimControl(simulatorHost,int(simulatorPort))
+                spi = Sim.SimSpi(simControl)
+                GPIO = Sim.SimGpio(simControl)
+                Cell = Sim.SimCell(simControl)
+                comPort = getOption("-port",simControl.ask("port"))
+            else:
+                #Open SPI bus for use by the ADC chip
+                spi = spidev.SpiDev()
+                spi.open(0,0)
+
+            #Open the RS-485 bus. All Modbus requests go through this one serial handle,
+            #or through the Modbus TCP gateway if another program is sharing the fixture.
+            if(gateway):
+                [gatewayHost,gatewayPort]=gateway.split(":")
+                bus = Mb.MbTcpBus(gatewayHost,int(gatewayPort))
+            else:
+                bus = Mb.MbBus(comPort,baudrate=baud,parity=parity,bytesize=bytesize,stopbits=stopbits,timeout=modbusTimeout)
+
+        #Save every interaction with the hardware so the run can be replayed later
+        if(recordFile):
+            recorder = Replay.Recorder(recordFile)
+            spi = Replay.RecordingSpi(spi,recorder)
+            bus = Replay.RecordingBus(bus,recorder)
+            GPIO = Replay.RecordingGpio(GPIO,recorder)
+            Cell = Replay.RecordingCell(Cell,recorder)
+            builtins.input = Replay.RecordingInput(builtins.input,recorder)
 
         #Setup the modbus instance of the X2
-        x2 = minimalmodbus.Instrument(comPort, x2mbAddress)#Define the minimalmodbus instance
-        x2.serial.baudrate = baud
-        x2.serial.parity = parity
-        x2.serial.bytesize = bytesize
-        x2.serial.stopbits = stopbits
-        x2.serial.timeout = modbusTimeout
-        minimalmodbus._checkSlaveaddress = _checkSlaveaddress #call this function to adjust the modbus address range to 0-255
-##        x2.debug=True
+        x2 = Mb.MbDevice(bus,x2mbAddress,modbusTimeout)
 
         #Setup the modbus instance of the Passthrough T-Node
-        tnode = minimalmodbus.Instrument(comPort, tnodembAddress)#Define the minimalmodbus instance
-        tnode.serial.baudrate = baud
-        tnode.serial.parity = parity
-        tnode.serial.bytesize = bytesize
-        tnode.serial.stopbits = stopbits
-        tnode.serial.timeout = modbusTimeout
-##        tnode.debug=True
+        tnode = Mb.MbDevice(bus,tnodembAddress,modbusTimeout)
+
+        #Non-blocking version of the bus for awaitable requests. Both devices share it
+        #since they are on the same port and only one request can be outstanding.
+        #It reads the port directly, so it isn't used when recording or replaying.
+        if(not gateway and not recordFile and not replayFile):
+            x2.asyncBus = MbAsync.AsyncBus(bus)
+            tnode.asyncBus = x2.asyncBus
+
+        #Build every request frame up front so none are built during testing
+        Mb.buildFrameCache([x2mbAddress,tnodembAddress])
+
+        #Load the learned timeouts and retries for each device
+        x2.policy = Pol.TimeoutPolicy(policyFolder+"X2ModbusPolicy.json")
+        tnode.policy = Pol.TimeoutPolicy(policyFolder+"TNodeModbusPolicy.json")
+
+        #Stop waiting on timeouts once the X2 has stopped responding
+        x2.breaker = Pol.CircuitBreaker(breakerTimeouts)
+
+        #Keep track of the X2's switches so several can be changed in one write
+        #Switches already in the requested state aren't written again
+        x2.switches = Mb.SwitchBank(verifySwitches)
+
+        #Read the registers the first section to retry starts with while the operator answers the retry prompt
+        #Any write or power event clears what was read ahead. Replayed answers come back right away,
+        #so there is no time to read ahead in.
+        x2.cache = Prefetch.ReadCache()
+        retryInput = input
+        if(prefetch and not replayFile):
+            retryInput = Prefetch.PrefetchingInput(builtins.input,x2.cache,lambda keys: prefetchReads(GPIO,pinDict,x2,keys))
+
+        #Record every transaction so the time spent on the bus can be summarized
+        x2.tracer = Trace.Tracer()
+        tnode.tracer = x2.tracer
+
+        #Track when a Wi-Fi module may be interfering on the bus so timeouts are only raised then
+        #The T-Node shares the bus so its requests see the same interference
+        x2.wifi = Pol.WifiContention(wifiTimeout)
+        tnode.wifi = x2.wifi
 
         ##Define GPIO Interface
         GPIO.setmode(GPIO.BOARD) #Sets the pin mode to use the board's pin numbers
@@ -112,17 +228,48 @@ def main():
         GPIO.setup(pinDict["TRIGGER1"], GPIO.IN)
         GPIO.setup(pinDict["TRIGGER2"], GPIO.IN)
 
+        #Qualify the fixture's RS-485 bus instead of testing boards
+        if(benchKey):
+            powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
+            powerOn(x2,mbRetries,GPIO,pinDict,"IO4")
+            for device in (x2,tnode):
+                benchmarkBus(bus,device.address,benchKey,benchCount,benchSeconds,mbRetries,modbusTimeout)
+            return
+
+        #Time the retry logic against each simulated failure mode instead of testing boards
+        if(faultBench):
+            if(not simulator):
+                logging.error("-faultBench needs a simulated board to inject the faults (-sim)")
+                return
+            powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
+            benchmarkFaults(simControl,bus,x2mbAddress,faultBench.split(","),faultSeed,faultRounds,mbRetries,modbusTimeout,breakerTimeouts)
+            return
+
+        #Find which addresses are answering on the bus instead of testing boards
+        if(scanReference):
+            powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
+            powerOn(x2,mbRetries,GPIO,pinDict,"IO4")
+            found=scanAddresses(bus,int(scanReference),mbRetries,modbusTimeout)
+            logging.important("Slaves found: %s",", ".join("%d (Add=%s)" % (address,value) for [address,value] in found) or "None")
+            return
+
+        #Test several boards on the same bus instead of one at a time
+        if(multiDropBoards):
+            runMultiDrop(bus,x2,GPIO,pinDict,mbRetries,modbusTimeout,multiDropBoards,multiDropBase,snlen,
+                         getModulesToTest(desktopFolder),resultsFolder)
+            return
+
         
         #########################
         ## Create Results File ##
         #########################
 
         #Check if folder is there and if not make
-        os.makedirs("/home/pi/Documents/X2_PCB_Test_Results",exist_ok=True)
+        os.makedirs(resultsFolder,exist_ok=True)
         #Define the file name to be <CURRENT_DATE>_PCBTestResults.csv
         name = "PCBTestResults.csv"
         date = datetime.datetime.now().strftime("%Y.%m.%d")
-        filename="/home/pi/Documents/X2_PCB_Test_Results/"+date+"_"+name
+        filename=resultsFolder+date+"_"+name
 
         #Open the file
         if(os.path.isfile(filename)):   #If the file exists append it
@@ -192,6 +339,8 @@ def main():
                               "Trigger 1 Status,"
                               "Trigger 2 Status,"
                               "Passthrough RS-485 Status,"
+                              "Passthrough Frame Loss (%),"
+                              "Passthrough Added Latency (ms),"
                               "Wi-Fi Network Status,"
                               "Wi-Fi LED and Communication Status,"                               
                               "Magnetic Switch 1 Read Status,"
@@ -202,6 +351,7 @@ def main():
                               "Magnetic Switch 2 LED Status,"
                               "K64 LEDs Status,"      
                               "Itteration Time,"
+                              "Modules Skipped Due To No Response,"
                               "\n")
 
         
@@ -210,7 +360,7 @@ def main():
         ######################
             
         #Determine which modules to test for this program run
-        moduleToTest = getModulesToTest() #Call the function to get module list
+        moduleToTest = getModulesToTest(desktopFolder) #Call the function to get module list
         masterModuleToTest = list(moduleToTest) #Master list to revert to for each board
         moduleName = ["Mod1  - 3V LDO",
                       "Mod2  - RS-485 driver, EE, and processor",
@@ -232,6 +382,10 @@ def main():
                       "Mod18 - Wi-Fi Module",
                       "Mod19 - Magnetic Switch",
                       "Mod20 - K64 LEDs"]
+        #Registers each module reads before it writes anything, so they can be read ahead during the retry prompt
+        #The other modules start by switching something on, which would change what was read
+        leadingReads = {2 : ["Add"],
+                        3 : Reg.telemetryBlock}
         moduleNumber=0 #Counter for which module is active
 
         ###################
@@ -249,6 +403,10 @@ def main():
             logging.debug("------------- %s -------------\n\n\n",time.strftime('%Y-%m-%d %H:%M:%S',time.gmtime(time.time())))
 
             out_records.write("%s" % sn) #Write serial number to file
+            shortCircuited=[] #Modules that had Modbus requests skipped because the board was not responding
+            x2.breaker.powerEvent() #Give the board a fresh probe at the start of each itteration
+            staleFrameStart=bus.staleFrameCount() #Late Modbus frames discarded before this itteration
+            skippedStart=x2.switches.skipped #Switch writes skipped before this itteration
 
             #Test the 3V LDO
             if(moduleToTest[moduleNumber]):
@@ -272,6 +430,7 @@ def main():
                 logging.important("Module 1 - 3V LDO Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the RS-485 driver, EE and processor
@@ -294,6 +453,7 @@ def main():
                 logging.important("Module 2 - Processor, EE, & RS-485 Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the RTC Clock & Battery
@@ -320,6 +480,7 @@ def main():
                 logging.important("Module 3 - RTC Clock & Battery Testing Skipped...")
                 out_records.write(",skipped,skipped,skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the 3.3V SEPIC Converter
@@ -344,6 +505,7 @@ def main():
                 logging.important("Module 4 - 3.3V SEPIC Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the Serial Flash
@@ -366,6 +528,7 @@ def main():
                 logging.important("Module 5 - Serial Flash Testing Skipped...")
                 out_records.write(",skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test SD Card
@@ -387,6 +550,7 @@ def main():
                 logging.important("Module 6 - SD Card Testing Skipped...")
                 out_records.write(",skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test Priority Power Switch
@@ -433,6 +597,7 @@ def main():
                                   ",skipped,skipped,skipped"
                                   ",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
             
             #Test System Current
@@ -457,6 +622,7 @@ def main():
                 logging.important("Module 8 - System Current Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
                 
 
@@ -482,6 +648,7 @@ def main():
                 logging.important("Module 9 - System Current Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the 5V LDO Converter
@@ -506,6 +673,7 @@ def main():
                 logging.important("Module 10 - 5V LDO Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the 12V Sensor Switch
@@ -548,6 +716,7 @@ def main():
                                   ",skipped,skipped"
                                   ",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test Sensor Current
@@ -572,6 +741,7 @@ def main():
                 logging.important("Module 12 - Sensor Current Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
                 
 
@@ -603,6 +773,7 @@ def main():
                 out_records.write(",skipped,skipped"
                                   ",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the Sensor Ports
@@ -640,6 +811,7 @@ def main():
                                   ",skipped,skipped,skipped"
                                   ",skipped,skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test Pressure/Temp/Humidity
@@ -680,6 +852,7 @@ def main():
                                   ",skipped,skipped"
                                   ",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test Trigger
@@ -702,18 +875,21 @@ def main():
                 logging.important("Module 16 - Trigger Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test RTU RS-485 Passthrough
             if(moduleToTest[moduleNumber]):
                 print("\n------------------------------")
                 logging.important("Module 17 - Testing the RS-485 Passthrough...")
-                result17=testRS485Passthrough(GPIO,pinDict,x2,mbRetries,tnode) #Call the RS-485 Passthrough test module
+                result17=testRS485Passthrough(GPIO,pinDict,x2,mbRetries,tnode,passthroughSizes,passthroughBurst,passthroughMargin,baud) #Call the RS-485 Passthrough test module
                 print("=====================")
                 logging.important("Test result:\n"
-                             "RTU RS-485 Passthrough Status: %s"
-                             ,result17[0])
-                out_records.write(",%s" % (result17[0])) #Write the result to the file
+                             "RTU RS-485 Passthrough Status: %s\n"
+                             "Passthrough Frame Loss: %s%%\n"
+                             "Passthrough Added Latency: %s ms"
+                             ,result17[0],result17[1],result17[2])
+                out_records.write(",%s,%s,%s" % (result17[0],result17[1],result17[2])) #Write the result to the file
                 print("------------------------------\n")
                 #Clear flag if test passed
                 if(result17[0]=="Pass"):
@@ -721,8 +897,9 @@ def main():
             else:
                 print("\n------------------------------")
                 logging.important("Module 17 - RTU RS-485 Testing Skipped...")
-                out_records.write(",skipped") #Write the result to the file
+                out_records.write(",skipped,skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the Wi-Fi module (LEDs, Communication, Network)
@@ -745,13 +922,14 @@ def main():
                 logging.important("Module 18 - Wi-Fi Module Testing Skipped...")
                 out_records.write(",skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test the Magnetic Switch
             if(moduleToTest[moduleNumber]):
                 print("\n------------------------------")
                 logging.important("Module 19 - Testing the Magnetic Switch...")
-                result19=testMagSW(GPIO,pinDict,x2,mbRetries,modbusTimeout) #Call the magnetic switch test module
+                result19=testMagSW(GPIO,pinDict,x2,mbRetries) #Call the magnetic switch test module
                 print("=====================")
                 logging.important("Test result:\n"
                              "Magnetic Switch 1 Read Status: %s\n"
@@ -777,6 +955,7 @@ def main():
                 out_records.write(",skipped,skipped,skipped"
                                   ",skipped,skipped,skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
             #Test K64 LEDs
@@ -798,6 +977,7 @@ def main():
                 logging.important("Module 20 - K64 LED Testing Skipped...")
                 out_records.write(",skipped") #Write the result to the file
                 print("------------------------------\n")
+            noteShortCircuits(x2,moduleNumber,shortCircuited) #Record if any requests were skipped
             moduleNumber += 1 #Increment the active module count
 
 
@@ -805,6 +985,7 @@ def main():
             endTime=time.time()#Timestamp ending time
             itterationTime=round(endTime-startTime,1)
             out_records.write(",%s" % (itterationTime))
+            out_records.write(",%s" % (" ".join(shortCircuited) or "None"))
             out_records.write("\n")#Line return to go to next record
 
             #Reset the module increment counter
@@ -813,6 +994,11 @@ def main():
             print("----------------------------------------------")
             logging.important("Board SN: %s has completed its itteration",sn)
             logging.important("The test took a total of %.3f seconds",itterationTime)
+            logging.info("Late Modbus responses discarded: %d",bus.staleFrameCount()-staleFrameStart)
+            logging.info("Switch writes skipped (already set): %d",x2.switches.skipped-skippedStart)
+            if(verifySwitches):
+                logging.info("Switch states found out of sync when read back: %d",x2.switches.drifted)
+            logging.info(x2.tracer.endBoard()) #Where this itteration's time went on the bus
             print("----------------------------------------------\n\n")
             
 
@@ -827,9 +1013,10 @@ def main():
                 for i in range(0,len(moduleToTest)): #Loop through and print out the sections that failed
                     if(moduleToTest[i]):
                         logging.important(moduleName[i])
+                x2.cache.schedule(leadingReads.get(moduleToTest.index(1)+1)) #What the first section to retry reads, in case it is retried
                 done=False
                 while not (done):
-                    retrySections = input("\nWould you like to retry the failed sections? (y/n): ")
+                    retrySections = retryInput("\nWould you like to retry the failed sections? (y/n): ")
                     if(retrySections == "y" or retrySections == "Y"):
                         retryTest=True
                         done=True
@@ -856,6 +1043,7 @@ def main():
                 GPIO.output(pinDict["IO2"],GPIO.LOW)
                 GPIO.output(pinDict["IO3"],GPIO.LOW)
                 GPIO.output(pinDict["IO4"],GPIO.LOW)
+                x2.cache.invalidate()
 
                 #Set retry attempts back to 0 for next board
                 retryAttempts=0
@@ -868,21 +1056,25 @@ def main():
 
                 #Prepare for next board
                 out_records.flush()
+                x2.policy.save() #Keep the learned timeouts in case the program is closed
+                tnode.policy.save()
                 sn = getSN(snlen) #Get new board SN
 
     #Define operation when an exception occurs
     except KeyboardInterrupt:
-        out_records.write(",KEYBOARD INTERRUPT ERROR\n")#Line return to go to next record
-        out_records.flush()        
+        if(out_records): #Not opened in the -bench, -faultBench, -scan and -multiDrop modes
+            out_records.write(",KEYBOARD INTERRUPT ERROR\n")#Line return to go to next record
+            out_records.flush()        
         print("\n==============================\n")
         logging.error("The program was cancelled by a keyboard interrupt!\n")
         print("==============================\n")
         input("Press Enter to exit\n")
     except Exception as error:
-        out_records.write(",PROGRAM ERROR,")
-        out_records.write(str(error))
-        out_records.write("\n")#Line return to go to next record
-        out_records.flush()
+        if(out_records):
+            out_records.write(",PROGRAM ERROR,")
+            out_records.write(str(error))
+            out_records.write("\n")#Line return to go to next record
+            out_records.flush()
         print("\n==============================\n")
         logging.error("The program encountered the following error!\n")
         logging.error("Error Type: %s", type(error))
@@ -892,12 +1084,31 @@ def main():
         input("Press Enter to exit\n")
     finally:
         logging.important("Cleaning up and exiting...")
-        out_records.close #Close the file
-        GPIO.output(pinDict["IO1"],GPIO.LOW) #Turn power off to Primary Power
-        GPIO.output(pinDict["IO2"],GPIO.LOW) #Turn power off to Secondary Power
-        GPIO.output(pinDict["IO3"],GPIO.LOW) #Turn power off to Backup Power
-        GPIO.output(pinDict["IO4"],GPIO.LOW) #Turn power off to T-Node
-        GPIO.cleanup() #Clean up GPIOs
+        #Setup may have stopped part way, e.g. the gateway or simulator was down or the serial port was busy
+        if(getattr(x2,"tracer",None)):
+            logging.info(x2.tracer.endBatch()) #Where the batch's time went on the bus
+        if(getattr(x2,"wifi",None)):
+            logging.info(x2.wifi.summary()) #What the Wi-Fi interference cost
+        if(getattr(x2,"cache",None) and x2.cache.prefetched):
+            logging.info(x2.cache.summary()) #How much of the reading ahead was used
+        if(getattr(x2,"policy",None)):
+            x2.policy.save() #Save the learned timeouts and retries for the next run
+        if(getattr(tnode,"policy",None)):
+            tnode.policy.save()
+        if(out_records):
+            out_records.close() #Close the file
+        if(pinDict):
+            GPIO.output(pinDict["IO1"],GPIO.LOW) #Turn power off to Primary Power
+            GPIO.output(pinDict["IO2"],GPIO.LOW) #Turn power off to Secondary Power
+            GPIO.output(pinDict["IO3"],GPIO.LOW) #Turn power off to Backup Power
+            GPIO.output(pinDict["IO4"],GPIO.LOW) #Turn power off to T-Node
+            GPIO.cleanup() #Clean up GPIOs
+        if(getattr(x2,"asyncBus",None)):
+            x2.asyncBus.close() #Stop its event loop
+        if(bus):
+            bus.close() #Release the serial port
+        if(recorder):
+            recorder.close() #Finish the trace file
         logging.shutdown() #Stops the logging process
 
 
@@ -906,35 +1117,163 @@ def main():
 ## Functions ##
 ###############
 
-# This function is able to take up to 4 16-bit hex values as a list and
-# combine them into a single integer
-def combineFrom16Bits(separate):
-    # Loop through all the sent values and add them to the end value
-    combined = 0
-    k=len(separate)
-    for i in range(0,len(separate)):
-        combined = combined + (separate[k-1]<<(16*i)) #Shift by 16-bits times the location
-        k=k-1
-    return combined
+#Gives the board on the universal address a new address using the same write as testProcEEAndRS485
+#The board is power cycled so the address is loaded from EE, then read on its new address to confirm
+def assignAddress(GPIO,pinDict,x2,mbRetries,address):
+    writeResult = mbWriteRetries(x2,Reg.mbReg["Add"].reg,[address],retries=mbRetries)
+    if(writeResult==False):
+        logging.debug("Writing address %d was not successful",address)
+        return False
+    powerOff(x2,GPIO,pinDict,"IO1")
+    powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
+    readResult = mbReadRetries(Mb.MbDevice(x2.bus,address,x2.timeout),Reg.mbReg["Add"].reg,Reg.mbReg["Add"].numReg,retries=mbRetries)
+    if(readResult==False or readResult[0]!=address):
+        logging.debug("The board did not answer on address %d",address)
+        return False
+    return True
+#Returns True if the board answers on its new address
+
+#Reads one register (or the telemetry block) as fast as the bus allows and reports the error rates
+#Used to qualify the fixture and cabling separately from the board. The learned policy and circuit
+#breaker aren't used so every run is measured with the same timeout and retries.
+def benchmarkBus(bus,address,key,count,seconds,retries,timeout):
+    if(key!="Telemetry" and key not in Reg.mbReg):
+        logging.error("%s is not a register in x2mbRegisters.py",key)
+        return False
+    device=Mb.MbDevice(bus,address,timeout)
+    device.tracer=Trace.Tracer()
+    if(key=="Telemetry"):
+        [request,responseLength]=Mb.getReadFrame(address,Reg.telemetryStart,Reg.telemetryNumReg)
+    else:
+        [request,responseLength]=Mb.getReadFrame(address,Reg.mbReg[key].reg,Reg.mbReg[key].numReg)
+
+    logging.important("Benchmarking %s on slave %d...",key,address)
+    staleStart=bus.staleFrameCount()
+    transactions=0
+    successes=0
+    startTime=time.time()
+    while((seconds and time.time()-startTime<seconds) or (not seconds and transactions<count)):
+        if(mbTransactRetries(device,key,request,responseLength,retries)!=False):
+            successes+=1
+        transactions+=1
+    elapsed=time.time()-startTime
+
+    entry=device.tracer.board.get((address,key,Mb.FC_READ_INPUT),Trace.TraceEntry())
+    attempts=max(1,sum(entry.outcomes.values()))
+    logging.important("Slave %d - %s: %d of %d transactions successful in %.1f seconds\n"
+                      "Throughput: %.1f transactions/s\n"
+                      "Latency p50/p95/p99: %s/%s/%s ms\n"
+                      "Timeout rate: %.2f%%\n"
+                      "CRC error rate: %.2f%%\n"
+                      "Other errors (exception or bad frame): %d\n"
+                      "Retries per success: %.3f\n"
+                      "Late responses discarded: %d",
+                      address,key,successes,transactions,elapsed,
+                      successes/max(elapsed,0.001),
+                      Trace.milliseconds(entry.latency.percentile(50)),
+                      Trace.milliseconds(entry.latency.percentile(95)),
+                      Trace.milliseconds(entry.latency.percentile(99)),
+                      100.0*entry.outcomes[Trace.TIMEOUT]/attempts,
+                      100.0*entry.outcomes[Trace.CRC]/attempts,
+                      entry.outcomes[Trace.EXCEPTION]+entry.outcomes[Trace.BAD_FRAME],
+                      entry.retries/float(max(successes,1)),
+                      bus.staleFrameCount()-staleStart)
+    return entry
+#Returns False if the key isn't known and the trace totals for the benchmarked register if it is
+
+#Reads a burst of each size directly from the X2 and then through the RS-485 passthrough from the T-Node
+#Reads start at the address register on both so each size asks the same of both devices
+#A Modbus exception reply is much shorter than the response being timed, so it isn't timed and is counted as rejected
+def benchmarkPassthrough(x2,tnode,sizes,burst):
+    results=[]
+    for numReg in sizes:
+        medians=[]
+        lostFrames=[]
+        rejectedFrames=[]
+        for device in (x2,tnode):
+            [request,responseLength]=Mb.getReadFrame(device.address,Reg.mbReg["Add"].reg,numReg)
+            latency=Trace.LatencyHistogram()
+            lost=0
+            rejected=0
+            for i in range(0,burst):
+                sendTime=time.time()
+                try:
+                    device.bus.transact(request,responseLength,device.timeout)
+                except Mb.SlaveException:
+                    rejected+=1
+                    continue
+                except (IOError,ValueError): #Nothing came back or it came back corrupted
+                    lost+=1
+                    continue
+                latency.record(time.time()-sendTime)
+            medians.append(latency.percentile(50))
+            lostFrames.append(lost)
+            rejectedFrames.append(rejected)
+        logging.debug("%d registers - Direct p50: %s ms, Passthrough p50: %s ms, Frames lost through the passthrough: %d of %d, "
+                      "Reads rejected directly: %d, through the passthrough: %d",
+                      numReg,Trace.milliseconds(medians[0]),Trace.milliseconds(medians[1]),lostFrames[1],burst,
+                      rejectedFrames[0],rejectedFrames[1])
+        results.append([numReg,len(request),responseLength,medians[0],medians[1],lostFrames[1],sum(rejectedFrames),burst])
+    return results
+#Returns [[# of Registers, Request bytes, Response bytes, Direct p50 latency, Passthrough p50 latency, Frames lost, Reads rejected, Frames sent], ...]
+
+#Times a board's worth of reads against each fault profile on a simulated board (see x2mbSimulator.py)
+#Each profile is read with the plain retry logic (fixed timeout and retries) and again with the learned
+#policy and circuit breaker the tester uses. The faults start from the same seed for both runs.
+#The "none" profile is run first so the time each failure mode costs can be worked out.
+def benchmarkFaults(simControl,bus,address,profiles,seed,rounds,retries,timeout,breakerTimeouts):
+    reads=[[Reg.telemetryStart,Reg.telemetryNumReg]]
+    reads+=[[register.reg,register.numReg] for register in Reg.mbReg.values() if not register.placeholder and "r" in register.access]
+    baseline={}
+    results=[]
+    for profile in ["none"]+[profile for profile in profiles if profile!="none"]:
+        result=[profile]
+        for logic in ["Legacy","Improved"]:
+            device=Mb.MbDevice(bus,address,timeout)
+            if(logic=="Improved"):
+                device.policy=Pol.TimeoutPolicy(os.devnull) #Starts with nothing learned and is never saved
+                device.breaker=Pol.CircuitBreaker(breakerTimeouts)
+            if(simControl.ask("faults",profile,seed)!="ok"):
+                logging.error("The simulator doesn't have a fault profile named %s",profile)
+                return False
+            logging.important("Reading with the %s retry logic against %s faults...",logic.lower(),profile)
+            failed=0
+            startTime=time.time()
+            for i in range(0,rounds):
+                for [reg,numReg] in reads:
+                    if(mbReadRetries(device,reg,numReg,retries)==False):
+                        failed+=1
+            elapsed=time.time()-startTime
+            baseline.setdefault(logic,elapsed)
+            logging.important("%s - %s: %.1f seconds (%+.1f over no faults), %d of %d reads failed, injected %s",
+                              profile,logic,elapsed,elapsed-baseline[logic],failed,rounds*len(reads),simControl.ask("faultCounts"))
+            result+=[elapsed,elapsed-baseline[logic],failed]
+        results.append(result)
+    simControl.ask("faults","none")
+    return results
+#Returns [[Profile, Legacy seconds, Legacy seconds over none, Legacy failures, Improved seconds, Improved seconds over none, Improved failures], ...]
+#or False if the simulator doesn't know one of the profiles
 
 #Generic function to check a status register on the X2
 def checkStatus(x2,mbRetries,mbDictName,clearText):
     #Read the Status
     logging.debug("Reading %s Status...",clearText)
-    readResult = mbReadRetries(x2,Reg.mbReg[mbDictName][0],Reg.mbReg[mbDictName][1],retries=mbRetries)
-    if(readResult): #if the read was successful
-        if(readResult[0]==1): #check if status was good
-            logging.debug("The %s status is good",clearText)
-            return [readResult[0],"Pass"]
-        elif(readResult[0]==0): #bad
-            logging.debug("The %s status is bad",clearText)
-            return [readResult[0],"Fail-The "+clearText+" status was returned as bad"]
-        else: #or unknown
-            logging.debug("The %s status is unknown",clearText)
-            return [readResult[0],"Fail-The "+clearText+" status was returned as an unknown value"]
-    else:
-        logging.debug("The read was not successful")
-        return [-999999,"Fail-The Modbus read failed. No status received"]
+    readResult = mbReadRetries(x2,Reg.mbReg[mbDictName].reg,Reg.mbReg[mbDictName].numReg,retries=mbRetries)
+    return statusResult(readResult,clearText)
+
+#Same as checkStatus, but can be awaited
+async def checkStatusAsync(x2,mbRetries,mbDictName,clearText):
+    logging.debug("Reading %s Status...",clearText)
+    readResult = await mbReadRetriesAsync(x2,Reg.mbReg[mbDictName].reg,Reg.mbReg[mbDictName].numReg,retries=mbRetries)
+    return statusResult(readResult,clearText)
+
+#Turns the Wi-Fi off so it doesn't interfere on the RS-485 bus
+#The write is only sent if the board's Wi-Fi may be on
+def disableWifi(x2,mbRetries):
+    wifi=getattr(x2,"wifi",None)
+    if(wifi and not wifi.needsOff(x2.address)):
+        return True
+    return enableDisable(x2,mbRetries,"WiFiPwr_OF","Wi-Fi Module",0)
 
 #Generic function to enable or disable any of the X2's switches
 def enableDisable(x2,mbRetries,mbDictName,clearText,onOff):
@@ -944,7 +1283,7 @@ def enableDisable(x2,mbRetries,mbDictName,clearText,onOff):
     if(onOff): #if the call was to enable the switch
         #Turn the switch on
         logging.debug("Enabling the %s ...",clearText)
-        writeResult1 = mbWriteRetries(x2,Reg.mbReg[mbDictName][0],[1],retries=mbRetries) #1=on
+        writeResult1 = writeSwitches(x2,mbRetries,{mbDictName:1}) #1=on
         if(writeResult1):
             logging.debug("The %s was successfully enabled",clearText)
             return True
@@ -954,7 +1293,7 @@ def enableDisable(x2,mbRetries,mbDictName,clearText,onOff):
     else:#if the call was to disable the switch
         #Turn the switch off
         logging.debug("Disabling the %s ...",clearText)
-        writeResult2 = mbWriteRetries(x2,Reg.mbReg[mbDictName][0],[0],retries=mbRetries) #0=off
+        writeResult2 = writeSwitches(x2,mbRetries,{mbDictName:0}) #0=off
         if(writeResult2):
             logging.debug("The %s was successfully disabled", clearText)
             return True
@@ -962,11 +1301,22 @@ def enableDisable(x2,mbRetries,mbDictName,clearText,onOff):
             logging.debug("Disabling the %s was not successful", clearText)
             return False
 
+#Turns several switches on or off together, usually in a single Modbus write
+def enableDisableMany(x2,mbRetries,switches,clearText):
+    #Modbus Device, # MB retries, { MB Dictionary Name : True=On/False=Off }, Readable text
+    logging.debug("Switching the %s ...",clearText)
+    if(writeSwitches(x2,mbRetries,switches)):
+        logging.debug("The %s were successfully switched",clearText)
+        return True
+    else:
+        logging.debug("Switching the %s was not successful",clearText)
+        return False
+
 #Determine which modules should be tested
-def getModulesToTest():
+def getModulesToTest(desktopFolder):
 
-    #Copy the master file to the desktop for user manipulation
-    shutil.copy2("/home/pi/Documents/GitHub/X2Tester/ModuleToTest.txt","/home/pi/Desktop/ModuleToTest.txt")
+    #Copy the master file next to this program to the desktop for user manipulation
+    shutil.copy2(os.path.join(os.path.dirname(os.path.abspath(__file__)),"ModuleToTest.txt"),desktopFolder+"ModuleToTest.txt")
 
     input("If only certain modules are to be tested for this run, please update the\n"
           "ModuleToTest.txt file that is currently on the Desktop.\n\n"
@@ -974,7 +1324,7 @@ def getModulesToTest():
           "Otherwise just hit ENTER\n\n")               
 
     #Open the file for reading
-    in_moduleToTestFile=open("/home/pi/Desktop/ModuleToTest.txt", 'r')
+    in_moduleToTestFile=open(desktopFolder+"ModuleToTest.txt", 'r')
 
     #Read in the file's values
     moduleToTest=[] #start with an empty list
@@ -985,10 +1335,16 @@ def getModulesToTest():
     in_moduleToTestFile.close()
     
     #delete the file from the desktop
-    os.remove("/home/pi/Desktop/ModuleToTest.txt")
+    os.remove(desktopFolder+"ModuleToTest.txt")
 
     return moduleToTest
 
+#Returns the value after a command line option or the default if it wasn't given
+def getOption(name,default):
+    if(name in sys.argv[1:-1]):
+        return sys.argv[sys.argv.index(name)+1]
+    return default
+
 #Used to get the PCB's serial number and ensure it is valid
 def getSN(snlen):
     #Get the SN from the user
@@ -1009,6 +1365,16 @@ def getSN(snlen):
             i = False       
     return sn
 
+#Reads a GPIO input without blocking the event loop
+async def gpioInputAsync(GPIO,pinDict,pinValue):
+    loop=asyncio.get_event_loop()
+    return await loop.run_in_executor(None,GPIO.input,pinDict[pinValue])
+
+#Sets a GPIO output without blocking the event loop
+async def gpioOutputAsync(GPIO,pinDict,pinValue,state):
+    loop=asyncio.get_event_loop()
+    return await loop.run_in_executor(None,GPIO.output,pinDict[pinValue],state)
+
 #Magnet Switch Test
 #Asks user to trigger the switch then compares the trigger time to current time
 def magSWCheck(x2,mbRetries,mbDictName,magSWNum):
@@ -1028,26 +1394,25 @@ def magSWCheck(x2,mbRetries,mbDictName,magSWNum):
             done=True
         else:
             logging.important("\nYou must enter y or n for you response. Please try again.\n")
-            #Turn off the Wi-Fi so it doesn't interfere on the RS-485 bus
-            enableDisable(x2,mbRetries,"WiFiPwr_OF","Wi-Fi Module",0)
 
-    #Turn off the Wi-Fi so it doesn't interfere on the RS-485 bus
-    enableDisable(x2,mbRetries,"WiFiPwr_OF","Wi-Fi Module",0)
+    #The magnet wakeup turns the Wi-Fi on, so the switch bank's state for it is no longer known
+    x2.wifi.wake(x2.address)
+    x2.switches.forget("WiFiPwr_OF")
+    disableWifi(x2,mbRetries)
 
     #Check the time since last magnet and ensure it was recent
     #Read the current device time
-    TimeReadResult = mbReadRetries(x2,Reg.mbReg["ReadTime"][0],Reg.mbReg["ReadTime"][1],retries=mbRetries) #Read from the X2
+    TimeReadResult = mbReadValueRetries(x2,"ReadTime",retries=mbRetries) #Read from the X2
     if(TimeReadResult):
-        readTime=[TimeReadResult[0],TimeReadResult[1]] #The first two 16 bits are the time, the next two are the tz offset
-        convResult1 = combineFrom16Bits(readTime) #Convert to a single 32-bit time
+        [convResult1,tzOffset]=TimeReadResult[0] #The 32-bit time followed by the tz offset
         formatedDateTime1 = time.strftime('%Y-%m-%d %H:%M:%S',time.gmtime(convResult1)) # Convert from Epoch to readable
         logging.debug("The device's original time is %s\n",formatedDateTime1)
 
         #Read the time the magnet was last triggered
         logging.debug("Reading the time since last magnet trigger...")
-        magnetTimeReadResult = mbReadRetries(x2,Reg.mbReg[mbDictName][0],Reg.mbReg[mbDictName][1],retries=mbRetries) #Read from the X2
+        magnetTimeReadResult = mbReadValueRetries(x2,mbDictName,retries=mbRetries) #Read from the X2
         if(magnetTimeReadResult):
-            convResult2=combineFrom16Bits(magnetTimeReadResult) #Convert to a single 32-bit time
+            convResult2=magnetTimeReadResult[0] #The 32-bit time
             formatedDateTime2 = time.strftime('%Y-%m-%d %H:%M:%S',time.gmtime(convResult2)) # Convert from Epoch to readable
             logging.debug("The last magnet read time is %s\n",formatedDateTime2)
 
@@ -1071,58 +1436,277 @@ def magSWCheck(x2,mbRetries,mbDictName,magSWNum):
 
     return [magReadStat,timeDiff,magLEDStat]
 
+#Readable name of the request type for the log
+def mbAction(request):
+    if(request[1]==Mb.FC_WRITE_MULTIPLE):
+        return "Writing"
+    if(request[1]==Mb.FC_READ_WRITE):
+        return "Writing and reading"
+    return "Reading"
+
+#Checks with the circuit breaker that another attempt should be sent
+def mbAttemptAllowed(device,key,request,attempt):
+    breaker=getattr(device,"breaker",None)
+    if(breaker and not breaker.allow()): #Board isn't answering so don't wait on another timeout
+        breaker.recordShortCircuit()
+        logging.debug("%s %s skipped - the board is not responding",mbAction(request),key)
+        tracer=getattr(device,"tracer",None)
+        if(tracer):
+            tracer.record(key,request[0],request[1],0,0,0,attempt,Trace.SKIPPED)
+        return False
+    return True
+
+#Records the result of a single attempt with the device's policy, circuit breaker and tracer
+def mbAttemptResult(device,key,request,response,attempt,latency,error=None):
+    policy=getattr(device,"policy",None)
+    breaker=getattr(device,"breaker",None)
+    tracer=getattr(device,"tracer",None)
+    wifi=getattr(device,"wifi",None)
+    if(wifi):
+        wifi.record(mbOutcome(error))
+    if(policy and not (wifi and wifi.possible())): #Latencies with the Wi-Fi on would raise the learned timeouts for every board
+        policy.record(key,latency,error is None,attempt)
+    if(tracer):
+        tracer.record(key,request[0],request[1],len(request),len(response or b''),latency,attempt,mbOutcome(error))
+    if(breaker):
+        if(isinstance(error,IOError)): #Nothing came back
+            breaker.recordTimeout()
+        else: #Something came back even if it was corrupt
+            breaker.recordResponse()
+
+#Classifies the result of an attempt for the tracer
+def mbOutcome(error):
+    if(error is None):
+        return Trace.OK
+    if(isinstance(error,Mb.SlaveException)):
+        return Trace.EXCEPTION
+    if(isinstance(error,Mb.CrcError)):
+        return Trace.CRC
+    if(isinstance(error,ValueError)):
+        return Trace.BAD_FRAME
+    return Trace.TIMEOUT
+
 #This function is used to gracefully handle failed float value reads and allow retries 
-def mbReadFloatRetries(device,reg,numReg=2,retries=5): #(Minimalmodbus device),(Register address),(Number of registers to read),(Retry attempts)
-    for i in range (0,retries):
-        try:
-            device.serial.flushInput() #clear serial buffer before reading
-            result=device.read_float(reg,functioncode=4,numberOfRegisters=numReg)
-            result=round(result,3)
-            break #if it gets past the read without causing an exception exit the loop as the read was successful
-        except:
-            logging.debug("Reading %d Failed",i)
-            pass #Continue running the code without exiting the program if the read was not successful
-    else: #If it exits normally that means it failed every time
+def mbReadFloatRetries(device,reg,numReg=2,retries=5): #(Modbus device),(Register address),(Number of registers to read),(Retry attempts)
+    [request,responseLength]=Mb.getReadFrame(device.address,reg,numReg) #Prebuilt request
+    response=mbTransactRetries(device,Reg.regKey.get((reg,numReg,4),hex(reg)),request,responseLength,retries)
+    if(response==False):
+        return False
+    result=Codec.float32.unpack_from(response,3)[0] #Data starts after address, function code, byte count
+    result=round(result,3)
+    return [result]
+#Returns False if it fails and the read values if successful
+
+#Same as mbReadFloatRetries, but can be awaited
+async def mbReadFloatRetriesAsync(device,reg,numReg=2,retries=5): #(Modbus device with an asyncBus),(Register address),(Number of registers to read),(Retry attempts)
+    [request,responseLength]=Mb.getReadFrame(device.address,reg,numReg) #Prebuilt request
+    response=await mbTransactRetriesAsync(device,Reg.regKey.get((reg,numReg,4),hex(reg)),request,responseLength,retries)
+    if(response==False):
         return False
+    result=Codec.float32.unpack_from(response,3)[0] #Data starts after address, function code, byte count
+    result=round(result,3)
     return [result]
 #Returns False if it fails and the read values if successful
 
+#Reads a set of keys with the fewest requests the register map allows and decodes them by type
+def mbReadKeysRetries(device,keys,retries=5): #(Modbus device),(List of mbReg keys),(Retry attempts)
+    values={}
+    for block in Reg.mbReg.plan(keys):
+        [request,responseLength]=Mb.getReadFrame(device.address,block.start,block.numReg) #Prebuilt request
+        response=mbTransactRetries(device,Reg.regKey.get((block.start,block.numReg,4),"+".join(block.keys)),request,responseLength,retries)
+        if(response==False):
+            return False
+        values.update(Codec.block(block).decode(response,3)) #Data starts after address, function code, byte count
+    return values
+#Returns False if any request fails and a dictionary of the values by mbReg key if successful
+
 #This function is used to gracefully handle failed reads and allow retries 
-def mbReadRetries(device,reg,numReg=1,retries=5): #(Minimalmodbus device),(Register address),(Number of registers to read),(Retry attempts)
-    for i in range (0,retries):
-        try:
-            device.serial.flushInput() #clear serial buffer before reading
-            result=device.read_registers(reg,numReg,functioncode=4)
-            break #if it gets past the read without causing an exception exit the loop as the read was successful
-        except:
-            logging.debug("Reading %d Failed",i)
-            pass #Continue running the code without exiting the program if the read was not successful
-    else: #If it exits normally that means it failed every time
+def mbReadRetries(device,reg,numReg=1,retries=5): #(Modbus device),(Register address),(Number of registers to read),(Retry attempts)
+    [request,responseLength]=Mb.getReadFrame(device.address,reg,numReg) #Prebuilt request
+    response=mbTransactRetries(device,Reg.regKey.get((reg,numReg,4),hex(reg)),request,responseLength,retries)
+    if(response==False):
         return False
+    result=list(Codec.words(numReg).unpack_from(response,3)) #Data starts after address, function code, byte count
     return result
 #Returns False if it fails and the read values if successful
 
-#This function is used to gracefully handle failed writes and allow retries 
-def mbWriteRetries(device,reg,value,retries=5): #(Minimalmodbus device),(Register address),(List of values to write),(Retry attempts)
+#Same as mbReadRetries, but can be awaited
+async def mbReadRetriesAsync(device,reg,numReg=1,retries=5): #(Modbus device with an asyncBus),(Register address),(Number of registers to read),(Retry attempts)
+    [request,responseLength]=Mb.getReadFrame(device.address,reg,numReg) #Prebuilt request
+    response=await mbTransactRetriesAsync(device,Reg.regKey.get((reg,numReg,4),hex(reg)),request,responseLength,retries)
+    if(response==False):
+        return False
+    result=list(Codec.words(numReg).unpack_from(response,3)) #Data starts after address, function code, byte count
+    return result
+#Returns False if it fails and the read values if successful
+
+#Reads the whole telemetry block in one request and splits it into named values
+#Floats are rounded, single registers are returned as is
+#and the internal sensor registers are returned as [pressure,temperature,humidity]
+#The register map plans the block as a single read and it is decoded with one unpack
+def mbReadSnapshot(device,retries=5): #(Modbus device),(Retry attempts)
+    snapshot=mbReadKeysRetries(device,Reg.telemetryBlock,retries)
+    if(snapshot==False):
+        return False
+    return roundSnapshot(snapshot)
+#Returns False if it fails and a dictionary of the values by mbReg key if successful
+
+#Reads one key and decodes it by the type given in the register table
+def mbReadValueRetries(device,key,retries=5): #(Modbus device),(mbReg key),(Retry attempts)
+    [reg,numReg]=Reg.mbReg[key][0:2]
+    [request,responseLength]=Mb.getReadFrame(device.address,reg,numReg) #Prebuilt request
+    response=mbTransactRetries(device,key,request,responseLength,retries)
+    if(response==False):
+        return False
+    return [Codec.decode(key,response,3)] #Data starts after address, function code, byte count
+#Returns False if it fails and [value] if successful (a clock is [[UTC time, time zone offset]])
+
+#Works out the timeout and number of attempts for a request from the device's learned policy
+def mbRetryPlan(device,key,retries):
+    timeout=device.timeout
+    policy=getattr(device,"policy",None)
+    if(policy):
+        timeout=policy.timeout(key,timeout)
+        retries=policy.retries(key,retries)
+    wifi=getattr(device,"wifi",None)
+    if(wifi):
+        timeout=wifi.timeout(timeout) #Only raised while a Wi-Fi module may be on
+    return [timeout,retries]
+
+#The retry logic shared by mbTransactRetries and mbTransactRetriesAsync, which only differ in how they wait on the bus
+#Yields the timeout for each attempt and is sent back [response, None] or [None, the error the attempt raised]
+#If the device has a learned policy, the timeout and number of attempts come from the register's history
+#Reads are answered from the device's prefetch cache if a fresh response was read ahead (unless cached is False)
+#and any other request clears the cache since it may change what was read
+def mbRetrySteps(device,key,request,retries,cached):
+    action=mbAction(request)
+    cache=getattr(device,"cache",None)
+    if(cache):
+        if(request[1]!=Mb.FC_READ_INPUT):
+            cache.invalidate()
+        elif(cached):
+            response=cache.take(request)
+            if(response):
+                logging.debug("%s %s answered from the prefetch",action,key)
+                return response
+    [timeout,retries]=mbRetryPlan(device,key,retries)
     for i in range (0,retries):
+        if(not mbAttemptAllowed(device,key,request,i)):
+            return False
+        sendTime=time.time()
+        [response,error]=yield timeout
+        if(error is None):
+            mbAttemptResult(device,key,request,response,i,time.time()-sendTime)
+            return response
+        mbAttemptResult(device,key,request,None,i,time.time()-sendTime,error)
+        logging.debug("%s %d Failed",action,i)
+        if(request[1]==Mb.FC_READ_WRITE and isinstance(error,Mb.SlaveException) and error.code==Mb.ILLEGAL_FUNCTION):
+            raise error #The firmware doesn't have function code 23 so retrying won't help. The caller sends two requests instead.
+    return False #It failed every time
+#Returns False if it fails and the raw response if successful
+
+#Sends a prebuilt request and allows retries. Used by all of the read and write functions above.
+def mbTransactRetries(device,key,request,responseLength,retries=5,cached=True): #(Modbus device),(mbReg key),(Request bytes),(Expected response length),(Retry attempts),(Use a response read ahead)
+    steps=mbRetrySteps(device,key,request,retries,cached)
+    try:
+        timeout=next(steps)
+        while True:
+            try:
+                response=device.bus.transact(request,responseLength,timeout)
+            except Exception as error: #Continue running the code without exiting the program if the transaction was not successful
+                timeout=steps.send([None,error])
+            else:
+                timeout=steps.send([response,None])
+    except StopIteration as result:
+        return result.value
+#Returns False if it fails and the raw response if successful
+
+#Same as mbTransactRetries, but waits on the bus without blocking so other work can run
+async def mbTransactRetriesAsync(device,key,request,responseLength,retries=5,cached=True): #(Modbus device with an asyncBus),(mbReg key),(Request bytes),(Expected response length),(Retry attempts),(Use a response read ahead)
+    steps=mbRetrySteps(device,key,request,retries,cached)
+    try:
+        timeout=next(steps)
+        while True:
+            try:
+                response=await device.asyncBus.transact(request,responseLength,timeout)
+            except Exception as error:
+                timeout=steps.send([None,error])
+            else:
+                timeout=steps.send([response,None])
+    except StopIteration as result:
+        return result.value
+#Returns False if it fails and the raw response if successful
+
+#Writes registers and reads keys back in a single request (function code 23) when the firmware has it
+#Firmware without it answers the first one with an illegal function exception, after which a write
+#followed by a read is sent instead. settle is the pause between the two in that case.
+#If the keys need more than one read, the first read goes with the write and the rest are read after.
+def mbWriteReadRetries(device,writeReg,value,readKeys,retries=5,settle=0): #(Modbus device),(Register address to write),(List of values to write),(List of mbReg keys to read),(Retry attempts),(Seconds between a separate write and read)
+    blocks=Reg.mbReg.plan(readKeys)
+    if(device.writeRead!=False):
+        block=blocks[0]
+        [request,responseLength]=Mb.getWriteReadFrame(device.address,writeReg,value,block.start,block.numReg) #Prebuilt header plus the values
+        key="%s>%s" % (Reg.regKey.get((writeReg,len(value),16),hex(writeReg)),Reg.regKey.get((block.start,block.numReg,4),"+".join(block.keys)))
         try:
-            device.serial.flushInput() #clear serial buffer before writing
-            device.write_registers(reg,value)
-            break #if it gets past the read without causing an exception exit the loop as the read was successful
-        except:
-            logging.debug("Writing %d Failed",i)
-            pass #Continue running the code without exiting the program if the read was not successful
-    else: #If it exits normally that means it failed every time
+            response=mbTransactRetries(device,key,request,responseLength,retries)
+        except Mb.SlaveException:
+            logging.debug("Slave %d doesn't have function code 23. Writes and reads will be sent separately.",device.address)
+            device.writeRead=False
+        else:
+            if(response==False):
+                return False
+            device.writeRead=True
+            values=Codec.block(block).decode(response,3) #Data starts after address, function code, byte count
+            if(len(blocks)>1):
+                rest=mbReadKeysRetries(device,[restKey for restBlock in blocks[1:] for restKey in restBlock.keys],retries)
+                if(rest==False):
+                    return False
+                values.update(rest)
+            return [value,values]
+
+    if(mbWriteRetries(device,writeReg,value,retries)==False):
+        return False
+    time.sleep(settle)
+    values=mbReadKeysRetries(device,readKeys,retries)
+    if(values==False):
+        return False
+    return [value,values]
+#Returns False if the write or the read fails and [values written, dictionary of the values read by mbReg key] if successful
+
+#This function is used to gracefully handle failed writes and allow retries 
+def mbWriteRetries(device,reg,value,retries=5): #(Modbus device),(Register address),(List of values to write),(Retry attempts)
+    [request,responseLength]=Mb.getWriteFrame(device.address,reg,value) #Prebuilt header plus the values
+    if(mbTransactRetries(device,Reg.regKey.get((reg,len(value),16),hex(reg)),request,responseLength,retries)==False):
         return False
     return value
 #Returns False if it fails and the values that were written if successful
 
+#Same as mbWriteRetries, but can be awaited
+async def mbWriteRetriesAsync(device,reg,value,retries=5): #(Modbus device with an asyncBus),(Register address),(List of values to write),(Retry attempts)
+    [request,responseLength]=Mb.getWriteFrame(device.address,reg,value) #Prebuilt header plus the values
+    if(await mbTransactRetriesAsync(device,Reg.regKey.get((reg,len(value),16),hex(reg)),request,responseLength,retries)==False):
+        return False
+    return value
+#Returns False if it fails and the values that were written if successful
+
+#Adds the module to the list if the circuit breaker skipped any of its Modbus requests
+def noteShortCircuits(x2,moduleNumber,shortCircuited):
+    if(x2.breaker.newShortCircuits()):
+        shortCircuited.append("Mod%d" % (moduleNumber+1))
+
 #Used to check the current status of the PCB's power and disable power if it is on
-def powerOff(GPIO,pinDict,pinValue,delay=5):
+def powerOff(x2,GPIO,pinDict,pinValue,delay=5):
     logging.debug("Powering %s off...",pinValue)
     if(GPIO.input(pinDict[pinValue])== 1):
         GPIO.output(pinDict[pinValue],GPIO.LOW)
         time.sleep(delay)
+
+        #The switches may be back to their power on state
+        #The Wi-Fi is off with the rest of the board
+        if(pinValue!="IO4"):
+            x2.switches.invalidate()
+            x2.cache.invalidate()
+            x2.wifi.powerOff(x2.address)
     return True
 
 #Used to check the current status of the PCB's power and enable power if it is off
@@ -1134,21 +1718,40 @@ def powerOn(x2,mbRetries,GPIO,pinDict,pinValue,delay=3):
         #Not sure reason, but possible execution speed is faster in cmd line
         time.sleep(delay)
 
+        #Let a board that stopped responding be probed again
+        #The switches may be back to their power on state and the Wi-Fi may be on
+        if(pinValue!="IO4"):
+            x2.breaker.powerEvent()
+            x2.switches.invalidate()
+            x2.cache.invalidate()
+            x2.wifi.powerEvent(x2.address)
+
         #If not turning on T-Node disable the Wi-Fi
         if(pinValue!="IO4"):
-            #Turn off the Wi-Fi so it doesn't interfere on the RS-485 bus
-            enableDisable(x2,mbRetries,"WiFiPwr_OF","Wi-Fi Module",0)
+            disableWifi(x2,mbRetries)
             
     return True
 
+#Reads keys into the device's prefetch cache. Runs on the prefetch thread while the main thread waits on the operator.
+#Nothing is read if the board is off, isn't answering or may have its Wi-Fi on, so the prompt never costs a timeout.
+def prefetchReads(GPIO,pinDict,x2,keys):
+    if(GPIO.input(pinDict["IO1"])==0 or not x2.breaker.allow() or x2.wifi.possible()):
+        return
+    for block in Reg.mbReg.plan(keys):
+        [request,responseLength]=Mb.getReadFrame(x2.address,block.start,block.numReg) #Prebuilt request
+        response=mbTransactRetries(x2,Reg.regKey.get((block.start,block.numReg,4),"+".join(block.keys)),request,responseLength,1,cached=False)
+        if(response==False):
+            return
+        x2.cache.store(request,response)
+
 #Tests the voltage and valid line status for a power input channel
 def prioPwrChannelTest(GPIO,pinDict,x2,mbRetries,mbDictName,validCheck,validValue):
 
-    #Read the Channel Voltage
+    #Read the telemetry snapshot (Channel Voltage and Valid Lines)
     logging.debug("Reading Channel Voltage...")
-    readResult1 = mbReadFloatRetries(x2,Reg.mbReg[mbDictName][0],Reg.mbReg[mbDictName][1],retries=mbRetries)
-    if(readResult1):
-        chVoltage=readResult1[0]
+    snapshot = mbReadSnapshot(x2,retries=mbRetries)
+    if(snapshot):
+        chVoltage=snapshot[mbDictName]
         logging.debug("The channel voltage level is %.3f\n",chVoltage)
         
         #Check if voltage is in range
@@ -1162,16 +1765,15 @@ def prioPwrChannelTest(GPIO,pinDict,x2,mbRetries,mbDictName,validCheck,validValu
     if(validCheck):#Only try if the 3.3V SEPIC was turned on successfully
         #Read the Valid Lines
         logging.debug("\nReading the valid lines")
-        readResult2 = mbReadRetries(x2,Reg.mbReg["Valid"][0],Reg.mbReg["Valid"][1],retries=mbRetries)
-        if(readResult2):
-            logging.debug("The valid lines read %s",bin(readResult2[0]))
-            if(readResult2[0]== validValue): #If read was successful check the correct lines are enabled
+        if(snapshot):
+            logging.debug("The valid lines read %s",bin(snapshot["Valid"]))
+            if(snapshot["Valid"]== validValue): #If read was successful check the correct lines are enabled
                 logging.debug("The correct valid lines were enabled\n")
-                chValid=readResult2[0]
+                chValid=snapshot["Valid"]
                 chValidStat=True
             else:
                 logging.debug("The incorrect valid lines were enabled")
-                chValid=readResult2[0]
+                chValid=snapshot["Valid"]
                 chValidStat=False
         else:
             logging.debug("Reading the valid lines was not successful")
@@ -1202,11 +1804,213 @@ def readAnalog(spi,ch,scale=1): #ch must be 0-7
 
     return scaledVolts
 
+#Same as readAnalog, but the SPI transfer runs off the event loop so it can be awaited
+async def readAnalogAsync(spi,ch,scale=1):
+    loop=asyncio.get_event_loop()
+    return await loop.run_in_executor(None,readAnalog,spi,ch,scale)
+
+#Rounds the floats in a dictionary of telemetry values to the 3 decimal places the results are kept to
+def roundSnapshot(snapshot):
+    for key in snapshot:
+        if(Reg.mbReg[key].type=="float"):
+            if(isinstance(snapshot[key],list)):
+                snapshot[key]=[round(value,3) for value in snapshot[key]]
+            else:
+                snapshot[key]=round(snapshot[key],3)
+    return snapshot
+
+#Tests several boards on one RS-485 bus at the same time
+#Every X2 also answers on the universal address, so each board is connected by itself first and
+#given its own address. Then all of the boards are connected and each one is tested in its own
+#thread. Requests wait their turn on the bus in the order they were made, so while one board is
+#settling the bus is used by the others. Only modules that test the board over Modbus are run,
+#since the power, ADC and trigger lines are shared by every board on the harness.
+def runMultiDrop(bus,x2,GPIO,pinDict,mbRetries,modbusTimeout,boards,baseAddress,snlen,moduleToTest,resultsFolder):
+    #[Module index, Module name, Test function, CSV columns, Indexes of the status results]
+    #Every board on the harness is powered by IO1, so these modules must never toggle it. Their
+    #powerOn calls only pass because IO1 is already high. A module that power cycles would cycle every board.
+    modules=[[3,"Mod4  - 3.3V SEPIC Converter",test33SEPIC,["3.3V SEPIC Status","3.3V SEPIC Voltage"],[0]],
+             [5,"Mod6  - SD Card",testSDCard,["SD Card Status"],[0]],
+             [7,"Mod8  - System Current",testSysCur,["System Current Status","System Current Value"],[0]],
+             [8,"Mod9  - 12V SEPIC Converter",test12SEPIC,["12V SEPIC Status","12V SEPIC Voltage"],[0]],
+             [11,"Mod12 - Sensor Current",testSenCur,["12V Sensor Current Status","12V Sensor Current Value"],[0]],
+             [14,"Mod15 - Pressure/Temp/Humidity Chip",testpressTempHum,["Pressure/Temp/Humidity Chip Status",
+                                                                        "Pressure Status","Pressure Reading",
+                                                                        "Temperature Status","Temperature Reading",
+                                                                        "Humidity Status","Humidity Reading"],[0,1,3,5]]]
+    #The other modules need the fixture's pins, ADC or power switching on a single board, so they aren't run here
+    #They are named in the results so the boards aren't taken as fully tested
+    notTested=["Mod%d" % (i+1) for i in range(0,len(moduleToTest))
+               if moduleToTest[i] and i not in [module[0] for module in modules]]
+    if(notTested):
+        logging.important("Not tested in multi-drop mode, test these one board at a time: %s"," ".join(notTested))
+    modules=[module for module in modules if moduleToTest[module[0]]]
+    if(baseAddress+boards>x2.address):
+        raise ValueError("Only %d boards can be given addresses starting at %d" % (x2.address-baseAddress,baseAddress))
+
+    #Open the results file
+    os.makedirs(resultsFolder,exist_ok=True)
+    date = datetime.datetime.now().strftime("%Y.%m.%d")
+    filename=resultsFolder+date+"_PCBTestResultsMultiDrop.csv"
+    if(os.path.isfile(filename)):
+        out_records=open(filename, 'a')
+    else:
+        out_records=open(filename, 'w')
+        out_records.write("Serial Number,Address,")
+        for module in modules:
+            out_records.write("".join("%s," % column for column in module[3]))
+        out_records.write("Itteration Time,Modules Skipped Due To No Response,Modules Not Tested In Multi-Drop,\n")
+
+    try:
+        sn = ""
+        while(sn != "-1"):
+            #Give each board its own address
+            slots=[]
+            for slot in range(0,boards):
+                logging.important("\nBoard %d of %d - Connect this board to the tester by itself",slot+1,boards)
+                sn = getSN(snlen)
+                if(sn == "-1"):
+                    break
+                powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
+                if(assignAddress(GPIO,pinDict,x2,mbRetries,baseAddress+slot)):
+                    device=Mb.MbDevice(bus,baseAddress+slot,modbusTimeout)
+                    device.policy=x2.policy
+                    device.tracer=x2.tracer
+                    device.breaker=Pol.CircuitBreaker(x2.breaker.threshold)
+                    device.switches=Mb.SwitchBank()
+                    device.wifi=x2.wifi
+                    device.cache=Prefetch.ReadCache() #Nothing is read ahead for a slot but the power and write hooks clear it
+                    slots.append([sn,device])
+                    logging.important("Board SN: %s is now on address %d",sn,device.address)
+                else:
+                    logging.important("Board SN: %s could not be given address %d and will not be tested",sn,baseAddress+slot)
+                powerOff(x2,GPIO,pinDict,"IO1",delay=1)
+            if(not slots):
+                continue
+
+            #Test every board at once
+            input("\nConnect all %d boards to the multi-drop harness and press Enter\n" % len(slots))
+            GPIO.output(pinDict["IO1"],GPIO.HIGH)
+            time.sleep(3) #Same settling time as powerOn
+            for [boardSN,device] in slots:
+                x2.wifi.powerEvent(device.address) #Every board's Wi-Fi may be on until its slot turns it off
+            startTime=time.time()
+            results=[None]*len(slots)
+            threads=[threading.Thread(target=runMultiDropSlot,args=(GPIO,pinDict,slots[i][1],mbRetries,modules,results,i))
+                     for i in range(0,len(slots))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            #Put every board back on address 1, as Mod2 does, so none leave on a multi-drop address
+            #The address is kept in EE so the boards come up on it the next time they are powered
+            for [boardSN,device] in slots:
+                if(mbWriteRetries(device,Reg.mbReg["Add"].reg,[1],retries=mbRetries)==False):
+                    logging.important("Board SN: %s could not be put back on address 1. It will answer on address %d "
+                                      "(and the universal address %d).",boardSN,device.address,x2.address)
+            GPIO.output(pinDict["IO1"],GPIO.LOW)
+            for [boardSN,device] in slots:
+                x2.wifi.powerOff(device.address)
+            setTime=time.time()-startTime
+
+            #Record the results
+            for i in range(0,len(slots)):
+                [boardSN,device]=slots[i]
+                [moduleResults,itterationTime,shortCircuited]=results[i]
+                out_records.write("%s,%d" % (boardSN,device.address))
+                print("----------------------------------------------")
+                for j in range(0,len(modules)):
+                    out_records.write("".join(",%s" % value for value in moduleResults[j]))
+                    status=[moduleResults[j][k] for k in modules[j][4]]
+                    logging.important("Board SN: %s - %s: %s",boardSN,modules[j][1],
+                                      "Pass" if all(value=="Pass" for value in status) else ", ".join(str(value) for value in status))
+                out_records.write(",%s,%s,%s\n" % (itterationTime," ".join(shortCircuited) or "None"," ".join(notTested) or "None"))
+            out_records.flush()
+            print("----------------------------------------------")
+            logging.important("%d boards were tested in %.1f seconds (%.0f boards per hour)",
+                              len(slots),setTime,len(slots)*3600/max(setTime,0.001))
+            logging.info(x2.tracer.endBoard()) #Where this set's time went on the bus
+            input("\nThe boards have finished testing.\n"
+                  "Please disconnect the PCBs now.\n\n"
+                  "Press Enter to continue\n")
+    finally:
+        out_records.close()
+
+#Runs the multi-drop modules on one board. Called in its own thread by runMultiDrop.
+def runMultiDropSlot(GPIO,pinDict,device,mbRetries,modules,results,slot):
+    startTime=time.time()
+    disableWifi(device,mbRetries)
+    moduleResults=[]
+    shortCircuited=[]
+    for [moduleNumber,moduleName,testFunction,columns,statusIndexes] in modules:
+        try:
+            result=list(testFunction(GPIO,pinDict,device,mbRetries))
+        except Exception as error:
+            result=["Fail-%s" % error]
+        moduleResults.append((result+["-999999"]*len(columns))[0:len(columns)]) #Always fill every column
+        noteShortCircuits(device,moduleNumber,shortCircuited)
+    results[slot]=[moduleResults,round(time.time()-startTime,1),shortCircuited]
+
 #Calculate voltage divider scaling value
 #This gives the value to multiply by 3.3 to get actual voltage
 def scaleValue(R1,R2):
     return ((R1+R2)/R2)
 
+#Finds every slave answering on the bus by reading the address register on 1-255
+#(0 is the broadcast address, which never answers)
+#A known good address is timed first so each address only waits a little longer than a real
+#slave takes to answer. Anything that answers in the fast pass is read again with the normal
+#timeout and retries to confirm it.
+def scanAddresses(bus,referenceAddress,retries,timeout):
+    probeMin=0.02 #Shortest time to wait on any address
+    probeScale=2.0 #Multiplier on the slowest reference read
+    [regAdd,numRegAdd]=Reg.mbReg["Add"][0:2]
+
+    #Time the known good address
+    latencies=[]
+    for i in range(0,5):
+        [request,responseLength]=Mb.getReadFrame(referenceAddress,regAdd,numRegAdd)
+        try:
+            sendTime=time.time()
+            bus.transact(request,responseLength,timeout)
+            latencies.append(time.time()-sendTime)
+        except Exception:
+            pass
+    if(latencies):
+        probeTimeout=max(probeMin,max(latencies)*probeScale)
+        logging.debug("Slave %d answered in %.1f ms. Waiting %.1f ms on each address",
+                      referenceAddress,max(latencies)*1000,probeTimeout*1000)
+    else:
+        probeTimeout=max(probeMin,timeout/5)
+        logging.debug("Slave %d did not answer. Waiting %.1f ms on each address",referenceAddress,probeTimeout*1000)
+
+    #Fast pass over every address. Anything that comes back, even corrupted, is a candidate.
+    startTime=time.time()
+    candidates=[]
+    for address in range(1,256):
+        [request,responseLength]=Mb.getReadFrame(address,regAdd,numRegAdd)
+        try:
+            bus.transact(request,responseLength,probeTimeout)
+            candidates.append(address)
+        except IOError:
+            pass #Nothing there
+        except ValueError:
+            candidates.append(address) #Something answered
+    logging.debug("Fast pass took %.1f seconds and found %d candidates",time.time()-startTime,len(candidates))
+
+    #Confirm the candidates with the normal timeout
+    found=[]
+    for address in candidates:
+        device=Mb.MbDevice(bus,address,timeout)
+        readResult=mbReadRetries(device,regAdd,numRegAdd,retries=retries)
+        if(readResult):
+            found.append([address,readResult[0]])
+        else:
+            logging.debug("Slave %d did not answer a second time",address)
+    return found
+#Returns a list of [address, value of the address register] for every slave that was confirmed
+
 #Test an individual sensor port's voltage
 def sensor12VSW(GPIO,pinDict,x2,mbRetries,spi,mbDictName,clearText,spiCh):
     
@@ -1242,19 +2046,21 @@ def sensorTest(x2,mbRetries,RS232Channel):
 
     return [portStatus485,portStatus232,portStatusSDI12]
 
-# This function take a 16,32,48, or 64 bit value and split it into a list of 16-bit values
-def splitInto16Bits(combined):
-    #Take the values and pack and unpack them appropriatly to get a list of 16-bit hex values
-    rawSeparate=struct.unpack('>4H',struct.pack('>Q',combined))
-
-    #Loop through the list and remove any 0 values from the front of the list
-    k=0
-    separate=[]
-    for i in range(0,4):
-        if (rawSeparate[i] != 0):
-            separate.append(rawSeparate[i])
-            k=k+1  
-    return separate
+#Checks the result of a status register read
+def statusResult(readResult,clearText):
+    if(readResult): #if the read was successful
+        if(readResult[0]==1): #check if status was good
+            logging.debug("The %s status is good",clearText)
+            return [readResult[0],"Pass"]
+        elif(readResult[0]==0): #bad
+            logging.debug("The %s status is bad",clearText)
+            return [readResult[0],"Fail-The "+clearText+" status was returned as bad"]
+        else: #or unknown
+            logging.debug("The %s status is unknown",clearText)
+            return [readResult[0],"Fail-The "+clearText+" status was returned as an unknown value"]
+    else:
+        logging.debug("The read was not successful")
+        return [-999999,"Fail-The Modbus read failed. No status received"]
 
 
 
@@ -1274,15 +2080,16 @@ def test12SEPIC(GPIO,pinDict,x2,mbRetries):
 
     #Read the 12V SEPIC voltage
     logging.debug("Reading 12V SEPIC Voltage...")
-    readResult = mbReadFloatRetries(x2,Reg.mbReg["12VSen_V"][0],Reg.mbReg["12VSen_V"][1],retries=mbRetries)
-    if(readResult):
-        logging.debug("The 12V SEPIC voltage level is %.3f\n",readResult[0])
+    values = mbReadKeysRetries(x2,["12VSen_V"],mbRetries) #Reads only this register, not the whole telemetry block
+    if(values):
+        voltage=round(values["12VSen_V"],3)
+        logging.debug("The 12V SEPIC voltage level is %.3f\n",voltage)
 
         #Check if voltage is in range and return the result
-        rangeCheck=valueRangeCheck(12,0.5,readResult[0])#Expected, tolerance, test input
+        rangeCheck=valueRangeCheck(12,0.5,voltage)#Expected, tolerance, test input
 
         enableDisable(x2,mbRetries,"12SEPIC_OF","12V SEPIC",0)#Turn off SEPIC
-        return[rangeCheck[1],readResult[0]]
+        return[rangeCheck[1],voltage]
     else:
         logging.debug("The 12V SEPIC voltage read was not successful\n")
         enableDisable(x2,mbRetries,"12SEPIC_OF","12V SEPIC",0)#Turn off SEPIC
@@ -1335,14 +2142,15 @@ def test33SEPIC(GPIO,pinDict,x2,mbRetries):
 
     #Read the 3.3V SEPIC voltage
     logging.debug("\nReading 3.3V SEPIC Voltage...")
-    readResult = mbReadFloatRetries(x2,Reg.mbReg["VCC33_V"][0],Reg.mbReg["VCC33_V"][1],retries=mbRetries)
-    if(readResult):
-        logging.debug("The 3.3V SEPIC voltage level is %.3f",readResult[0])
+    values = mbReadKeysRetries(x2,["VCC33_V"],mbRetries) #Reads only this register, not the whole telemetry block
+    if(values):
+        voltage=round(values["VCC33_V"],3)
+        logging.debug("The 3.3V SEPIC voltage level is %.3f",voltage)
 
         #Check if voltage is in range and return the result
-        rangeCheck=valueRangeCheck(3.3,0.1,readResult[0])#Expected, tolerance, test input
+        rangeCheck=valueRangeCheck(3.3,0.1,voltage)#Expected, tolerance, test input
 
-        return[rangeCheck[1],readResult[0]]
+        return[rangeCheck[1],voltage]
     else:
         logging.debug("The 3.3V SEPIC voltage read was not successful\n")
         return ["Fail-Reading the 3.3V SEPIC voltage was not successful",-999999]
@@ -1366,12 +2174,8 @@ def test5VLDO(GPIO,pinDict,x2,mbRetries,spi):
     logging.debug("Module Start")
     powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
 
-    #Enable 12V SEPIC
-    if(enableDisable(x2,mbRetries,"12SEPIC_OF","12V SEPIC",1)== False):
-        return ["Fail-Enabling the 12V SEPIC was not successful",-999999]
-
-    #Enable 5V LDO
-    if(enableDisable(x2,mbRetries,"5VLDO_OF","5V LDO",1)):
+    #Enable the 12V SEPIC and the 5V LDO
+    if(enableDisableMany(x2,mbRetries,{"12SEPIC_OF":1,"5VLDO_OF":1},"12V SEPIC & 5V LDO")):
         #If successfully enabled check the output voltage
         logging.debug("\nReading 5V LDO Voltage...")
         scaling=scaleValue(6.04,10)
@@ -1381,13 +2185,12 @@ def test5VLDO(GPIO,pinDict,x2,mbRetries,spi):
         #Check if voltage is in range and return the result
         rangeCheck=valueRangeCheck(5.0,0.1,analog1)#Expected, tolerance, test input
 
-        enableDisable(x2,mbRetries,"5VLDO_OF","5V LDO",0)#Turn off 5V LDO
-        enableDisable(x2,mbRetries,"12SEPIC_OF","12V SEPIC",0)#Turn off 12V SEPIC
+        enableDisableMany(x2,mbRetries,{"12SEPIC_OF":0,"5VLDO_OF":0},"12V SEPIC & 5V LDO")#Turn off 5V LDO & 12V SEPIC
 
         return [rangeCheck[1],analog1]
     else:
-        enableDisable(x2,mbRetries,"12SEPIC_OF","12V SEPIC",0)#Turn off 12V SEPIC
-        return ["Fail-Enabling the 5V LDO was not successful",-999999]
+        enableDisableMany(x2,mbRetries,{"12SEPIC_OF":0,"5VLDO_OF":0},"12V SEPIC & 5V LDO")#Turn off 5V LDO & 12V SEPIC
+        return ["Fail-Enabling the 12V SEPIC & 5V LDO was not successful",-999999]
 
 #Test the K64 LEDs turn on
 def testK64LEDs(GPIO,pinDict,x2,mbRetries):
@@ -1400,7 +2203,7 @@ def testK64LEDs(GPIO,pinDict,x2,mbRetries):
 
     #Enable the Wi-Fi LEDs
     logging.debug("\nTesting the K64 LEDs...")
-    writeResult1 = mbWriteRetries(x2,Reg.mbReg["K64LED"][0],[1],retries=mbRetries)#0 = LEDs on; 1 = LEDs off
+    writeResult1 = mbWriteRetries(x2,Reg.mbReg["K64LED"].reg,[1],retries=mbRetries)#0 = LEDs on; 1 = LEDs off
     if(writeResult1):
         logging.debug("The LEDs were enabled")
 
@@ -1424,7 +2227,7 @@ def testK64LEDs(GPIO,pinDict,x2,mbRetries):
 
     #Turn the LEDs back off
     logging.debug("Turning the LEDs back off...")
-    writeResult2 = mbWriteRetries(x2,Reg.mbReg["K64LED"][0],[0],retries=mbRetries)#0 = LEDs on; 1 = LEDs off
+    writeResult2 = mbWriteRetries(x2,Reg.mbReg["K64LED"].reg,[0],retries=mbRetries)#0 = LEDs on; 1 = LEDs off
     if(writeResult2):
         logging.debug("LEDs were successfully disabled")
     else:
@@ -1433,24 +2236,18 @@ def testK64LEDs(GPIO,pinDict,x2,mbRetries):
     return [LEDStatus]
 
 #Test the magnetic switches are working correctly
-def testMagSW(GPIO,pinDict,x2,mbRetries,modbusTimeout):
+#The Modbus timeout is raised by the Wi-Fi contention tracker only until the Wi-Fi that the
+#magnet wakeup turns on has been turned back off
+def testMagSW(GPIO,pinDict,x2,mbRetries):
     logging.debug("Module Start")
     powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
 
-    #Set the Modbus timeout to 1 seconds to prevent failure since Wi-Fi is turned
-    #on when the magnet wakeup is triggered and we don't have control over timeing
-    #since it depends on the user's input speed
-    x2.serial.timeout = 1
-
     #Get user input for first magnet
     [mag1ReadStat,timeDiff1,mag1LEDStat]= magSWCheck(x2,mbRetries,"MagIntTest0","one")
 
     #Get user input for second magnet
     [mag2ReadStat,timeDiff2,mag2LEDStat]= magSWCheck(x2,mbRetries,"MagIntTest1","two")
 
-    #Set the Modbus timeout back to the program default
-    x2.serial.timeout = modbusTimeout
-
     return [mag1ReadStat,timeDiff1,mag1LEDStat,mag2ReadStat,timeDiff2,mag2LEDStat]
 
 #Test pressure temperature and humidity chip
@@ -1467,32 +2264,22 @@ def testpressTempHum(GPIO,pinDict,x2,mbRetries):
 
     #Read the internal sensor chip's values
     logging.debug("\nReading pressure, temperature, and humidity chip...")
-    readResult = mbReadRetries(x2,Reg.mbReg["ReadInternalSens"][0],Reg.mbReg["ReadInternalSens"][1],retries=mbRetries)
-    if(readResult):
+    snapshot = mbReadSnapshot(x2,retries=mbRetries)
+    if(snapshot):
         sensorStatus="Pass"
         
-        #Convert first two registers to the pressure reading
-        pressureRaw=[readResult[0],readResult[1]]#First two registers are for pressure
-        pressureComb=combineFrom16Bits(pressureRaw)#Combine into a single value
-        pressureValue=round(struct.unpack('!f',bytes.fromhex(hex(pressureComb)[2:]))[0],3)#Convert to IEEE floating point
+        #The snapshot has already converted the registers to IEEE floating point
+        [pressureValue,temperatureValue,humidityValue]=snapshot["ReadInternalSens"]
         logging.debug("\nThe pressure reading is: %.3f mBar\n",pressureValue)
 
         #Check pressure is in range
         [checkState1,pressureStatus]=valueRangeCheck(1000,500,pressureValue)#Expected, tolerance, test input
 
-        #Convert next two registers to the temperature reading
-        temperatureRaw=[readResult[2],readResult[3]]#Next two registers are for temperature
-        temperatureComb=combineFrom16Bits(temperatureRaw)#Combine into a single value
-        temperatureValue=round(struct.unpack('!f',bytes.fromhex(hex(temperatureComb)[2:]))[0],3)#Convert to IEEE floating point
         logging.debug("\nThe temperature reading is: %.3f degrees C\n",temperatureValue)
 
         #Check temperature is in range
         [checkState2,temperatureStatus]=valueRangeCheck(20,15,temperatureValue)#Expected, tolerance, test input
 
-        #Convert last two registers to the humidity reading
-        humidityRaw=[readResult[4],readResult[5]]#Last two registers are for humidity
-        humidityComb=combineFrom16Bits(humidityRaw)#Combine into a single value
-        humidityValue=round(struct.unpack('!f',bytes.fromhex(hex(humidityComb)[2:]))[0],3)#Convert to IEEE floating point
         logging.debug("\nThe humidity reading is: %.3f percent\n",humidityValue)
 
         #Check humidity is in range
@@ -1501,6 +2288,9 @@ def testpressTempHum(GPIO,pinDict,x2,mbRetries):
     else:
         logging.debug("Failed to read from the internal pressure, temperature, humidity chip")
         sensorStatus="Fail-Reading internal sensor was not successful"
+        pressureStatus="Fail-The pressure was not read"
+        temperatureStatus="Fail-The temperature was not read"
+        humidityStatus="Fail-The humidity was not read"
         pressureValue=-999999
         temperatureValue=-999999
         humidityValue=-999999
@@ -1540,8 +2330,8 @@ def testPrioPwrOutSW(GPIO,pinDict,x2,mbRetries,spi):
 def testPrioPwrPathSW(GPIO,pinDict,x2,mbRetries):
     logging.debug("Module Start")
     powerOn(x2,mbRetries,GPIO,pinDict,"IO3",delay=3)#Enable the backup power input
-    powerOff(GPIO,pinDict,"IO1",delay=0)#Ensure Primary input is off
-    powerOff(GPIO,pinDict,"IO2",delay=0)#Ensure Secondary input is off
+    powerOff(x2,GPIO,pinDict,"IO1",delay=0)#Ensure Primary input is off
+    powerOff(x2,GPIO,pinDict,"IO2",delay=0)#Ensure Secondary input is off
 
     #Enable 3.3V SEPIC and set a flag on whether to test the valid lines
     validCheck = enableDisable(x2,mbRetries,"33SEPIC_OF","3.3V SEPIC",1)
@@ -1565,15 +2355,15 @@ def testPrioPwrPathSW(GPIO,pinDict,x2,mbRetries):
     ##Test PPP_1DISCON
     logging.debug("\nTriggering disconnect of Primary Power...\n")
     #Enabled the PPP_1DISCON pin to pull UV of Primary to GND
-    writeResult1 = mbWriteRetries(x2,Reg.mbReg["PPP_Dis"][0],[1],retries=mbRetries)#0 (default) = pri on; 1 = pri off
+    writeResult1 = writeSwitches(x2,mbRetries,{"PPP_Dis":1})#0 (default) = pri on; 1 = pri off
     if(writeResult1):
         logging.debug("The primary power has been disabled")
         #Read the valid lines
-        readResult = mbReadRetries(x2,Reg.mbReg["Valid"][0],Reg.mbReg["Valid"][1],retries=mbRetries)
-        if(readResult):
-            PPP_DisValid=readResult[0]
+        snapshot = mbReadSnapshot(x2,retries=mbRetries)
+        if(snapshot):
+            PPP_DisValid=snapshot["Valid"]
             logging.debug("The valid lines read %s",bin(PPP_DisValid))
-            if(readResult[0]== 0b110): #If read was successful check the correct lines are enabled
+            if(PPP_DisValid== 0b110): #If read was successful check the correct lines are enabled
                 logging.debug("The correct valid lines were enabled")
                 PPP_DisStatus="Pass"
             else:
@@ -1586,7 +2376,7 @@ def testPrioPwrPathSW(GPIO,pinDict,x2,mbRetries):
 
         #Unset the Priority Power disconnect to prevent an unnecessary power cycle
         logging.debug("Re-enabling the primary power input...")
-        writeResult2 = mbWriteRetries(x2,Reg.mbReg["PPP_Dis"][0],[0],retries=mbRetries)#0=pri on; 1=pri off
+        writeResult2 = writeSwitches(x2,mbRetries,{"PPP_Dis":0})#0=pri on; 1=pri off
         if(writeResult2):
             time.sleep(1)#Pause to make sure it is back online before continuing
             logging.debug("The primary power has been enabled")
@@ -1598,8 +2388,8 @@ def testPrioPwrPathSW(GPIO,pinDict,x2,mbRetries):
         PPP_DisValid=-999999
     
     #Disable secondary and backup inputs
-    powerOff(GPIO,pinDict,"IO2",delay=0)
-    powerOff(GPIO,pinDict,"IO3",delay=0)
+    powerOff(x2,GPIO,pinDict,"IO2",delay=0)
+    powerOff(x2,GPIO,pinDict,"IO3",delay=0)
 
     return [bakStat,bakVoltage,bakValid,secStat,secVoltage,secValid,priStat,priVoltage,priValid,PPP_DisStatus,PPP_DisValid]
 
@@ -1611,7 +2401,7 @@ def testProcEEAndRS485(GPIO,pinDict,x2,mbRetries):
 
     #Read the current address
     logging.debug("\nReading address...")
-    readResult1 = mbReadRetries(x2,Reg.mbReg["Add"][0],Reg.mbReg["Add"][1],retries=mbRetries)
+    readResult1 = mbReadRetries(x2,Reg.mbReg["Add"].reg,Reg.mbReg["Add"].numReg,retries=mbRetries)
     if(readResult1):
         logging.debug("The device's original address is %d\n",readResult1[0])
     else:
@@ -1621,7 +2411,7 @@ def testProcEEAndRS485(GPIO,pinDict,x2,mbRetries):
     #Write a new address
     logging.debug("Writing address...")
     if(readResult1[0]==1): #If the current address is already 1, change to 2, then back to 1
-        writeResult1 = mbWriteRetries(x2,Reg.mbReg["Add"][0],[2],retries=mbRetries)
+        writeResult1 = mbWriteRetries(x2,Reg.mbReg["Add"].reg,[2],retries=mbRetries)
         if(writeResult1):
             logging.debug("The device's new address is %d",writeResult1[0])
         else:
@@ -1631,13 +2421,13 @@ def testProcEEAndRS485(GPIO,pinDict,x2,mbRetries):
         #Cycle the power to confirm address is written to and can be read from EE
         logging.debug("\nTesting EE Chip")
         logging.debug("Power cycling to confirm EE works...")
-        powerOff(GPIO,pinDict,"IO1")
+        powerOff(x2,GPIO,pinDict,"IO1")
         logging.debug("Power off")
         powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
         logging.debug("Power on\n")
 
         #Read address and confirm it is still 2 after the power cycle
-        readResult2 = mbReadRetries(x2,Reg.mbReg["Add"][0],Reg.mbReg["Add"][1],retries=mbRetries)
+        readResult2 = mbReadRetries(x2,Reg.mbReg["Add"].reg,Reg.mbReg["Add"].numReg,retries=mbRetries)
         if(readResult2):
             logging.debug("The devices address is now %d",readResult2[0])
             if(readResult2[0]==2):
@@ -1651,26 +2441,20 @@ def testProcEEAndRS485(GPIO,pinDict,x2,mbRetries):
             EEResult = "Fail-EE not tested"
             return ["Fail-Reading address after EE power cycle was not successful",EEResult]
         
-        #Change the address back to 1
-        writeResult2 = mbWriteRetries(x2,Reg.mbReg["Add"][0],[1],retries=mbRetries)#Change address back to 1
-        if(writeResult2):
+        #Change the address back to 1 and confirm it in the same request
+        #Without the pause the address doesn't read back right when the write and read are sent separately
+        writeReadResult = mbWriteReadRetries(x2,Reg.mbReg["Add"].reg,[1],["Add"],retries=mbRetries,settle=0.01)
+        if(writeReadResult):
+            [writeResult2,readResult3]=writeReadResult
             logging.debug("The device's address was set back to %d",writeResult2[0])
-        else:
-            logging.debug("The write was not successful")
-            return ["Fail-Changing address back to 1 was not successful",EEResult]
-        time.sleep(0.01) #Without this the address doesn't read back right
-
-        #Confirm the address is 1
-        readResult3 = mbReadRetries(x2,Reg.mbReg["Add"][0],Reg.mbReg["Add"][1],retries=mbRetries)
-        if(readResult3):
-            logging.debug("The device's final address is %d",readResult3[0])
+            logging.debug("The device's final address is %d",readResult3["Add"])
             return ["Pass",EEResult]
         else:
-            logging.debug("Resetting the address to %d was not successful" % writeResult2[0])
-            return ["Fail-Final read was not successful",EEResult]
+            logging.debug("Changing the address back to 1 was not successful")
+            return ["Fail-Changing address back to 1 was not successful",EEResult]
 
     else: #If the address is anything besides 1, change to 1
-        writeResult3 = mbWriteRetries(x2,Reg.mbReg["Add"][0],[1],retries=mbRetries)
+        writeResult3 = mbWriteRetries(x2,Reg.mbReg["Add"].reg,[1],retries=mbRetries)
         if(writeResult3):
             logging.debug("The device's new address is %d",writeResult3[0])
             return ["Pass","Pass"] #Assume EE is OK, since address started as a non default value (1)
@@ -1679,18 +2463,45 @@ def testProcEEAndRS485(GPIO,pinDict,x2,mbRetries):
             return ["Fail-Writing address was not successful","Pass"] #Assume EE is OK, since address started as a non default value (1)
 
 #Test RS-485 Passthrough
-def testRS485Passthrough(GPIO,pinDict,x2,mbRetries,tnode):
+#Then benchmarks it with bursts of larger reads to catch passthroughs that drop frames or add delay under load
+#The passthrough may add the time to forward both frames once at the bus's baud rate plus the margin
+#A size fails if either device rejects the reads with a Modbus exception since its timing would only be of the exception
+def testRS485Passthrough(GPIO,pinDict,x2,mbRetries,tnode,sizes,burst,margin,baud):
     logging.debug("Module Start")
+    powerOn(x2,mbRetries,GPIO,pinDict,"IO1") #The X2 is read directly to compare against
     powerOn(x2,mbRetries,GPIO,pinDict,"IO4")
 
     logging.debug("Reading address from the RS-485 passthrough T-Node...")
-    readResult = mbReadRetries(tnode,Reg.mbReg["Add"][0],Reg.mbReg["Add"][1],retries=mbRetries)
+    readResult = mbReadRetries(tnode,Reg.mbReg["Add"].reg,Reg.mbReg["Add"].numReg,retries=mbRetries)
     if(readResult):
         logging.debug("The RS-485 passthrough T-Node was read successfully")
-        return ["Pass"]
     else:
         logging.debug("The RS-485 passthrough T-Node was not read successfully")
-        return ["Fail-T-Node did not respond"]
+        return ["Fail-T-Node did not respond",-999999,-999999]
+
+    logging.debug("Benchmarking the RS-485 passthrough with %d reads at each size...",burst)
+    results=benchmarkPassthrough(x2,tnode,sizes,burst)
+    lost=sum(result[5] for result in results)
+    sent=sum(result[7] for result in results)
+    frameLoss=round(100.0*lost/max(sent,1),2)
+    status="Pass"
+    addedLatency=-999999
+    for [numReg,requestBytes,responseBytes,direct,passthrough,sizeLost,sizeRejected,sizeSent] in results:
+        if(sizeRejected):
+            if(status=="Pass"):
+                status="Fail-%d reads of %d registers were rejected with a Modbus exception" % (sizeRejected,numReg)
+            continue
+        if(direct is None or passthrough is None):
+            status="Fail-No reads of %d registers were answered" % numReg
+            continue
+        added=passthrough-direct
+        addedLatency=max(addedLatency,round(added*1000,1))
+        forwardTime=(requestBytes+responseBytes)*10.0/baud #10 bits per character at the passthrough's baud rate
+        if(added>forwardTime+margin and status=="Pass"):
+            status="Fail-Passthrough added %.1f ms to reads of %d registers" % (added*1000,numReg)
+    if(lost and status=="Pass"):
+        status="Fail-Passthrough dropped %d of %d frames" % (lost,sent)
+    return [status,frameLoss,addedLatency]
 
 #Test RTC Battery Functionality
 def testRTC(GPIO,pinDict,x2,mbRetries):
@@ -1699,9 +2510,9 @@ def testRTC(GPIO,pinDict,x2,mbRetries):
   
     #Read the RTC Voltage
     logging.debug("Reading the RTC Voltage...")
-    RTCRawResult = mbReadFloatRetries(x2,Reg.mbReg["RTCBAT_V"][0],Reg.mbReg["RTCBAT_V"][1],retries=mbRetries)
-    if(RTCRawResult):
-        RTCVoltageValueResult = RTCRawResult[0]
+    snapshot = mbReadSnapshot(x2,retries=mbRetries)
+    if(snapshot):
+        RTCVoltageValueResult = snapshot["RTCBAT_V"]
         logging.debug("The RTC Battery voltage is %.3f\n",RTCVoltageValueResult)
         [rangeCheck,RTCVoltageRangeResult]=valueRangeCheck(3.0,0.2,RTCVoltageValueResult)
     else:
@@ -1711,10 +2522,9 @@ def testRTC(GPIO,pinDict,x2,mbRetries):
 
     #Read the current time
     logging.debug("Reading Time from X2...")
-    initialTimeReadResult = mbReadRetries(x2,Reg.mbReg["ReadTime"][0],Reg.mbReg["ReadTime"][1],retries=mbRetries) #Read from the X2
+    initialTimeReadResult = mbReadValueRetries(x2,"ReadTime",retries=mbRetries) #Read from the X2
     if(initialTimeReadResult):
-        readTime1=[initialTimeReadResult[0],initialTimeReadResult[1]] #The first two 16 bits are the time, the next two are the tz offset
-        convResult1 = combineFrom16Bits(readTime1) #Convert to a single 32-bit time
+        [convResult1,tzOffset]=initialTimeReadResult[0] #The 32-bit time followed by the tz offset
         formatedDateTime1 = time.strftime('%Y-%m-%d %H:%M:%S',time.gmtime(convResult1)) # Convert from Epoch to readable
         logging.debug("The device's original time is %s\n",formatedDateTime1)
 
@@ -1723,25 +2533,23 @@ def testRTC(GPIO,pinDict,x2,mbRetries):
         currentPCTime=int(time.time()) #Read the current time from the system
         formatedDateTime2 = time.strftime('%Y-%m-%d %H:%M:%S',time.gmtime(currentPCTime)) # Convert from Epoch to readable
         logging.debug("Current computer time is: %s",formatedDateTime2)
-        timeIn16bit = splitInto16Bits(currentPCTime) # Convert into separate 16-bit values
-        tzOffset1=0 # Set the time zone offset to 0 for UTC time
-        tzOffset2=0
-        writeResult = mbWriteRetries(x2,Reg.mbReg["SetTime"][0],[timeIn16bit[0],timeIn16bit[1],tzOffset1,tzOffset2]) #Write to X2
+        tzOffset=0 # Set the time zone offset to 0 for UTC time
+        writeResult = mbWriteReadRetries(x2,Reg.mbReg["SetTime"].reg,Codec.encode("SetTime",[currentPCTime,tzOffset]),["ReadTime"],retries=mbRetries) #Write all 4 registers to X2 and read the clock back
         if(writeResult):
-            logging.debug("Writing current computer time to X2 was successful\n")
+            logging.debug("Writing current computer time to X2 was successful")
+            logging.debug("The device's time is now %s\n",time.strftime('%Y-%m-%d %H:%M:%S',time.gmtime(writeResult[1]["ReadTime"][0])))
 
             #Check if the board keeps time on a power cycle
             logging.debug("Cycling Power to board...")
-            powerOff(GPIO,pinDict,"IO1")
+            powerOff(x2,GPIO,pinDict,"IO1")
             logging.debug("Turning board back on and checking time is accurate")
             powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
 
             #Read the boards current time
             logging.debug("\nReading Time from X2...")
-            finalTimeReadResult = mbReadRetries(x2,Reg.mbReg["ReadTime"][0],Reg.mbReg["ReadTime"][1],retries=mbRetries) #Read from the X2
+            finalTimeReadResult = mbReadValueRetries(x2,"ReadTime",retries=mbRetries) #Read from the X2
             if(finalTimeReadResult):
-                readTime2=[finalTimeReadResult[0],finalTimeReadResult[1]] #The first two 16 bits are the time, the next two are the tz offset
-                convResult2 = combineFrom16Bits(readTime2) #Convert to a single 32-bit time
+                [convResult2,tzOffset]=finalTimeReadResult[0] #The 32-bit time followed by the tz offset
                 formatedDateTime2 = time.strftime('%Y-%m-%d %H:%M:%S',time.gmtime(convResult2)) # Convert from Epoch to readable
                 logging.debug("The device's final time is %s\n",formatedDateTime2)
 
@@ -1787,26 +2595,23 @@ def testSenCur(GPIO,pinDict,x2,mbRetries):
     logging.debug("Module Start")
     powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
 
-    #Enable the 12V SEPIC
-    if(enableDisable(x2,mbRetries,"12SEPIC_OF","12V SEPIC",1)== False):
-        return ["Fail-Enabling the 12V SEPIC was not successful",-999999]
+    #Enable the 12V SEPIC and switch port A
+    if(enableDisableMany(x2,mbRetries,{"12SEPIC_OF":1,"12V_A_OF":1},"12V SEPIC & 12V Port A")== False):
+        return ["Fail-Enabling the 12V SEPIC & 12V Port A was not successful",-999999]
 
-    #Enable switch port A
-    if(enableDisable(x2,mbRetries,"12V_A_OF","12V Port A",1)== False):
-        return ["Fail-Enabling 12V Port A was not successful",-999999]
+    time.sleep(.1) #needed to let 12V SEPIC stabalize
 
     #Read sensor current
     logging.debug("\nReading the sensor current...")
-    readResult = mbReadFloatRetries(x2,Reg.mbReg["SenCur"][0],Reg.mbReg["SenCur"][1],retries=mbRetries)
-    if(readResult):
-        curr=readResult[0]
+    values = mbReadKeysRetries(x2,["SenCur"],mbRetries) #Reads only this register, not the whole telemetry block
+    if(values):
+        curr=round(values["SenCur"],3)
         currentLevel=valueRangeCheck(5,3,curr)
     else:
         logging.debug("The read was not successful")
         return ["Fail-The Modbus read failed",-999999]
 
-    enableDisable(x2,mbRetries,"12V_A_OF","12V Sensor Port A",0)#Turn off port A after
-    enableDisable(x2,mbRetries,"12SEPIC_OF","12V SEPIC",0)#Turn off 12V SEPIC after
+    enableDisableMany(x2,mbRetries,{"12SEPIC_OF":0,"12V_A_OF":0},"12V SEPIC & 12V Sensor Port A")#Turn off port A & 12V SEPIC after
 
     return [currentLevel[1],curr]
 
@@ -1815,72 +2620,59 @@ def testSensor(GPIO,pinDict,x2,mbRetries,modbusTimeout):
     logging.debug("Module Start")
     powerOn(x2,mbRetries,GPIO,pinDict,"IO1")
 
-    #Enable the 3.3V SEPIC
-    if(enableDisable(x2,mbRetries,"33SEPIC_OF","3.3V SEPIC",1)==False):
-        return ["Fail-Enabling the 3.3V SEPIC was not successful",
-                "Fail-Enabling the 3.3V SEPIC was not successful",
-                "Fail-Enabling the 3.3V SEPIC was not successful",
-                "Fail-Enabling the 3.3V SEPIC was not successful",
-                "Fail-Enabling the 3.3V SEPIC was not successful",
-                "Fail-Enabling the 3.3V SEPIC was not successful",
-                "Fail-Enabling the 3.3V SEPIC was not successful",
-                "Fail-Enabling the 3.3V SEPIC was not successful",
-                "Fail-Enabling the 3.3V SEPIC was not successful"]
-
-    #Enable the 12V SEPIC
-    if(enableDisable(x2,mbRetries,"12SEPIC_OF","12V SEPIC",1)== False):
-        return ["Fail-Enabling the 12V SEPIC was not successful",
-                "Fail-Enabling the 12V SEPIC was not successful",
-                "Fail-Enabling the 12V SEPIC was not successful",
-                "Fail-Enabling the 12V SEPIC was not successful",
-                "Fail-Enabling the 12V SEPIC was not successful",
-                "Fail-Enabling the 12V SEPIC was not successful",
-                "Fail-Enabling the 12V SEPIC was not successful",
-                "Fail-Enabling the 12V SEPIC was not successful",
-                "Fail-Enabling the 12V SEPIC was not successful"]
+    #Enable the 3.3V SEPIC and the 12V SEPIC
+    if(enableDisableMany(x2,mbRetries,{"33SEPIC_OF":1,"12SEPIC_OF":1},"3.3V & 12V SEPICs")==False):
+        return ["Fail-Enabling the 3.3V & 12V SEPICs was not successful",
+                "Fail-Enabling the 3.3V & 12V SEPICs was not successful",
+                "Fail-Enabling the 3.3V & 12V SEPICs was not successful",
+                "Fail-Enabling the 3.3V & 12V SEPICs was not successful",
+                "Fail-Enabling the 3.3V & 12V SEPICs was not successful",
+                "Fail-Enabling the 3.3V & 12V SEPICs was not successful",
+                "Fail-Enabling the 3.3V & 12V SEPICs was not successful",
+                "Fail-Enabling the 3.3V & 12V SEPICs was not successful",
+                "Fail-Enabling the 3.3V & 12V SEPICs was not successful"]
 
     #Set the Modbus timeout to 3 seconds during sensor testing so they have time to respond
-    x2.serial.timeout = 3
-
-    ##Test Port 0
-    #Enable switch port A
-    if(enableDisable(x2,mbRetries,"12V_A_OF","12V Port 0",1)):
-        logging.debug("Sensor Booting...")
-        time.sleep(5)#Give the sensor time to boot
-        port0Status = sensorTest(x2,mbRetries,"RS232AComTest")#Call function to test communication on Port 0
-        enableDisable(x2,mbRetries,"12V_A_OF","12V Port 0",0)
-    else:
-        port0Status = ["Fail-Enabling 12V Port A was not successful",
-                       "Fail-Enabling 12V Port A was not successful",
-                       "Fail-Enabling 12V Port A was not successful"]
-
-    ##Test Port 1
-    #Enable switch port B
-    if(enableDisable(x2,mbRetries,"12V_B_OF","12V Port 1",1)):
-        logging.debug("Sensor Booting...")
-        time.sleep(5)#Give the sensor time to boot
-        port1Status = sensorTest(x2,mbRetries,"RS232BComTest")#Call function to test communication on Port 1
-        enableDisable(x2,mbRetries,"12V_B_OF","12V Port 1",0)
-    else:
-        port1Status = ["Fail-Enabling 12V Port 1 was not successful",
-                       "Fail-Enabling 12V Port 1 was not successful",
-                       "Fail-Enabling 12V Port 1 was not successful"]
-
-    ##Test Port 2
-    #Enable switch port C
-    if(enableDisable(x2,mbRetries,"12V_C_OF","12V Port 2",1)):
-        logging.debug("Sensor Booting...")
-        time.sleep(5)#Give the sensor time to boot
-        port2Status = sensorTest(x2,mbRetries,"RS232CComTest")#Call function to test communication on Port 2
-        enableDisable(x2,mbRetries,"12V_C_OF","12V Port 2",0)
-    else:
-        port2Status = ["Fail-Enabling 12V Port 2 was not successful",
-                       "Fail-Enabling 12V Port 2 was not successful",
-                       "Fail-Enabling 12V Port 2 was not successful"]
-
-
-    #Set the Modbus timeout back to the program default
-    x2.serial.timeout = modbusTimeout  
+    x2.timeout = 3
+    try:
+        ##Test Port 0
+        #Enable switch port A
+        if(enableDisable(x2,mbRetries,"12V_A_OF","12V Port 0",1)):
+            logging.debug("Sensor Booting...")
+            time.sleep(5)#Give the sensor time to boot
+            port0Status = sensorTest(x2,mbRetries,"RS232AComTest")#Call function to test communication on Port 0
+            enableDisable(x2,mbRetries,"12V_A_OF","12V Port 0",0)
+        else:
+            port0Status = ["Fail-Enabling 12V Port A was not successful",
+                           "Fail-Enabling 12V Port A was not successful",
+                           "Fail-Enabling 12V Port A was not successful"]
+
+        ##Test Port 1
+        #Enable switch port B
+        if(enableDisable(x2,mbRetries,"12V_B_OF","12V Port 1",1)):
+            logging.debug("Sensor Booting...")
+            time.sleep(5)#Give the sensor time to boot
+            port1Status = sensorTest(x2,mbRetries,"RS232BComTest")#Call function to test communication on Port 1
+            enableDisable(x2,mbRetries,"12V_B_OF","12V Port 1",0)
+        else:
+            port1Status = ["Fail-Enabling 12V Port 1 was not successful",
+                           "Fail-Enabling 12V Port 1 was not successful",
+                           "Fail-Enabling 12V Port 1 was not successful"]
+
+        ##Test Port 2
+        #Enable switch port C
+        if(enableDisable(x2,mbRetries,"12V_C_OF","12V Port 2",1)):
+            logging.debug("Sensor Booting...")
+            time.sleep(5)#Give the sensor time to boot
+            port2Status = sensorTest(x2,mbRetries,"RS232CComTest")#Call function to test communication on Port 2
+            enableDisable(x2,mbRetries,"12V_C_OF","12V Port 2",0)
+        else:
+            port2Status = ["Fail-Enabling 12V Port 2 was not successful",
+                           "Fail-Enabling 12V Port 2 was not successful",
+                           "Fail-Enabling 12V Port 2 was not successful"]
+    finally:
+        #Set the Modbus timeout back to the program default
+        x2.timeout = modbusTimeout
 
     return [port0Status[0],port0Status[1],port0Status[2],
             port1Status[0],port1Status[1],port1Status[2],
@@ -1901,9 +2693,9 @@ def testSysCur(GPIO,pinDict,x2,mbRetries):
 
     #Read system current
     logging.debug("\nReading the system current...")
-    readResult = mbReadFloatRetries(x2,Reg.mbReg["SysCur"][0],Reg.mbReg["SysCur"][1],retries=mbRetries)
-    if(readResult):
-        curr=readResult[0]
+    values = mbReadKeysRetries(x2,["SysCur"],mbRetries) #Reads only this register, not the whole telemetry block
+    if(values):
+        curr=round(values["SysCur"],3)
         currentLevel=valueRangeCheck(20,7,curr)
     else:
         logging.debug("The read was not successful")
@@ -1946,12 +2738,16 @@ def testWifi(GPIO,pinDict,x2,mbRetries,wifiNetwork,wifiRetries):
     logging.debug("Waiting for Wi-Fi to boot fully before proceeding...")
     time.sleep(8)#Need to delay until Wi-Fi is fully booted and done communicating to K64
     
-    #Search for Wi-Fi network name
-    networkStatus=wifiNetworkSearch(wifiNetwork,wifiRetries,sleepSec=2)
-
-    #Enable the Wi-Fi LEDs
+    #Search for Wi-Fi network name and enable the Wi-Fi LEDs
+    #When the bus can be awaited the LEDs are enabled while the search waits on the Wi-Fi scans
     logging.debug("\nTesting the Wi-Fi LEDs...")
-    [commStatusValue1,commStatus1]=checkStatus(x2,mbRetries,"WiFiComLEDTest","Wi-Fi LED Enable Write")
+    if(getattr(x2,"asyncBus",None)):
+        [networkStatus,[commStatusValue1,commStatus1]]=x2.asyncBus.run(
+            wifiNetworkSearchAsync(wifiNetwork,wifiRetries,sleepSec=2),
+            checkStatusAsync(x2,mbRetries,"WiFiComLEDTest","Wi-Fi LED Enable Write"))
+    else:
+        networkStatus=wifiNetworkSearch(wifiNetwork,wifiRetries,sleepSec=2)
+        [commStatusValue1,commStatus1]=checkStatus(x2,mbRetries,"WiFiComLEDTest","Wi-Fi LED Enable Write")
 
     #Check if LEDs were enabled
     done=False
@@ -2061,11 +2857,34 @@ def wifiNetworkSearch(wifiNetwork,wifiRetries,sleepSec=2):
     else:
         return "Fail-RPi was using the Wi-Fi resource"
 
-#This function replaces the standard minimalmodbus address range (0-247) with an extended range (0-255)
-def _checkSlaveaddress(slaveaddress):
-    SLAVEADDRESS_MAX=255
-    SLAVEADDRESS_MIN=0
-    minimalmodbus._checkInt(slaveaddress,SLAVEADDRESS_MIN,SLAVEADDRESS_MAX,description='slaveaddress')
+#Same as wifiNetworkSearch, but the scans run off the event loop so it can be awaited
+async def wifiNetworkSearchAsync(wifiNetwork,wifiRetries,sleepSec=2):
+    loop=asyncio.get_event_loop()
+    return await loop.run_in_executor(None,wifiNetworkSearch,wifiNetwork,wifiRetries,sleepSec)
+
+#Writes switch bank changes { MB Dictionary Name : value } using the fewest Modbus writes
+#Switches already in the requested state are skipped
+#Returns True if every write was successful
+def writeSwitches(x2,mbRetries,switches):
+    #Read the bank back now and then so the shadow can't drift from the board
+    if(x2.switches.verifyDue()):
+        readResult = mbReadRetries(x2,Reg.switchBankStart,Reg.switchBankNumReg,retries=mbRetries)
+        if(readResult):
+            x2.switches.verify(readResult)
+        else:
+            x2.switches.invalidate()
+
+    success=True
+    for [reg,values] in x2.switches.plan(switches):
+        writeResult = mbWriteRetries(x2,reg,values,retries=mbRetries)
+        x2.switches.update(reg,values,writeResult!=False)
+        if(writeResult==False):
+            success=False
+
+    #Let the Wi-Fi contention tracker know if the Wi-Fi was switched
+    if("WiFiPwr_OF" in switches and getattr(x2,"wifi",None)):
+        x2.wifi.switched(x2.address,switches["WiFiPwr_OF"],x2.switches.value("WiFiPwr_OF")==int(switches["WiFiPwr_OF"]))
+    return success
             
 
 if __name__ == "__main__":
@@ -2123,6 +2942,18 @@ if __name__ == "__main__":
         elif(runType=="-user"):
             print("Use Type: User - Important test result messages with be printed to console\n\n")
             log_level_console = logging.IMPORTANT #For Tester Use
+        elif(runType=="-scan"):
+            print("Use Type: Address Scan - Only the addresses found will be printed to console\n\n")
+            log_level_console = logging.IMPORTANT #For Diagnosing Boards
+        elif(runType=="-bench"):
+            print("Use Type: Bus Benchmark - Only the benchmark results will be printed to console\n\n")
+            log_level_console = logging.IMPORTANT #For Fixture Qualification
+        elif(runType=="-faultBench"):
+            print("Use Type: Fault Benchmark - Only the benchmark results will be printed to console\n\n")
+            log_level_console = logging.IMPORTANT #For Tuning the Retry Logic
+        elif(runType=="-multiDrop"):
+            print("Use Type: Multi-Drop - Important test result messages with be printed to console\n\n")
+            log_level_console = logging.IMPORTANT #For Tester Use
         else:
             print("An invalid selection was made. Default User level was used.")
             print("Use Type: Admin User - All messages with be printed to console\n\n")
@@ -2132,8 +2963,9 @@ if __name__ == "__main__":
     log_level_file = logging.DEBUG #Always capture all to the log
 
     #Check if folder is there and if not make
-    os.makedirs("/home/pi/Documents/X2_PCB_Test_Results/Logs",exist_ok=True)
-    log_file_name = "/home/pi/Documents/X2_PCB_Test_Results/Logs/ProgramRun.log"
+    logFolder = getOption("-results","/home/pi/Documents/X2_PCB_Test_Results/")+"Logs/"
+    os.makedirs(logFolder,exist_ok=True)
+    log_file_name = logFolder+"ProgramRun.log"
 
     #Create the logger object
     logger=logging.getLogger()
@@ -2160,5 +2992,8 @@ if __name__ == "__main__":
     ###############
     ## Call Main ##
     ###############
-    main()
+    if(spidev is None and "-replay" not in sys.argv and "-sim" not in sys.argv):
+        logging.error("The Raspberry Pi hardware libraries are not installed. Only -replay and -sim can be used on this computer.")
+    else:
+        main()
         
@@ -0,0 +1,135 @@
+#
+# @file		        : x2mbAsync.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	This file holds an asyncio version of the Modbus RTU transport. The
+#       serial port is read without blocking so other work (ADC reads, Wi-Fi
+#       scans, power settling) can run while waiting on the X2. Only one
+#       request is ever outstanding on the RS-485 bus at a time.
+#
+# Usage:
+#   Called from the X2 PCB Tester Code
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import asyncio
+import concurrent.futures
+import os
+import time
+import x2mbTransport as Mb
+
+class AsyncBus:
+    def __init__(self,bus):
+        self.bus=bus #Blocking bus that owns the port
+        self.serial=bus.serial
+        self.loop=asyncio.new_event_loop() #Runs the awaitable parts of a test
+        self.queue=concurrent.futures.ThreadPoolExecutor(1) #Waits for a place in the blocking bus's queue
+        self.lock=None #Only one transaction can be on the bus at a time. Made on the loop by the first request.
+        self.buffer=bytearray(Mb.maxFrameLength) #Receive buffer reused by every request
+
+    #Runs awaitables together on the bus's loop and returns their results in order
+    def run(self,*awaitables):
+        async def together():
+            return await asyncio.gather(*awaitables)
+        return self.loop.run_until_complete(together())
+
+    def close(self):
+        self.loop.close()
+        self.queue.shutdown()
+
+    #Sends a request and returns the validated response without blocking the event loop
+    #Raises the same errors as x2mbTransport.transact
+    #The response is a memoryview of the receive buffer so it must be decoded before the next request
+    async def transact(self,request,responseLength,timeout=None):
+        if(timeout is None):
+            timeout=self.bus.timeout
+        loop=asyncio.get_event_loop()
+        if(self.lock is None):
+            self.lock=asyncio.Lock()
+        async with self.lock:
+            #Also take a place in the blocking bus's queue so requests from other threads wait their turn
+            #If the request is cancelled while waiting, the place is given up by the waiting thread as soon as
+            #it comes up so the queue isn't stuck behind a ticket nobody will release, even once the loop is closed
+            acquiring=self.queue.submit(self.bus.acquire)
+            try:
+                await asyncio.shield(asyncio.wrap_future(acquiring))
+            except asyncio.CancelledError:
+                acquiring.add_done_callback(lambda acquired: self.bus.release())
+                raise
+            try:
+                await self._waitForSilence()
+                self.serial.write(request)
+                buffer=await self._read(request,responseLength,timeout)
+                Mb.latestReadTimes[self.serial.port]=time.time()
+            finally:
+                self.bus.release()
+        [start,end]=Mb.findResponse(buffer,request,responseLength)
+        if(end):
+            if(start):
+                Mb.countStaleFrames(self.serial.port,buffer[0:start])
+            response=buffer[start:end]
+        else:
+            response=buffer[start:] or buffer #Let checkResponse report what went wrong
+        return Mb.checkResponse(request,response,responseLength)
+
+    #Same as x2mbTransport.waitForSilence but sleeps without blocking the event loop
+    async def _waitForSilence(self):
+        silent=Mb.silentPeriod(self.serial.baudrate)
+        late=b''
+        while True:
+            waitTime=silent-(time.time()-Mb.latestReadTimes.get(self.serial.port,0))
+            if(waitTime>0):
+                await asyncio.sleep(waitTime)
+            waiting=self.serial.in_waiting
+            if(not waiting):
+                break
+            late=late+self.serial.read(waiting)
+            Mb.latestReadTimes[self.serial.port]=time.time() #The silent period starts over from the last byte
+        if(late):
+            Mb.countStaleFrames(self.serial.port,late)
+
+    #Collects bytes into the receive buffer as the port becomes readable until the response to the request is complete
+    #Late frames from earlier requests ahead of the response are kept and skipped by the caller
+    async def _read(self,request,responseLength,timeout):
+        loop=asyncio.get_event_loop()
+        view=memoryview(self.buffer)
+        length=[0] #Bytes received so far
+        done=loop.create_future()
+
+        #The bytes go straight from the port's file descriptor into the receive buffer
+        def onReadable():
+            try:
+                length[0]+=os.readv(fileNumber,[view[length[0]:]])
+            except BlockingIOError:
+                return
+            finished=Mb.findResponse(view[0:length[0]],request,responseLength)[1] or length[0]>=Mb.maxFrameLength
+            if(finished and not done.done()):
+                done.set_result(True)
+
+        fileNumber=self.serial.fileno()
+        loop.add_reader(fileNumber,onReadable)
+        try:
+            await asyncio.wait_for(done,timeout)
+        except asyncio.TimeoutError:
+            pass #Whatever arrived is checked by the caller
+        finally:
+            loop.remove_reader(fileNumber)
+        return view[0:length[0]]
@@ -0,0 +1,122 @@
+#
+# @file		        : x2mbCodec.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	This file converts between X2 register values and Python values using
+#       the type given for each key in x2mbRegisters. The struct formats are
+#       compiled once, and each block from a register map bus plan (like the
+#       telemetry block) is decoded with a single unpack.
+#
+# Usage:
+#   Called from the X2 PCB Tester Code
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import struct
+import x2mbRegisters as Reg
+
+#Register types
+#     { "Type"     :[(struct format of one value), (# of Registers per value)] }
+types={ "float"    :["f",                          2] #IEEE float with the upper word first
+       ,"time"     :["I",                          2] #UTC seconds since the epoch with the upper word first
+       ,"clock"    :["Ii",                         4] #UTC seconds then the signed time zone offset in seconds
+       ,"bitmask"  :["H",                          1] #One bit per item, bit 0 first
+       ,"status"   :["H",                          1] #0=off/fail; 1=on/success
+       ,"uint16"   :["H",                          1]
+      }
+
+#Decodes and encodes a run of keys in register order, skipping any registers between them
+class Codec:
+    def __init__(self,keys):
+        self.keys=keys
+        self.start=Reg.mbReg[keys[0]].reg
+        self.fields=[] #[Key, Number of values unpacked for the key]
+        fmt=">"
+        reg=self.start
+        for key in keys:
+            [keyReg,numReg]=[Reg.mbReg[key].reg,Reg.mbReg[key].numReg]
+            [valueFormat,valueNumReg]=types[Reg.mbReg[key].type]
+            if(keyReg>reg): #Pad bytes for registers between keys
+                fmt+="%dx" % (2*(keyReg-reg))
+            fmt+=valueFormat*(numReg//valueNumReg)
+            self.fields.append([key,len(valueFormat)*(numReg//valueNumReg)])
+            reg=keyReg+numReg
+        self.numReg=reg-self.start
+        self.struct=struct.Struct(fmt)
+
+    #Returns a dictionary of the values by key from the register data starting at offset
+    #Keys with one value give the value, keys with several give a list (a clock gives [time,offset])
+    def decode(self,data,offset=0):
+        values=self.struct.unpack_from(data,offset)
+        decoded={}
+        i=0
+        for [key,count] in self.fields:
+            if(count==1):
+                decoded[key]=values[i]
+            else:
+                decoded[key]=list(values[i:i+count])
+            i+=count
+        return decoded
+
+    #Returns the 16-bit register values for a dictionary of values by key (registers between keys are 0)
+    def encode(self,values):
+        flat=[]
+        for [key,count] in self.fields:
+            if(count==1):
+                flat.append(values[key])
+            else:
+                flat.extend(values[key])
+        return list(words(self.numReg).unpack(self.struct.pack(*flat)))
+
+#Compiled structs for reading plain 16-bit registers, by number of registers
+wordStructs={}
+
+#Returns the compiled struct for a number of big-endian 16-bit registers
+def words(numReg):
+    wordStruct=wordStructs.get(numReg)
+    if(wordStruct is None):
+        wordStruct=struct.Struct(">%dH" % numReg)
+        wordStructs[numReg]=wordStruct
+    return wordStruct
+
+#Returns the codec for a block from a bus plan, compiled on first use
+def block(block):
+    codec=blockCodecs.get(block)
+    if(codec is None):
+        codec=Codec(block.keys)
+        blockCodecs[block]=codec
+    return codec
+
+#Returns the value of one key from register data starting at offset
+def decode(key,data,offset=0):
+    return keyCodecs[key].decode(data,offset)[key]
+
+#Returns the 16-bit register values to write for one key
+def encode(key,value):
+    return keyCodecs[key].encode({key:value})
+
+#Single float, used when reading by register number instead of by key
+float32=struct.Struct(">f")
+
+#A codec for every key
+#Blocks from bus plans are added to blockCodecs as they are used
+keyCodecs=dict((key,Codec([key])) for key in Reg.mbReg)
+blockCodecs={}
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+#
+# @file		        : x2mbGateway.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	Owns the fixture's USB RS-485 adapter and serves it as Modbus TCP on
+#       this computer only. The main tester, diagnostics and soak tests can
+#       all connect at the same time. Requests are sent to the bus one at a
+#       time, taking turns between the connected programs.
+#
+#       Each client can set its own timeout with the user defined function
+#       code 65 (x2mbTransport.FC_GATEWAY_TIMEOUT), which the gateway answers
+#       itself. Clients that don't send it get the -timeout default.
+#       Malformed requests are answered with an illegal data value exception
+#       and requests with a non-zero protocol identifier are discarded.
+#
+# Usage:
+#   sudo python3 x2mbGateway.py [-port /dev/ttyUSB0] [-listen 5020] [-timeout 0.5]
+#   Then start the tester with: x2MainPCBTester.py -user -gateway localhost:5020
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import asyncio
+import logging
+import sys
+import x2mbTransport as Mb
+
+
+def main():
+    ##############################
+    ## Define program variables ##
+    ##############################
+
+    #USB RS-485 Parameters
+    comPort = getOption("-port",'/dev/ttyUSB0')
+    baud = 19200
+    parity = 'N'
+    bytesize=8
+    stopbits=1
+    modbusTimeout=float(getOption("-timeout",0.5)) #Used when a client doesn't send its own timeout
+
+    #Modbus TCP Parameters
+    listenAddress = '127.0.0.1' #Only programs on this computer can connect
+    listenPort = int(getOption("-listen",5020))
+
+    ################################
+    ## Setup Devices & Interfaces ##
+    ################################
+
+    bus = Mb.MbBus(comPort,baudrate=baud,parity=parity,bytesize=bytesize,stopbits=stopbits,timeout=modbusTimeout)
+    gateway = Gateway(bus,modbusTimeout)
+
+    loop = asyncio.get_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(gateway.handleClient,listenAddress,listenPort))
+    loop.create_task(gateway.schedule())
+    logging.info("Serving %s as Modbus TCP on %s:%d",comPort,listenAddress,listenPort)
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        logging.info("The gateway was stopped by a keyboard interrupt")
+    finally:
+        logging.info("Late Modbus responses discarded: %d",bus.staleFrameCount())
+        server.close()
+        bus.close()
+
+class Gateway:
+    def __init__(self,bus,defaultTimeout):
+        self.bus=bus
+        self.defaultTimeout=defaultTimeout
+        self.clients=[] #Request queue for each connected client, in turn order
+        self.pending=asyncio.Event() #Set when any client has a request waiting
+
+    #Reads Modbus TCP requests from one client and adds them to its queue
+    #Timeout requests are answered here since they don't go to the bus
+    async def handleClient(self,reader,writer):
+        queue=[]
+        self.clients.append(queue)
+        timeout=self.defaultTimeout
+        logging.info("Client connected from %s",writer.get_extra_info('peername'))
+        try:
+            while True:
+                header=await reader.readexactly(Mb.mbapHeader.size)
+                [transactionId,protocol,length,unit]=Mb.mbapHeader.unpack(header)
+                pdu=await reader.readexactly(max(0,length-1))
+                if(protocol!=0): #Not Modbus. The Modbus TCP spec has these discarded without an answer.
+                    logging.warning("Refused a request with protocol identifier %d. Only Modbus (0) is served.",protocol)
+                    continue
+                if(pdu[0:1]==bytes([Mb.FC_GATEWAY_TIMEOUT])):
+                    if(len(pdu)==Mb.gatewayTimeoutPdu.size and Mb.gatewayTimeoutPdu.unpack(pdu)[1]>0):
+                        timeout=Mb.gatewayTimeoutPdu.unpack(pdu)[1]/1000.0
+                        responsePdu=pdu #Echo the request like a write
+                    else:
+                        responsePdu=bytes([pdu[0]|0x80,Mb.ILLEGAL_DATA_VALUE])
+                    writer.write(Mb.mbapHeader.pack(transactionId,protocol,len(responsePdu)+1,unit)+responsePdu)
+                    continue
+                queue.append([transactionId,protocol,unit,pdu,writer,timeout])
+                self.pending.set()
+        except (asyncio.IncompleteReadError,ConnectionError):
+            pass #Client disconnected
+        finally:
+            self.clients.remove(queue)
+            writer.close()
+            logging.info("Client disconnected")
+
+    #Sends one request at a time to the bus, taking the next request from each client in turn
+    async def schedule(self):
+        loop=asyncio.get_event_loop()
+        turn=0
+        while True:
+            await self.pending.wait()
+            self.pending.clear()
+            while(any(self.clients)):
+                turn=turn%len(self.clients)
+                queue=self.clients[turn]
+                turn+=1
+                if(not queue):
+                    continue
+                [transactionId,protocol,unit,pdu,writer,timeout]=queue.pop(0)
+                try:
+                    responsePdu=await loop.run_in_executor(None,self.forward,unit,pdu,timeout)
+                except Exception: #One bad request mustn't stop the bus for every client
+                    logging.exception("Forwarding a request from unit %d failed",unit)
+                    responsePdu=bytes([(pdu[0] if pdu else 0)|0x80,Mb.SERVER_DEVICE_FAILURE])
+                if(not writer.is_closing()):
+                    writer.write(Mb.mbapHeader.pack(transactionId,protocol,len(responsePdu)+1,unit)+responsePdu)
+
+    #Sends a single request to the bus and returns the response PDU (or an exception PDU)
+    def forward(self,unit,pdu,timeout):
+        if(not pdu):
+            return bytes([0x80,Mb.ILLEGAL_DATA_VALUE]) #No function code
+        if(pdu[0] not in Mb.minimumPduLength):
+            return bytes([pdu[0]|0x80,Mb.ILLEGAL_FUNCTION])
+        if(len(pdu)<Mb.minimumPduLength[pdu[0]]):
+            return bytes([pdu[0]|0x80,Mb.ILLEGAL_DATA_VALUE]) #Too short to hold the function's fields
+        request=Mb.appendCrc(bytes([unit])+pdu)
+        responseLength=Mb.expectedResponseLength(request)
+        try:
+            response=self.bus.transact(request,responseLength,timeout)
+        except Mb.SlaveException as error:
+            return bytes([pdu[0]|0x80,error.code])
+        except (IOError,ValueError):
+            return bytes([pdu[0]|0x80,0x0B]) #Gateway target device failed to respond
+        return bytes(response[1:-2]) #Strip the slave address and CRC
+
+#Returns the value after a command line option or the default if it wasn't given
+def getOption(name,default):
+    if(name in sys.argv[1:-1]):
+        return sys.argv[sys.argv.index(name)+1]
+    return default
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,format='%(message)s')
+    main()
@@ -0,0 +1,220 @@
+#
+# @file		        : x2mbPolicy.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	This file learns how long each Modbus register takes to answer and
+#       uses that history to pick the timeout and number of retries for
+#       the next request. The history is saved between program runs so
+#       healthy boards finish faster and dead boards fail faster. It also
+#       holds the circuit breaker that stops waiting on a board that has
+#       stopped responding until it is powered on again, and the Wi-Fi
+#       contention tracker that only allows for interference on the RS-485
+#       bus while a board's Wi-Fi module may be powered.
+#
+# Usage:
+#   Called from the X2 PCB Tester Code
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import collections
+import json
+import logging
+import os
+import x2mbTrace as Trace
+
+class TimeoutPolicy:
+    #Policy settings
+    historyLength=200 #Number of latencies kept per register
+    minSamples=20 #Latencies needed before the learned values are used
+    timeoutScale=1.5 #Multiplier on the p99 latency
+    timeoutMargin=0.05 #Seconds added on top of the scaled p99 latency
+    minTimeout=0.05 #Never go below this timeout
+    maxTimeout=5.0 #Never go above this timeout
+    minRetries=2 #Never go below this number of attempts
+
+    def __init__(self,fileName):
+        self.fileName=fileName
+        self.history={} #{ "Key" : {"latency":[...], "attempts":[successes by retry index], "failures":count} }
+        self.load()
+
+    #Read the history from the previous runs
+    def load(self):
+        if(os.path.isfile(self.fileName)):
+            try:
+                with open(self.fileName,'r') as in_policy:
+                    self.history=json.load(in_policy)
+            except ValueError:
+                logging.debug("The Modbus policy file was corrupt and has been reset")
+                self.history={}
+
+    #Save the history for the next run
+    def save(self):
+        with open(self.fileName,'w') as out_policy:
+            json.dump(self.history,out_policy)
+
+    #Get (or create) the history for a register key
+    def _entry(self,key):
+        entry=self.history.get(key)
+        if(entry is None):
+            entry={"latency":[],"attempts":[],"failures":0}
+            self.history[key]=entry
+        return entry
+
+    #Record the result of a single attempt
+    def record(self,key,latency,success,attempt):
+        entry=self._entry(key)
+        if(success):
+            entry["latency"].append(round(latency,4))
+            del entry["latency"][:-self.historyLength] #Only keep the most recent latencies
+            while(len(entry["attempts"])<=attempt):
+                entry["attempts"].append(0)
+            entry["attempts"][attempt]+=1
+        else:
+            entry["failures"]+=1
+
+    #The p99 latency for a register or None if there isn't enough history
+    def p99(self,key):
+        entry=self.history.get(key)
+        if(entry is None or len(entry["latency"])<self.minSamples):
+            return None
+        ordered=sorted(entry["latency"])
+        return ordered[min(len(ordered)-1,int(0.99*len(ordered)))]
+
+    #Timeout to use for the next request to a register
+    def timeout(self,key,default):
+        p99=self.p99(key)
+        if(p99 is None):
+            return default #Not enough history yet so use the program setting
+        return min(self.maxTimeout,max(self.minTimeout,p99*self.timeoutScale+self.timeoutMargin))
+
+    #Number of attempts to use for the next request to a register
+    #Allows one more attempt than the latest attempt that has ever been needed
+    def retries(self,key,default):
+        entry=self.history.get(key)
+        if(entry is None or len(entry["latency"])<self.minSamples):
+            return default
+        needed=len(entry["attempts"]) #Highest retry index that has succeeded plus one
+        return min(default,max(self.minRetries,needed+1))
+
+#Stops sending requests to a board that has stopped answering
+#After a number of timeouts in a row the breaker opens and every request fails
+#immediately until the board is powered on again
+class CircuitBreaker:
+    def __init__(self,threshold=6):
+        self.threshold=threshold #Timeouts in a row before the breaker opens
+        self.timeouts=0 #Current number of timeouts in a row
+        self.isOpen=False
+        self.shortCircuits=0 #Requests that were skipped because the breaker was open
+        self.reported=0 #Number of short circuits that have already been recorded in the results
+
+    #True if a request should be sent
+    def allow(self):
+        return not self.isOpen
+
+    #Called when a request timed out
+    def recordTimeout(self):
+        self.timeouts+=1
+        if(self.timeouts>=self.threshold and not self.isOpen):
+            logging.debug("No response after %d requests in a row. Skipping Modbus requests until the next power on",self.timeouts)
+            self.isOpen=True
+
+    #Called when anything came back from the board
+    def recordResponse(self):
+        self.timeouts=0
+        self.isOpen=False
+
+    #Called when a request was skipped
+    def recordShortCircuit(self):
+        self.shortCircuits+=1
+
+    #Called when the board is powered on. Allows a single probe request.
+    #If the probe times out the breaker opens again right away.
+    def powerEvent(self):
+        if(self.isOpen):
+            self.isOpen=False
+            self.timeouts=self.threshold-1
+
+    #True if any requests were skipped since the last call
+    def newShortCircuits(self):
+        new=self.shortCircuits>self.reported
+        self.reported=self.shortCircuits
+        return new
+
+#Tracks which boards may have their Wi-Fi module powered, since it interferes on the RS-485 bus
+#A board's Wi-Fi may be on after it is powered on or woken by a magnet until an off write succeeds
+#Timeouts are only raised while a Wi-Fi module may be on, and every transaction is counted by
+#whether interference was possible so the cost of the Wi-Fi can be seen
+class WifiContention:
+    def __init__(self,interferenceTimeout=1.0):
+        self.interferenceTimeout=interferenceTimeout #Shortest timeout while a Wi-Fi module may be on
+        self.boards={} #{ Slave address : True=on; None=may be on; False=off }
+        self.outcomes={True:collections.Counter(),False:collections.Counter()} #{ Interference possible : { outcome : count } }
+        self.wakes=0 #Times a board may have turned its own Wi-Fi on
+
+    #Called when a board is powered on. Its Wi-Fi may come up with it.
+    def powerEvent(self,address):
+        self.boards[address]=None
+        self.wakes+=1
+
+    #Called after a magnet wake. The board turns its own Wi-Fi on.
+    def wake(self,address):
+        self.boards[address]=None
+        self.wakes+=1
+
+    #Called when a board's power is turned off
+    def powerOff(self,address):
+        self.boards[address]=False
+
+    #Called after a write to a board's Wi-Fi switch
+    def switched(self,address,value,success):
+        if(success):
+            self.boards[address]=bool(value)
+        elif(self.boards.get(address)==False):
+            self.boards[address]=None #The write may have reached the board
+
+    #True if any board on the bus may have its Wi-Fi on
+    def possible(self):
+        return any(state is not False for state in self.boards.values())
+
+    #True if an off write should be sent to the board
+    def needsOff(self,address):
+        return self.boards.get(address) is not False
+
+    #Returns the timeout to use, raised only while interference is possible
+    def timeout(self,timeout):
+        if(self.possible()):
+            return max(timeout,self.interferenceTimeout)
+        return timeout
+
+    #Counts a transaction attempt by whether interference was possible
+    def record(self,outcome):
+        self.outcomes[self.possible()][outcome]+=1
+
+    #Returns a summary of the transactions with and without possible interference
+    def summary(self):
+        lines=["Wi-Fi may have been powered %d times" % self.wakes]
+        for [possible,label] in ((True,"may have been on"),(False,"was off")):
+            outcomes=self.outcomes[possible]
+            total=sum(outcomes.values())
+            failed=total-outcomes[Trace.OK]
+            lines.append("Transactions while the Wi-Fi %s: %d, failed: %d (%.1f%%)" %
+                         (label,total,failed,100.0*failed/max(total,1)))
+        return "\n".join(lines)
@@ -0,0 +1,122 @@
+#
+# @file		        : x2mbPrefetch.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	This file reads registers ahead of time while the tester is waiting
+#       on the operator. Before a prompt the tester schedules the reads the
+#       next module starts with. While input() is waiting they are read on a
+#       background thread and refreshed a few times, then kept in a short
+#       lived cache so the module gets its first answers without going to
+#       the bus. The tester only reads ahead at the retry prompt, since that
+#       is the only prompt followed by a module that reads before it writes.
+#
+#       A cached response is only used once and only while it is younger
+#       than the cache's time to live. Any write or power event clears the
+#       cache and the schedule, since either may change what was read.
+#
+# Usage:
+#   Called from the X2 PCB Tester Code
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import threading
+import time
+
+#Responses read ahead of time, by request frame
+class ReadCache:
+    def __init__(self,ttl=5.0):
+        self.ttl=ttl #Seconds a response can be used for after it was read
+        self.lock=threading.Lock() #Filled on the prefetch thread and used on the main thread
+        self.entries={} #{ Request bytes : [Response bytes, Time read] }
+        self.keys=None #mbReg keys to read during the next prompt
+        self.prefetched=0 #Responses read ahead of time
+        self.hits=0 #Reads that were answered from the cache
+        self.discarded=0 #Responses that were cleared or too old before they were used
+
+    #Sets the keys to read ahead during the next prompt (None for nothing)
+    def schedule(self,keys):
+        self.keys=keys or None
+
+    #Keeps a response read ahead of time
+    def store(self,request,response):
+        key=bytes(request)
+        with self.lock:
+            if(key in self.entries):
+                self.discarded+=1 #Replaced by a fresher read
+            self.entries[key]=[bytes(response),time.time()]
+            self.prefetched+=1
+
+    #Returns the cached response to a request and removes it, or None if there isn't a fresh one
+    def take(self,request):
+        with self.lock:
+            entry=self.entries.pop(bytes(request),None)
+            if(entry is None):
+                return None
+            if(time.time()-entry[1]>self.ttl):
+                self.discarded+=1
+                return None
+            self.hits+=1
+            return entry[0]
+
+    #Forgets everything read ahead and anything scheduled. Called on any write or power event.
+    def invalidate(self):
+        with self.lock:
+            self.discarded+=len(self.entries)
+            self.entries={}
+            self.keys=None
+
+    #Returns a summary of how much of the reading ahead was used
+    def summary(self):
+        return ("Reads answered from the prefetch: %d (%d made ahead of time, %d not used)" %
+                (self.hits,self.prefetched,self.discarded))
+
+#Used in place of input() so the scheduled reads are made while the operator is answering
+#read is called with the scheduled keys and should store the responses in the cache.
+#It is called again every refreshInterval, at most maxReads times, so an operator who
+#walks away doesn't keep the bus busy. The prompt doesn't return until the read in
+#progress has finished, so the main thread never shares the bus with the prefetch thread.
+class PrefetchingInput:
+    def __init__(self,inputFunction,cache,read,refreshInterval=2.5,maxReads=4):
+        self.inputFunction=inputFunction
+        self.cache=cache
+        self.read=read
+        self.refreshInterval=refreshInterval #Keep it under the cache's ttl so a fresh read is waiting until the last one
+        self.maxReads=maxReads #Reads per prompt. The last one is good for the cache's ttl after it.
+
+    def __call__(self,prompt=""):
+        keys=self.cache.keys
+        if(not keys):
+            return self.inputFunction(prompt)
+        stop=threading.Event()
+        thread=threading.Thread(target=self.run,args=(keys,stop),daemon=True)
+        thread.start()
+        try:
+            return self.inputFunction(prompt)
+        finally:
+            stop.set()
+            thread.join()
+
+    #Reads the keys until the operator answers or maxReads have been made
+    def run(self,keys,stop):
+        for i in range(0,self.maxReads):
+            self.read(keys)
+            if(stop.wait(self.refreshInterval)):
+                return
@@ -16,6 +16,9 @@
 #	This file holds all the modbus register information for the various
 #       required tests and data requests. This allows for a more readable
 #       code file by using names instead of just register numbers.
+#       The table is compiled into a RegisterMap when this file is imported.
+#       Overlapping keys are checked, placeholders are found, and the block
+#       requests needed to cover any set of keys are worked out once.
 # 
 # Usage:
 #   Called from the X2 PCB Tester Code
@@ -28,56 +31,190 @@
 # --------------------------------------------------------------------------
 #
 
+#Imports
+import collections
+
 #Dictionary of various Modbus Registers for interfacing to the X2
-#     { "Key"               :[(Register #), (# of Registers),  (Function Code) ]
-mbReg={ "Add"               :[0x1000,              1,                  4       ]#Reg1:Address
-        ,"RTCBAT_V"         :[0x750E,              2,                  16      ]#Reg1: Upper word of float; Reg2: Lower word of float
-        ,"SetTime"          :[0x701C,              4,                  16      ]#Reg1:Top of UTC Time; Reg2: Bottom of UTC Time; Reg3: Top of TZ Offset; Reg4: Bottom of TZ Offset
-        ,"ReadTime"         :[0x701C,              4,                  4       ]#Reg1:Top of UTC Time; Reg2: Bottom of UTC Time; Reg3: Top of TZ Offset; Reg4: Bottom of TZ Offset
-        ,"33SEPIC_OF"       :[0x7500,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"VCC33_V"          :[0x750C,              2,                  4       ]#Reg1: Upper word of float; Reg2: Lower word of float
-        ,"SDTest"           :[0x7523,              1,                  4       ]#Reg1: 0=write/read fail; 1=write/read success
-        ,"PriPwr_V"         :[0x7510,              2,                  4       ]#Reg1: Upper word of float; Reg2: Lower word of float
-        ,"SecPwr_V"         :[0x7512,              2,                  4       ]#Reg1: Upper word of float; Reg2: Lower word of float
-        ,"BakPwr_V"         :[0x7514,              2,                  4       ]#Reg1: Upper word of float; Reg2: Lower word of float
-        ,"Valid"            :[0x751C,              1,                  4       ]#Reg1: Bit mask(Bit0=Valid1;Bit1=Valid2;Bit2=Valid3) [EX. 0b000=All off; 0b001=Valid1 on; 0b011=Valid1&2 on; 0b111=All on]
-        ,"PPP_Dis"          :[0x750B,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"SysCur"           :[0x7518,              2,                  4       ]#Reg1: Upper word of float; Reg2: Lower word of float
-        ,"12SEPIC_OF"       :[0x7501,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"12VSen_V"         :[0x7516,              2,                  4       ]#Reg1: Upper word of float; Reg2: Lower word of float
-        ,"5VLDO_OF"         :[0x7502,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"12V_A_OF"         :[0x7503,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"12V_B_OF"         :[0x7504,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"12V_C_OF"         :[0x7505,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"12V_D_OF"         :[0x7506,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"SenCur"           :[0x751A,              2,                  4       ]#Reg1: Upper word of float; Reg2: Lower word of float
-        ,"PriPwr_OF"        :[0x7507,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"WiFiPwr_OF"       :[0x7508,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"WiFiComLEDTest"   :[0x7524,              1,                  4       ]#Reg1: 0=comm. fail; 1=comm. success - Each send also toggles LEDs on/off
-        ,"RS485ComTest"     :[0x752A,              1,                  4       ]#Reg1: 0=comm. fail; 1=comm. success
-        ,"RS232AComTest"    :[0x752B,              1,                  4       ]#Reg1: 0=comm. fail; 1=comm. success
-        ,"RS232BComTest"    :[0x752C,              1,                  4       ]#Reg1: 0=comm. fail; 1=comm. success
-        ,"RS232CComTest"    :[0x752D,              1,                  4       ]#Reg1: 0=comm. fail; 1=comm. success
-        ,"SDI12ComTest"     :[0x752E,              1,                  4       ]#Reg1: 0=comm. fail; 1=comm. success
-        ,"MagIntTest0"      :[0x7526,              2,                  4       ]#Reg1: Top of UTC time since last mag; Reg2: Bottom of UTC time since last mag
-        ,"MagIntTest1"      :[0x7528,              2,                  4       ]#Reg1: Top of UTC time since last mag; Reg2: Bottom of UTC time since last mag
-        ,"ReadInternalSens" :[0x751D,              6,                  4       ]#Reg1: Upper word of pressure float; Reg2: Lower word of pressure float; Reg1: Upper word of temp float; Reg2: Lower word of temp float; Reg1: Upper word of humidity float; Reg2: Lower word of humidity float; 
-        ,"K64LED"           :[0x7525,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"Trigger1_OF"      :[0x7509,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"Trigger2_OF"      :[0x750A,              1,                  16      ]#Reg1: 0=off; 1=on
-        ,"RTU50SysCur"      :[0x1000,              1,                  4       ]
-        ,"RTU33SysCur"      :[0x1000,              1,                  4       ]
-        ,"EthPwr_OF"        :[0x1000,              1,                  4       ]
-        ,"ReadTrigger1"     :[0x1000,              1,                  4       ]
-       }
+#     { "Key"               :[(Register #), (# of Registers),  (Function Code), (Type),   (Access)]
+#Types are decoded by x2mbCodec: float (2 registers each), time (2 registers of UTC seconds),
+#clock (UTC time then time zone offset), bitmask, status (0/1) and uint16
+#Access is r (read with function code 4), w (written with function code 16) or rw
+registerTable={ "Add"               :[0x1000,              1,                  4,      "uint16",   "rw"    ]#Reg1:Address
+                ,"RTCBAT_V"         :[0x750E,              2,                  4,      "float",    "r"     ]#Reg1: Upper word of float; Reg2: Lower word of float
+                ,"SetTime"          :[0x701C,              4,                  16,     "clock",    "w"     ]#Reg1:Top of UTC Time; Reg2: Bottom of UTC Time; Reg3: Top of TZ Offset; Reg4: Bottom of TZ Offset
+                ,"ReadTime"         :[0x701C,              4,                  4,      "clock",    "r"     ]#Reg1:Top of UTC Time; Reg2: Bottom of UTC Time; Reg3: Top of TZ Offset; Reg4: Bottom of TZ Offset
+                ,"33SEPIC_OF"       :[0x7500,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"VCC33_V"          :[0x750C,              2,                  4,      "float",    "r"     ]#Reg1: Upper word of float; Reg2: Lower word of float
+                ,"SDTest"           :[0x7523,              1,                  4,      "status",   "r"     ]#Reg1: 0=write/read fail; 1=write/read success
+                ,"PriPwr_V"         :[0x7510,              2,                  4,      "float",    "r"     ]#Reg1: Upper word of float; Reg2: Lower word of float
+                ,"SecPwr_V"         :[0x7512,              2,                  4,      "float",    "r"     ]#Reg1: Upper word of float; Reg2: Lower word of float
+                ,"BakPwr_V"         :[0x7514,              2,                  4,      "float",    "r"     ]#Reg1: Upper word of float; Reg2: Lower word of float
+                ,"Valid"            :[0x751C,              1,                  4,      "bitmask",  "r"     ]#Reg1: Bit mask(Bit0=Valid1;Bit1=Valid2;Bit2=Valid3) [EX. 0b000=All off; 0b001=Valid1 on; 0b011=Valid1&2 on; 0b111=All on]
+                ,"PPP_Dis"          :[0x750B,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"SysCur"           :[0x7518,              2,                  4,      "float",    "r"     ]#Reg1: Upper word of float; Reg2: Lower word of float
+                ,"12SEPIC_OF"       :[0x7501,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"12VSen_V"         :[0x7516,              2,                  4,      "float",    "r"     ]#Reg1: Upper word of float; Reg2: Lower word of float
+                ,"5VLDO_OF"         :[0x7502,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"12V_A_OF"         :[0x7503,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"12V_B_OF"         :[0x7504,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"12V_C_OF"         :[0x7505,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"12V_D_OF"         :[0x7506,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"SenCur"           :[0x751A,              2,                  4,      "float",    "r"     ]#Reg1: Upper word of float; Reg2: Lower word of float
+                ,"PriPwr_OF"        :[0x7507,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"WiFiPwr_OF"       :[0x7508,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"WiFiComLEDTest"   :[0x7524,              1,                  4,      "status",   "r"     ]#Reg1: 0=comm. fail; 1=comm. success - Each send also toggles LEDs on/off
+                ,"RS485ComTest"     :[0x752A,              1,                  4,      "status",   "r"     ]#Reg1: 0=comm. fail; 1=comm. success
+                ,"RS232AComTest"    :[0x752B,              1,                  4,      "status",   "r"     ]#Reg1: 0=comm. fail; 1=comm. success
+                ,"RS232BComTest"    :[0x752C,              1,                  4,      "status",   "r"     ]#Reg1: 0=comm. fail; 1=comm. success
+                ,"RS232CComTest"    :[0x752D,              1,                  4,      "status",   "r"     ]#Reg1: 0=comm. fail; 1=comm. success
+                ,"SDI12ComTest"     :[0x752E,              1,                  4,      "status",   "r"     ]#Reg1: 0=comm. fail; 1=comm. success
+                ,"MagIntTest0"      :[0x7526,              2,                  4,      "time",     "r"     ]#Reg1: Top of UTC time since last mag; Reg2: Bottom of UTC time since last mag
+                ,"MagIntTest1"      :[0x7528,              2,                  4,      "time",     "r"     ]#Reg1: Top of UTC time since last mag; Reg2: Bottom of UTC time since last mag
+                ,"ReadInternalSens" :[0x751D,              6,                  4,      "float",    "r"     ]#Reg1: Upper word of pressure float; Reg2: Lower word of pressure float; Reg1: Upper word of temp float; Reg2: Lower word of temp float; Reg1: Upper word of humidity float; Reg2: Lower word of humidity float; 
+                ,"K64LED"           :[0x7525,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"Trigger1_OF"      :[0x7509,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"Trigger2_OF"      :[0x750A,              1,                  16,     "status",   "rw"    ]#Reg1: 0=off; 1=on
+                ,"RTU50SysCur"      :[0x1000,              1,                  4,      "uint16",   "r"     ]
+                ,"RTU33SysCur"      :[0x1000,              1,                  4,      "uint16",   "r"     ]
+                ,"EthPwr_OF"        :[0x1000,              1,                  4,      "uint16",   "r"     ]
+                ,"ReadTrigger1"     :[0x1000,              1,                  4,      "uint16",   "r"     ]
+               }
+
+#Keys that are allowed to share registers (the same registers written one way and read another)
+aliases=[("SetTime","ReadTime")]
+
+#One compiled register entry. The fields are in the same order as the table so [0] is still the register number.
+Register=collections.namedtuple("Register",["reg","numReg","functionCode","type","access","key","placeholder"])
+
+#One request in a bus plan
+Block=collections.namedtuple("Block",["start","numReg","functionCode","keys"])
+
+#Compiled register table with named fields and bus plans that are worked out once
+#Raises ValueError if a key partly overlaps another key
+class RegisterMap(dict):
+    maxBlock=123 #Most registers a single function code 16 write can hold (reads can return 125)
+    maxGap=8 #Unused registers worth reading to save a request (a request costs about 17 character times more than a register)
+
+    def __init__(self,table,aliases):
+        dict.__init__(self)
+        self.placeholders=[] #Keys that share another key's registers without being an alias
+        self.plans={} #{ ((Keys), Function code) : [Block, ...] }
+        allowed=set(aliases)|set((second,first) for [first,second] in aliases)
+        for key in table:
+            [reg,numReg,functionCode,keyType,keyAccess]=table[key]
+            placeholder=False
+            for other in self.values():
+                if(other.placeholder or (key,other.key) in allowed):
+                    continue
+                if(reg<other.reg+other.numReg and other.reg<reg+numReg): #The registers overlap
+                    if((reg,numReg)!=(other.reg,other.numReg)):
+                        raise ValueError("%s overlaps %s" % (key,other.key))
+                    placeholder=True #Sits on an earlier key's registers so it isn't really mapped yet
+            if(placeholder):
+                self.placeholders.append(key)
+            self[key]=Register(reg,numReg,functionCode,keyType,keyAccess,key,placeholder)
+
+    #Returns the fewest requests that cover every key, worked out on first use
+    #Reads may include unused registers between keys, writes only join keys that are next to each other
+    #Raises ValueError for placeholders and for keys that can't be accessed that way
+    def plan(self,keys,functionCode=4):
+        planKey=(tuple(keys),functionCode)
+        blocks=self.plans.get(planKey)
+        if(blocks is None):
+            blocks=self._plan(keys,functionCode)
+            self.plans[planKey]=blocks
+        return blocks
+
+    def _plan(self,keys,functionCode):
+        if(functionCode==4):
+            [mode,maxGap]=["r",self.maxGap]
+        else:
+            [mode,maxGap]=["w",0]
+        blocks=[]
+        [start,end,blockKeys]=[None,None,[]]
+        for register in sorted(set(self[key] for key in keys)):
+            if(register.placeholder):
+                raise ValueError("%s is a placeholder and can't be used on the bus" % register.key)
+            if(mode not in register.access):
+                raise ValueError("%s doesn't allow access mode %s" % (register.key,mode))
+            if(blockKeys and register.reg-end<=maxGap and max(end,register.reg+register.numReg)-start<=self.maxBlock):
+                end=max(end,register.reg+register.numReg)
+                blockKeys.append(register.key)
+                continue
+            if(blockKeys):
+                blocks.append(Block(start,end-start,functionCode,tuple(blockKeys)))
+            [start,end,blockKeys]=[register.reg,register.reg+register.numReg,[register.key]]
+        if(blockKeys):
+            blocks.append(Block(start,end-start,functionCode,tuple(blockKeys)))
+        return blocks
+
+mbReg=RegisterMap(registerTable,aliases)
+
+#Contiguous block of function code 4 telemetry registers (0x750C-0x7522)
+#These can all be read back in a single request and split apart by key
+telemetryBlock=["VCC33_V"
+                ,"RTCBAT_V"
+                ,"PriPwr_V"
+                ,"SecPwr_V"
+                ,"BakPwr_V"
+                ,"12VSen_V"
+                ,"SysCur"
+                ,"SenCur"
+                ,"Valid"
+                ,"ReadInternalSens"
+               ]
+[telemetryStart,telemetryNumReg]=mbReg.plan(telemetryBlock)[0][0:2] #First register and total registers in the block
+
+#Contiguous bank of function code 16 on/off switches (0x7500-0x750B)
+#Several switches can be changed with a single write across the bank
+switchBank=["33SEPIC_OF"
+            ,"12SEPIC_OF"
+            ,"5VLDO_OF"
+            ,"12V_A_OF"
+            ,"12V_B_OF"
+            ,"12V_C_OF"
+            ,"12V_D_OF"
+            ,"PriPwr_OF"
+            ,"WiFiPwr_OF"
+            ,"Trigger1_OF"
+            ,"Trigger2_OF"
+            ,"PPP_Dis"
+           ]
+[switchBankStart,switchBankNumReg]=mbReg.plan(switchBank,16)[0][0:2] #First register and total registers in the bank
+
+#Reverse lookup of the register key from the request that was sent
+#     { ((Register #), (# of Registers), (Function Code)) : "Key" }
+#Keys whose function code matches are added first so SetTime/ReadTime stay separate,
+#then every key is added for each way its access allows. Placeholders are left out.
+regKey={}
+for register in mbReg.values():
+    if(not register.placeholder):
+        regKey.setdefault((register.reg,register.numReg,register.functionCode),register.key)
+for register in mbReg.values():
+    if(not register.placeholder):
+        if("r" in register.access):
+            regKey.setdefault((register.reg,register.numReg,4),register.key)
+        if("w" in register.access):
+            regKey.setdefault((register.reg,register.numReg,16),register.key)
+regKey[(telemetryStart,telemetryNumReg,4)]="Telemetry"
+regKey[(switchBankStart,switchBankNumReg,4)]="SwitchBank"
+
 #To get the register number
-#mbReg["KEY"][0]
-##print(mbReg["Add"][0])
+#mbReg["KEY"].reg
+##print(mbReg["Add"].reg)
 
 #To get the number of registers
-#mbReg["KEY"][1]
-##print(mbReg["Add"][1])
+#mbReg["KEY"].numReg
+##print(mbReg["Add"].numReg)
 
 #To get the function code
-#mbReg["KEY"][2]
-##print(mbReg["Add"][2])
+#mbReg["KEY"].functionCode
+##print(mbReg["Add"].functionCode)
+
+#To get the type
+#mbReg["KEY"].type
+##print(mbReg["Add"].type)
+
+#To get the fewest requests that read a set of keys
+#mbReg.plan(["KEY1","KEY2"])
+##print(mbReg.plan(["VCC33_V","SDTest"]))
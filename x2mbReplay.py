@@ -0,0 +1,336 @@
+#
+# @file		        : x2mbReplay.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	This file records everything the tester does with the hardware during
+#       a run (Modbus, the SPI ADC, GPIO, Wi-Fi scans and the operator's
+#       answers) to a gzipped file with one JSON line per interaction. A
+#       recorded run can then be replayed on any Linux computer, with the
+#       original response times or with none, so changes to the transport,
+#       decoding and test order can be timed without a Pi or a board.
+#
+#       Replayed responses are matched to the request that was sent, not
+#       just taken in order, so a run that asks for things in a different
+#       order still gets the board's answers. When a request has been
+#       answered as many times as it was recorded the last answer is reused.
+#
+# Usage:
+#   x2MainPCBTester.py -admin -record run.jsonl.gz
+#   x2MainPCBTester.py -admin -replay run.jsonl.gz [-replayLatency zero]
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import collections
+import gzip
+import json
+import threading
+import time
+import x2mbTransport as Mb
+
+#Interaction kinds
+MODBUS="modbus"
+SPI="spi"
+GPIO_INPUT="gpioIn"
+GPIO_OUTPUT="gpioOut"
+WIFI="wifi"
+INPUT="input"
+
+#Writes each interaction as a JSON line with the time since recording started
+class Recorder:
+    def __init__(self,fileName):
+        self.file=gzip.open(fileName,"wt")
+        self.lock=threading.Lock() #Boards tested at the same time share the recorder
+        self.startTime=time.time()
+        self.record("start",version=1,started=self.startTime)
+
+    def record(self,kind,**fields):
+        fields["kind"]=kind
+        fields["t"]=round(time.time()-self.startTime,6)
+        with self.lock:
+            self.file.write(json.dumps(fields,separators=(",",":"))+"\n")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+#Returns the name and details of an error so the same error can be raised on replay
+def describeError(error):
+    if(isinstance(error,Mb.SlaveException)):
+        return ["exception",error.code]
+    if(isinstance(error,Mb.CrcError)):
+        return ["crc",str(error)]
+    if(isinstance(error,ValueError)):
+        return ["frame",str(error)]
+    return ["timeout",str(error)]
+
+#Builds the error described by describeError
+def buildError(description):
+    [name,detail]=description
+    if(name=="exception"):
+        return Mb.SlaveException(detail)
+    if(name=="crc"):
+        return Mb.CrcError(detail)
+    if(name=="frame"):
+        return ValueError(detail)
+    return IOError(detail)
+
+#Records every transaction on a bus. Everything else goes straight to the bus.
+class RecordingBus:
+    def __init__(self,bus,recorder):
+        self.bus=bus
+        self.recorder=recorder
+
+    def __getattr__(self,name):
+        return getattr(self.bus,name)
+
+    def transact(self,request,responseLength,timeout):
+        sendTime=time.time()
+        try:
+            response=self.bus.transact(request,responseLength,timeout)
+        except Exception as error:
+            self.recorder.record(MODBUS,request=bytes(request).hex(),timeout=timeout,
+                                 latency=round(time.time()-sendTime,6),error=describeError(error))
+            raise
+        self.recorder.record(MODBUS,request=bytes(request).hex(),timeout=timeout,
+                             latency=round(time.time()-sendTime,6),response=bytes(response).hex())
+        return response
+
+#Records every SPI transfer (the ADC reads)
+class RecordingSpi:
+    def __init__(self,spi,recorder):
+        self.spi=spi
+        self.recorder=recorder
+
+    def __getattr__(self,name):
+        return getattr(self.spi,name)
+
+    def xfer2(self,data):
+        sendTime=time.time()
+        result=self.spi.xfer2(data)
+        self.recorder.record(SPI,request=list(data),response=list(result),latency=round(time.time()-sendTime,6))
+        return result
+
+#Records every GPIO read and write. Setup calls and constants go straight to the GPIO module.
+class RecordingGpio:
+    def __init__(self,gpio,recorder):
+        self.gpio=gpio
+        self.recorder=recorder
+
+    def __getattr__(self,name):
+        return getattr(self.gpio,name)
+
+    def input(self,pin):
+        value=self.gpio.input(pin)
+        self.recorder.record(GPIO_INPUT,pin=pin,value=value)
+        return value
+
+    def output(self,pin,value):
+        self.gpio.output(pin,value)
+        self.recorder.record(GPIO_OUTPUT,pin=pin,value=value)
+
+#Records the networks found by every Wi-Fi scan, or the error if the scan failed
+class RecordingCell:
+    def __init__(self,cell,recorder):
+        self.cell=cell
+        self.recorder=recorder
+
+    def all(self,interface):
+        startTime=time.time()
+        try:
+            cells=list(self.cell.all(interface))
+        except Exception as error:
+            self.recorder.record(WIFI,latency=round(time.time()-startTime,6),error=str(error))
+            raise
+        self.recorder.record(WIFI,latency=round(time.time()-startTime,6),ssids=[cell.ssid for cell in cells])
+        return cells
+
+#Records the operator's answer to every prompt
+class RecordingInput:
+    def __init__(self,inputFunction,recorder):
+        self.inputFunction=inputFunction
+        self.recorder=recorder
+
+    def __call__(self,prompt=""):
+        startTime=time.time()
+        answer=self.inputFunction(prompt)
+        self.recorder.record(INPUT,answer=answer,latency=round(time.time()-startTime,6))
+        return answer
+
+#A recorded run, loaded into queues of answers by kind and by what was asked
+class Recording:
+    def __init__(self,fileName,originalLatency=True):
+        self.originalLatency=originalLatency #Wait as long as the hardware took, otherwise answer right away
+        self.lock=threading.Lock()
+        self.queues={} #{ (Kind, Request) : deque of entries }
+        self.last={} #{ (Kind, Request) : last entry served }
+        with gzip.open(fileName,"rt") as traceFile:
+            for line in traceFile:
+                entry=json.loads(line)
+                kind=entry["kind"]
+                if(kind==MODBUS or kind==SPI):
+                    queueKey=(kind,str(entry["request"]))
+                elif(kind==GPIO_INPUT):
+                    queueKey=(kind,entry["pin"])
+                elif(kind in (WIFI,INPUT)):
+                    queueKey=(kind,None)
+                else:
+                    continue #Start line and GPIO writes aren't served back
+                self.queues.setdefault(queueKey,collections.deque()).append(entry)
+
+    #Returns the next entry for a request, the last one again if they've all been used, or None if it was never recorded
+    def next(self,kind,request=None):
+        queueKey=(kind,request)
+        with self.lock:
+            queue=self.queues.get(queueKey)
+            if(queue):
+                self.last[queueKey]=queue.popleft()
+            return self.last.get(queueKey)
+
+    #Waits as long as the recorded interaction took if the original latency is being kept
+    def wait(self,latency):
+        if(self.originalLatency and latency>0):
+            time.sleep(latency)
+
+#Stands in for the serial port settings the tester reads from the bus
+class ReplaySerial:
+    def __init__(self,baudrate=19200,timeout=0.5):
+        self.port="replay"
+        self.baudrate=baudrate
+        self.timeout=timeout
+
+#Answers Modbus requests from a recording
+#A recorded answer that took longer than the new timeout times out, so timeout changes can be measured
+#A request that was never recorded gets no answer, like a slave that isn't there
+class ReplayBus(Mb.BusQueue):
+    def __init__(self,recording,baudrate=19200,timeout=0.5):
+        Mb.BusQueue.__init__(self)
+        self.recording=recording
+        self.serial=ReplaySerial(baudrate,timeout)
+
+    def transact(self,request,responseLength,timeout):
+        self.acquire()
+        try:
+            entry=self.recording.next(MODBUS,bytes(request).hex())
+            if(entry is None):
+                self.recording.wait(timeout)
+                raise IOError("No communication with the instrument (not in the recording)")
+            if("error" not in entry and entry["latency"]>timeout):
+                self.recording.wait(timeout)
+                raise IOError("No communication with the instrument (recorded answer came after the timeout)")
+            self.recording.wait(entry["latency"])
+            if("error" in entry):
+                raise buildError(entry["error"])
+            return bytes.fromhex(entry["response"])
+        finally:
+            self.release()
+
+    def staleFrameCount(self):
+        return 0
+
+    def close(self):
+        pass
+
+#Answers ADC reads from a recording. A transfer that was never recorded reads 0 V.
+class ReplaySpi:
+    def __init__(self,recording):
+        self.recording=recording
+
+    def open(self,bus,device):
+        pass
+
+    def close(self):
+        pass
+
+    def xfer2(self,data):
+        entry=self.recording.next(SPI,str(list(data)))
+        if(entry is None):
+            return [0]*len(data)
+        self.recording.wait(entry["latency"])
+        return list(entry["response"])
+
+#Keeps the state of the output pins and answers input pins from a recording
+class ReplayGpio:
+    BOARD=10
+    BCM=11
+    OUT=0
+    IN=1
+    HIGH=1
+    LOW=0
+
+    def __init__(self,recording):
+        self.recording=recording
+        self.modes={} #{ Pin : IN or OUT }
+        self.state={} #{ Pin : Value written }
+
+    def setmode(self,mode):
+        pass
+
+    def setwarnings(self,flag):
+        pass
+
+    def setup(self,pin,mode):
+        self.modes[pin]=mode
+
+    def cleanup(self):
+        self.state={}
+
+    def output(self,pin,value):
+        self.state[pin]=value
+
+    #Output pins read back what was written, like the real pins do
+    def input(self,pin):
+        if(self.modes.get(pin)==self.OUT):
+            return self.state.get(pin,self.LOW)
+        entry=self.recording.next(GPIO_INPUT,pin)
+        if(entry is None):
+            return self.LOW
+        return entry["value"]
+
+#A network found by a replayed Wi-Fi scan
+Network=collections.namedtuple("Network",["ssid"])
+
+#Answers Wi-Fi scans from a recording
+class ReplayCell:
+    def __init__(self,recording):
+        self.recording=recording
+
+    def all(self,interface):
+        entry=self.recording.next(WIFI)
+        if(entry is None):
+            return []
+        self.recording.wait(entry["latency"])
+        if("error" in entry):
+            raise IOError(entry["error"])
+        return [Network(ssid) for ssid in entry["ssids"]]
+
+#Gives the operator's recorded answers in order. The time the operator took isn't replayed.
+#Raises EOFError once every answer has been used so the run ends instead of waiting on a prompt.
+class ReplayInput:
+    def __init__(self,recording):
+        self.recording=recording
+        self.answers=recording.queues.get((INPUT,None),collections.deque())
+
+    def __call__(self,prompt=""):
+        if(not self.answers):
+            raise EOFError("The recorded operator answers have all been used")
+        answer=self.answers.popleft()["answer"]
+        print("%s%s" % (prompt,answer))
+        return answer
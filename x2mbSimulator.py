@@ -0,0 +1,759 @@
+#!/usr/bin/env python3
+
+#
+# @file		        : x2mbSimulator.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	Simulates an X2 (universal address 252) and the RS-485 passthrough
+#       T-Node (address 20) on a pseudo-terminal, so the tester can be run
+#       and timed on any Linux computer without a fixture or a board.
+#
+#       Every register in x2mbRegisters is served with reads (function
+#       code 4), writes (16) and writes then reads (23). The switches gate the
+#       rails, the telemetry follows the rails that are on, the RTC keeps
+#       running across power cycles, a new address is saved to EE and used
+#       from the next power up, and the status registers pass when the
+#       rails they need are on. Responses are delayed by the time the frames
+#       would take on the wire so runs are timed at bus speed.
+#
+#       The power inputs, trigger lines, ADC and Wi-Fi scans of the fixture
+#       are served on a control port. The tester connects to it with -sim
+#       and uses SimGpio, SimSpi and SimCell in place of the Pi's hardware.
+#
+#       Faults can be injected to make a bad bus or a bad board that fails
+#       the same way every run: dropped frames, CRC errors, late responses,
+#       a rail stuck out of tolerance, an RTC that doesn't keep the time, EE
+#       that forgets the address and a sensor port that never answers. Each
+#       fault is attached to the register keys it affects and has its own
+#       seeded random numbers, so adding one fault doesn't change when the
+#       others happen. Faults are chosen by the profile names in
+#       faultProfiles (joined with commas) or a JSON file of fault entries.
+#
+# Usage:
+#   python3 x2mbSimulator.py [-link /tmp/x2sim] [-control 5021] [-magnets auto|manual] [-seed 0] [-writeRead 0]
+#                            [-faults dropFrames,stuckRail | -faults faults.json]
+#   Then start the tester with: x2MainPCBTester.py -admin -sim localhost:5021
+#
+#   Control commands (one per line, each answered with one line):
+#     port                  Name of the simulated serial port
+#     gpio <pin> <0|1>      Set a fixture output pin (power inputs and T-Node power)
+#     input <pin>           Read a fixture input pin (trigger lines)
+#     adc <channel>         Voltage at an ADC channel's pin
+#     wifi                  Networks found by a Wi-Fi scan, separated by tabs
+#     magnet <0|1>          Trigger a magnetic switch (with -magnets manual)
+#     faults <faults> [seed] Replace the faults being injected, starting their random numbers over
+#     faultCounts           Number of each fault injected so far
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import tty
+import x2mbCodec as Codec
+import x2mbRegisters as Reg
+import x2mbTransport as Mb
+
+
+def main():
+    ##############################
+    ## Define program variables ##
+    ##############################
+
+    #Simulated Bus Parameters
+    baud = 19200 #Only used to time the responses, a pseudo-terminal has no baud rate
+    turnaround = 0.004 #Seconds the K64 takes to start answering a request
+    wifiDelay = 0.05 #Extra seconds per answer while the Wi-Fi module is on and talking to the K64
+    writeRead = int(getOption("-writeRead",1)) #0=answer function code 23 with an illegal function exception like older firmware
+    linkName = getOption("-link",None) #Fixed name for the port, so the tester doesn't need the /dev/pts number
+
+    #Simulated Board Parameters
+    magnets = getOption("-magnets","auto") #auto=the magnets read as just triggered; manual=only when sent on the control port
+    seed = int(getOption("-seed",0)) #Seed for the noise on the readings and the faults so runs can be repeated
+    faults = getOption("-faults","none") #Fault profiles to inject (see faultProfiles) or a JSON file of fault entries
+
+    #Control Port Parameters
+    listenAddress = '127.0.0.1' #Only programs on this computer can connect
+    listenPort = int(getOption("-control",5021))
+
+    ######################
+    ## Start Simulating ##
+    ######################
+
+    board = X2Board(random.Random(seed),magnets)
+    board.faults = loadFaults(faults,seed)
+    tnode = TNode()
+    simulator = Simulator(board,tnode,baud,turnaround,wifiDelay,writeRead)
+    control = Control(simulator)
+
+    if(linkName):
+        if(os.path.islink(linkName)):
+            os.remove(linkName)
+        os.symlink(simulator.portName,linkName)
+
+    loop = asyncio.get_event_loop()
+    simulator.start(loop)
+    server = loop.run_until_complete(asyncio.start_server(control.handleClient,listenAddress,listenPort))
+    logging.info("Simulating an X2 at address %d and a T-Node at address %d on %s",
+                 universalAddress,TNode.address,linkName or simulator.portName)
+    logging.info("Fixture control on %s:%d",listenAddress,listenPort)
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        logging.info("The simulator was stopped by a keyboard interrupt")
+    finally:
+        server.close()
+        simulator.close()
+        if(linkName and os.path.islink(linkName)):
+            os.remove(linkName)
+
+#Address every X2 answers on
+universalAddress=252
+
+#Raspberry Pi board pins, the same as the tester's pinDict
+pins={"IO1"        :   11, #Primary power input
+      "IO2"        :   13, #Secondary power input
+      "IO3"        :   15, #Backup power input
+      "IO4"        :   12, #T-Node power
+      "TRIGGER1"   :   16,
+      "TRIGGER2"   :   18
+     }
+
+#Voltage dividers on the fixture's ADC channels, the same ones the tester scales the readings by
+#     { Channel : [(R1), (R2)] }
+dividers={1:[6.04,10], #5V LDO
+          2:[27.4,10], #12V sensor port A
+          3:[27.4,10], #12V sensor port B
+          4:[27.4,10], #12V sensor port C
+          5:[27.4,10], #12V sensor port D
+          6:[82.5,10], #Priority power out on J7
+          7:[82.5,10]  #Priority power out on J3
+         }
+
+#Switch state after a power up. The K64 turns the Wi-Fi module on when it boots.
+powerUpSwitches=dict((key,0) for key in Reg.mbReg if Reg.mbReg[key].type=="status" and "w" in Reg.mbReg[key].access)
+powerUpSwitches["WiFiPwr_OF"]=1
+
+#Faults that can be injected and the settings each one uses
+#Every fault also takes "keys" (the mbReg keys it's attached to, default ["*"] for all)
+#and "rate" (chance it happens each time it could, default 1)
+#     { "Fault"     : {(Settings and their defaults)} }
+faultDefaults={"drop"     : {},             #The request isn't answered
+               "crc"      : {},             #One bit of the response is flipped
+               "late"     : {"delay":1.0},  #The response is sent this many seconds late
+               "stuck"    : {"value":0.0},  #The keys read this value whatever the rails are doing
+               "rtcReset" : {},             #The RTC loses the time when the board powers up
+               "eeForget" : {},             #The address saved to EE is lost when the board powers up
+               "noAnswer" : {"delay":2.0}   #The sensor port never answers, so its status fails after the X2 gives up waiting
+              }
+
+#Named fault profiles
+faultProfiles={"none"           : [],
+               "dropFrames"     : [{"fault":"drop","rate":0.1}],
+               "crcErrors"      : [{"fault":"crc","rate":0.1}],
+               "lateResponses"  : [{"fault":"late","rate":0.1,"delay":0.6}], #Just past the tester's 0.5 second timeout
+               "stuckRail"      : [{"fault":"stuck","keys":["VCC33_V"],"value":3.05}],
+               "rtcNoRetain"    : [{"fault":"rtcReset","keys":["ReadTime"]}],
+               "eeForgets"      : [{"fault":"eeForget","keys":["Add"]}],
+               "deadSensorPort" : [{"fault":"noAnswer","keys":["RS232BComTest"]}]
+              }
+
+#Faults being injected, each with its own random numbers
+#Raises ValueError for a fault that isn't in faultDefaults
+class Faults:
+    def __init__(self,entries=(),seed=0):
+        self.entries=[] #[Settings, Random numbers]
+        self.counts=collections.Counter() #Number of each fault injected
+        for [i,entry] in enumerate(entries):
+            if(entry.get("fault") not in faultDefaults):
+                raise ValueError("%s is not a fault that can be injected" % entry.get("fault"))
+            settings={"keys":["*"],"rate":1.0}
+            settings.update(faultDefaults[entry["fault"]])
+            settings.update(entry)
+            self.entries.append([settings,random.Random(seed*1000+i)])
+
+    #Returns the entries of a fault that happen this time on any of the keys (None for faults not tied to a request)
+    def happening(self,fault,keys=None):
+        found=[]
+        for [settings,rng] in self.entries:
+            if(settings["fault"]!=fault):
+                continue
+            if(keys is not None and "*" not in settings["keys"] and not keys.intersection(settings["keys"])):
+                continue
+            if(rng.random()<settings["rate"]):
+                self.counts[fault]+=1
+                found.append([settings,rng])
+        return found
+
+    #Changes the values read for a request and returns the extra seconds before it is answered
+    def apply(self,values,keys):
+        delay=0
+        for [settings,rng] in self.happening("stuck",keys):
+            for key in settings["keys"]:
+                if(key in values):
+                    values[key]=settings["value"]
+        for [settings,rng] in self.happening("noAnswer",keys):
+            for key in settings["keys"]:
+                if(key in values):
+                    values[key]=0
+            delay+=settings["delay"]
+        for [settings,rng] in self.happening("late",keys):
+            delay+=settings["delay"]
+        return delay
+
+    #Returns the response as it arrives, or None if it is dropped
+    def frame(self,response,keys):
+        if(self.happening("drop",keys)):
+            return None
+        for [settings,rng] in self.happening("crc",keys):
+            corrupted=bytearray(response)
+            corrupted[rng.randrange(2,len(corrupted))]^=1<<rng.randrange(0,8) #The address and function code are left so the frame is still found
+            response=bytes(corrupted)
+        return response
+
+#Returns the faults for profile names joined with commas, or a JSON file holding a list of fault entries
+def loadFaults(spec,seed=0):
+    entries=[]
+    for name in spec.split(","):
+        if(name in faultProfiles):
+            entries.extend(faultProfiles[name])
+        else:
+            with open(name,'r') as in_faults:
+                entries.extend(json.load(in_faults))
+    return Faults(entries,seed)
+
+#The X2 under test
+class X2Board:
+    bootTime=1.0 #Seconds after power is applied before the K64 answers
+    inputVoltage=12.0 #Supply on each of the fixture's power inputs
+    defaultAddress=1 #Address in a blank EE
+    rtcResetTime=946684800 #Time an RTC that lost power starts from (Jan 1, 2000)
+
+    def __init__(self,rng,magnets="auto"):
+        self.rng=rng
+        self.magnets=magnets
+        self.lock=threading.Lock() #The bus and the control port change the board from different threads
+        self.inputs={"IO1":0,"IO2":0,"IO3":0}
+        self.faults=Faults()
+        self.eeAddress=self.defaultAddress #Address saved in EE, used from the next power up
+        self.address=None #Address answered on besides the universal address (None while off)
+        self.switches=dict(powerUpSwitches)
+        self.powered=False
+        self.readyTime=0
+        self.rtcOffset=0.0 #RTC time minus this computer's time. The RTC battery keeps it through power cycles.
+        self.tzOffset=0
+        self.magnetTimes=[0,0] #RTC time each magnetic switch was last triggered
+
+    #Returns whether the primary, secondary and backup inputs are supplying the board
+    #PPP_Dis pulls the primary input's undervoltage line low, disconnecting it
+    def powerInputs(self):
+        return [bool(self.inputs["IO1"]) and not self.switches["PPP_Dis"],
+                bool(self.inputs["IO2"]),
+                bool(self.inputs["IO3"])]
+
+    #Boots or shuts down the board when its supply comes or goes
+    def update(self):
+        supplied=any(self.powerInputs())
+        if(self.powered and not supplied):
+            self.powered=False
+            self.address=None
+            self.switches=dict(powerUpSwitches) #The switches drop with the K64, which also releases PPP_Dis
+            supplied=any(self.powerInputs())
+            logging.debug("X2 powered off")
+        if(supplied and not self.powered):
+            if(self.faults.happening("eeForget")):
+                self.eeAddress=self.defaultAddress
+            if(self.faults.happening("rtcReset")):
+                self.rtcOffset=self.rtcResetTime-time.time()
+            self.powered=True
+            self.address=self.eeAddress
+            self.switches=dict(powerUpSwitches)
+            self.readyTime=time.time()+self.bootTime
+            logging.debug("X2 powered on at address %d",self.address)
+
+    def setInput(self,name,value):
+        with self.lock:
+            self.inputs[name]=value
+            self.update()
+
+    #Returns whether the board answers requests sent to an address
+    def answers(self,address):
+        return self.powered and time.time()>=self.readyTime and address in (universalAddress,self.address)
+
+    def rtc(self):
+        return int(time.time()+self.rtcOffset)
+
+    #Returns a reading with a little noise on it
+    def noise(self,value,spread):
+        return value+self.rng.gauss(0,spread)
+
+    #Returns the value of every key that can be read
+    def values(self):
+        on=self.switches
+        [pri,sec,bak]=self.powerInputs()
+        sepic33=on["33SEPIC_OF"]
+        sepic12=on["12SEPIC_OF"]
+        ports=[on["12V_A_OF"],on["12V_B_OF"],on["12V_C_OF"],on["12V_D_OF"]]
+        values=dict(on)
+        values["Add"]=self.eeAddress
+        values["RTCBAT_V"]=self.noise(3.0,0.01)
+        values["ReadTime"]=[self.rtc(),self.tzOffset]
+        values["VCC33_V"]=self.noise(3.3,0.005)*sepic33
+        values["PriPwr_V"]=self.noise(self.inputVoltage,0.02)*pri
+        values["SecPwr_V"]=self.noise(self.inputVoltage,0.02)*sec
+        values["BakPwr_V"]=self.noise(self.inputVoltage,0.02)*bak
+        values["Valid"]=pri|(sec<<1)|(bak<<2)
+        values["SysCur"]=self.noise(10+9*sepic33+6*sepic12+3*on["5VLDO_OF"]+80*on["WiFiPwr_OF"],0.2) #mA
+        values["12VSen_V"]=self.noise(12.0,0.02)*sepic12
+        values["SenCur"]=self.noise(5.0,0.1)*sum(ports)*sepic12 #mA, one simulated sensor on each port that is on
+        values["ReadInternalSens"]=[self.noise(1013.0,0.5)*sepic33, #mBar
+                                    self.noise(22.0,0.1)*sepic33, #Degrees C
+                                    self.noise(45.0,0.5)*sepic33] #Percent humidity
+        values["SDTest"]=sepic33
+        values["WiFiComLEDTest"]=sepic33 and on["WiFiPwr_OF"]
+        values["RS232AComTest"]=sepic12 and ports[0]
+        values["RS232BComTest"]=sepic12 and ports[1]
+        values["RS232CComTest"]=sepic12 and ports[2]
+        values["RS485ComTest"]=sepic12 and any(ports[0:3])
+        values["SDI12ComTest"]=sepic12 and any(ports[0:3])
+        if(self.magnets=="auto"): #Read as if the operator just used the magnet when asked
+            values["MagIntTest0"]=self.rtc()-2
+            values["MagIntTest1"]=self.rtc()-2
+        else:
+            values["MagIntTest0"]=self.magnetTimes[0]
+            values["MagIntTest1"]=self.magnetTimes[1]
+        return values
+
+    #Applies a write to one key
+    def write(self,key,value):
+        if(key=="Add"):
+            self.eeAddress=value #Answered on from the next power up
+        elif(key=="SetTime"):
+            [utcTime,self.tzOffset]=value
+            self.rtcOffset=utcTime-time.time()
+        else:
+            self.switches[key]=value
+            self.update() #PPP_Dis may have disconnected the only supply
+
+    #Returns the voltage at an ADC channel's pin
+    def analog(self,channel):
+        with self.lock:
+            on=self.switches
+            if(channel==0): #3V LDO, on whenever the board is supplied
+                volts=3.0*self.powered
+            elif(channel==1):
+                volts=5.0*(self.powered and on["12SEPIC_OF"] and on["5VLDO_OF"])
+            elif(channel in (2,3,4,5)):
+                port=["12V_A_OF","12V_B_OF","12V_C_OF","12V_D_OF"][channel-2]
+                volts=12.0*(self.powered and on["12SEPIC_OF"] and on[port])
+            else:
+                volts=self.inputVoltage*(self.powered and on["PriPwr_OF"])
+            if(channel in dividers):
+                [R1,R2]=dividers[channel]
+                volts=volts*R2/(R1+R2)
+            return max(self.noise(volts,0.002),0.0)
+
+    #Returns the state of a trigger line (0 or 1)
+    def trigger(self,number):
+        with self.lock:
+            return int(self.powered and bool(self.switches["Trigger%d_OF" % number]))
+
+    #Returns the names of the networks a Wi-Fi scan finds
+    def networks(self):
+        with self.lock:
+            if(self.powered and self.switches["WiFiPwr_OF"]):
+                return ["X2 Logger %04d" % self.eeAddress]
+            return []
+
+    def magnet(self,number):
+        with self.lock:
+            self.magnetTimes[number]=self.rtc()
+
+#The RS-485 passthrough T-Node
+class TNode:
+    address=20
+    bootTime=0.5
+
+    def __init__(self):
+        self.powered=False
+        self.readyTime=0
+
+    def setPower(self,value):
+        if(value and not self.powered):
+            self.readyTime=time.time()+self.bootTime
+        self.powered=bool(value)
+
+    def answers(self,address):
+        return self.powered and time.time()>=self.readyTime and address==self.address
+
+#Serves the X2 and T-Node on one end of a pseudo-terminal
+class Simulator:
+    def __init__(self,board,tnode,baud,turnaround,wifiDelay,writeRead=True):
+        self.board=board
+        self.tnode=tnode
+        self.writeRead=writeRead #Answer function code 23 (write then read). Older firmware doesn't have it.
+        self.baud=baud
+        self.turnaround=turnaround
+        self.wifiDelay=wifiDelay
+        [self.master,self.slave]=os.openpty()
+        tty.setraw(self.slave) #No echo or line editing, like a serial port
+        self.portName=os.ttyname(self.slave) #The slave end is kept open so the port stays up between tester runs
+        self.buffer=bytearray()
+        self.latestReadTime=0
+        self.loop=None
+        [self.readable,self.writable]=self.registerMaps()
+
+    #Returns { Register # : (Key, Word index) } for every register that can be read and every one that can be written
+    def registerMaps(self):
+        readable={}
+        writable={}
+        for register in Reg.mbReg.values():
+            if(register.placeholder):
+                continue
+            for i in range(0,register.numReg):
+                if("r" in register.access):
+                    readable[register.reg+i]=(register.key,i)
+                if("w" in register.access):
+                    writable[register.reg+i]=(register.key,i)
+        return [readable,writable]
+
+    def start(self,loop):
+        self.loop=loop
+        loop.add_reader(self.master,self.receive)
+
+    def close(self):
+        if(self.loop):
+            self.loop.remove_reader(self.master)
+        os.close(self.master)
+        os.close(self.slave)
+
+    #Time a frame takes on the wire (10 bits per character)
+    def wireTime(self,frame):
+        return len(frame)*10.0/self.baud
+
+    #Reads what the tester sent and answers each complete request
+    def receive(self):
+        try:
+            data=os.read(self.master,Mb.maxFrameLength)
+        except OSError:
+            return
+        now=time.time()
+        if(now-self.latestReadTime>Mb.silentPeriod(self.baud)+0.01): #A silent period ends any partial frame
+            self.buffer=bytearray()
+        self.latestReadTime=now
+        self.buffer+=data
+        while(True):
+            length=requestLength(self.buffer)
+            if(length is None or len(self.buffer)<length):
+                return
+            request=bytes(self.buffer[0:length])
+            del self.buffer[0:length]
+            if(not Mb.checkCrc(request)): #A corrupted frame is ignored along with anything behind it
+                self.buffer=bytearray()
+                return
+            [response,delay]=self.respond(request)
+            if(response):
+                self.loop.call_later(delay,self.send,response)
+
+    def send(self,response):
+        os.write(self.master,response)
+
+    #Returns the response to a request and how long after it arrived to send it, or [None,0] if no one answers
+    def respond(self,request):
+        address=request[0]
+        pdu=request[1:-2]
+        board=self.board
+        keys=None
+        with board.lock:
+            if(board.answers(address)):
+                keys=self.requestKeys(pdu)
+                faultDelay=[]
+                def read(): #Values are worked out after any write in the request, with the faults applied
+                    values=board.values()
+                    faultDelay.append(board.faults.apply(values,keys))
+                    return values
+                responsePdu=self.handle(pdu,read,board.write)
+                if(not faultDelay): #Nothing was read, but a write can still be answered late
+                    faultDelay.append(board.faults.apply({},keys))
+                delay=self.turnaround+board.switches["WiFiPwr_OF"]*self.wifiDelay+faultDelay[0]
+            elif(self.tnode.answers(address)):
+                responsePdu=self.handle(pdu,lambda: {"Add":self.tnode.address},None)
+                delay=self.turnaround
+            else:
+                return [None,0]
+        response=Mb.appendCrc(bytes([address])+responsePdu)
+        wire=self.wireTime(request)+self.wireTime(response)
+        if(address==self.tnode.address): #The passthrough forwards both frames again at the same baud rate
+            wire=2*wire
+        if(keys is not None):
+            with board.lock:
+                response=board.faults.frame(response,keys)
+        return [response,wire+delay]
+
+    #Returns the set of keys with registers in a read or write request
+    #A write then read request has both ranges
+    def requestKeys(self,pdu):
+        ranges=[]
+        if(len(pdu)>=5):
+            ranges.append(struct.unpack(">HH",pdu[1:5]))
+        if(pdu[0]==Mb.FC_READ_WRITE and len(pdu)>=9):
+            ranges.append(struct.unpack(">HH",pdu[5:9]))
+        return set(register.key for register in Reg.mbReg.values() for [reg,numReg] in ranges
+                   if not register.placeholder and register.reg<reg+numReg and reg<register.reg+register.numReg)
+
+    #Returns the response PDU to a request PDU
+    #read returns the values by key, write applies a value to a key (None if nothing can be written)
+    #Registers that aren't mapped read as 0. Writes are only allowed to registers that can be written.
+    def handle(self,pdu,read,write):
+        functionCode=pdu[0]
+        if(functionCode==Mb.FC_READ_INPUT and len(pdu)==5):
+            [reg,numReg]=struct.unpack(">HH",pdu[1:5])
+            return self.readResponse(functionCode,reg,numReg,read)
+        if(functionCode==Mb.FC_WRITE_MULTIPLE and len(pdu)>=6):
+            [reg,numReg,byteCount]=struct.unpack(">HHB",pdu[1:6])
+            error=self.applyWrite(functionCode,reg,numReg,byteCount,pdu[6:],write)
+            return error or pdu[0:5]
+        if(functionCode==Mb.FC_READ_WRITE and self.writeRead and len(pdu)>=10):
+            [readReg,readNumReg,writeReg,writeNumReg,byteCount]=struct.unpack(">HHHHB",pdu[1:10])
+            if(readNumReg<1 or readNumReg>125):
+                return bytes([functionCode|0x80,0x03])
+            error=self.applyWrite(functionCode,writeReg,writeNumReg,byteCount,pdu[10:],write) #The write is done before the read
+            return error or self.readResponse(functionCode,readReg,readNumReg,read)
+        return bytes([functionCode|0x80,0x01]) #Illegal function
+
+    #Returns the response PDU for a read of registers
+    def readResponse(self,functionCode,reg,numReg,read):
+        if(numReg<1 or numReg>125):
+            return bytes([functionCode|0x80,0x03]) #Illegal data value
+        values=read()
+        words=[]
+        for r in range(reg,reg+numReg):
+            entry=self.readable.get(r)
+            if(entry is None or entry[0] not in values):
+                words.append(0)
+            else:
+                [key,i]=entry
+                words.append(encodeValue(key,values[key])[i])
+        return bytes([functionCode,2*numReg])+Codec.words(numReg).pack(*words)
+
+    #Applies a write of registers. Returns the exception PDU if it can't be done or None if it was.
+    def applyWrite(self,functionCode,reg,numReg,byteCount,data,write):
+        if(byteCount!=2*numReg or len(data)!=byteCount):
+            return bytes([functionCode|0x80,0x03]) #Illegal data value
+        if(write is None or any(r not in self.writable for r in range(reg,reg+numReg))):
+            return bytes([functionCode|0x80,0x02]) #Illegal data address
+        for key in writtenKeys(self.writable,reg,numReg):
+            write(key,Codec.decode(key,data,2*(Reg.mbReg[key].reg-reg)))
+        return None
+
+#Returns the length of the request at the start of the buffer, or None if more is needed to tell
+def requestLength(buffer):
+    if(len(buffer)<2):
+        return None
+    functionCode=buffer[1]
+    if(functionCode in (15,16)): #Byte count is the 7th byte
+        if(len(buffer)<7):
+            return None
+        return 9+buffer[6]
+    if(functionCode==23): #Byte count is the 11th byte
+        if(len(buffer)<11):
+            return None
+        return 13+buffer[10]
+    return 8 #Reads and single writes
+
+#Returns the keys whose registers are all inside a write
+def writtenKeys(writable,reg,numReg):
+    keys=[]
+    for r in range(reg,reg+numReg):
+        [key,i]=writable[r]
+        if(i==0 and r+Reg.mbReg[key].numReg<=reg+numReg):
+            keys.append(key)
+    return keys
+
+#Returns the 16-bit register values for a key's value
+#Switch and status values may be bools from the model, so they are made whole numbers first
+def encodeValue(key,value):
+    if(Reg.mbReg[key].type in ("status","bitmask","uint16")):
+        value=int(value)&0xFFFF
+    return Codec.encode(key,value)
+
+#Serves the fixture's pins, ADC and Wi-Fi scans to the tester
+class Control:
+    def __init__(self,simulator):
+        self.simulator=simulator
+        self.pinNames=dict((pin,name) for [name,pin] in pins.items())
+
+    async def handleClient(self,reader,writer):
+        logging.info("Tester connected to the fixture control from %s",writer.get_extra_info('peername'))
+        try:
+            while True:
+                line=await reader.readline()
+                if(not line):
+                    break
+                writer.write((self.command(line.decode().split())+"\n").encode())
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            logging.info("Tester disconnected from the fixture control")
+
+    #Carries out one control command and returns the answer
+    def command(self,words):
+        board=self.simulator.board
+        try:
+            if(words==["port"]):
+                return self.simulator.portName
+            if(words[0]=="gpio"):
+                [pin,value]=[int(words[1]),int(words[2])]
+                name=self.pinNames.get(pin)
+                if(name=="IO4"):
+                    self.simulator.tnode.setPower(value)
+                elif(name in board.inputs):
+                    board.setInput(name,value)
+                return "ok"
+            if(words[0]=="input"):
+                name=self.pinNames.get(int(words[1]))
+                if(name in ("TRIGGER1","TRIGGER2")):
+                    return str(board.trigger(int(name[-1])))
+                return "0"
+            if(words[0]=="adc"):
+                return "%.4f" % board.analog(int(words[1]))
+            if(words==["wifi"]):
+                return "\t".join(board.networks())
+            if(words[0]=="magnet"):
+                board.magnet(int(words[1]))
+                return "ok"
+            if(words[0]=="faults"):
+                faults=loadFaults(words[1],int(words[2]) if len(words)>2 else 0)
+                with board.lock:
+                    board.faults=faults
+                return "ok"
+            if(words==["faultCounts"]):
+                with board.lock:
+                    return json.dumps(dict(board.faults.counts))
+        except (IndexError,ValueError,IOError):
+            pass
+        return "error"
+
+#Connection to the simulator's control port, shared by SimGpio, SimSpi and SimCell
+class SimControl:
+    def __init__(self,host='localhost',port=5021):
+        self.socket=socket.create_connection((host,port))
+        self.file=self.socket.makefile("rw")
+        self.lock=threading.Lock()
+
+    #Sends a command and returns the answer
+    def ask(self,*words):
+        with self.lock:
+            self.file.write(" ".join(str(word) for word in words)+"\n")
+            self.file.flush()
+            return self.file.readline().rstrip("\n")
+
+    def close(self):
+        self.socket.close()
+
+#Stands in for RPi.GPIO, setting the simulated fixture's pins
+class SimGpio:
+    BOARD=10
+    BCM=11
+    OUT=0
+    IN=1
+    HIGH=1
+    LOW=0
+
+    def __init__(self,control):
+        self.control=control
+        self.modes={} #{ Pin : IN or OUT }
+        self.state={} #{ Pin : Value written }
+
+    def setmode(self,mode):
+        pass
+
+    def setwarnings(self,flag):
+        pass
+
+    def setup(self,pin,mode):
+        self.modes[pin]=mode
+
+    def cleanup(self):
+        for pin in self.state:
+            self.control.ask("gpio",pin,self.LOW)
+        self.state={}
+
+    def output(self,pin,value):
+        self.state[pin]=value
+        self.control.ask("gpio",pin,value)
+
+    #Output pins read back what was written, like the real pins do
+    def input(self,pin):
+        if(self.modes.get(pin)==self.OUT):
+            return self.state.get(pin,self.LOW)
+        return int(self.control.ask("input",pin))
+
+#Stands in for the SPI bus to the MCP3008 ADC
+class SimSpi:
+    def __init__(self,control):
+        self.control=control
+
+    def open(self,bus,device):
+        pass
+
+    def close(self):
+        pass
+
+    #Answers a single ended MCP3008 read ([1,(8+ch)<<4,0]) with the 10-bit reading
+    def xfer2(self,data):
+        channel=(data[1]>>4)-8
+        volts=float(self.control.ask("adc",channel))
+        reading=min(max(int(round(volts*1023/3.3)),0),1023)
+        return [0,reading>>8,reading&0xFF]
+
+#A network found by a simulated Wi-Fi scan
+Network=collections.namedtuple("Network",["ssid"])
+
+#Stands in for wifi.Cell, scanning the simulated board's Wi-Fi
+class SimCell:
+    def __init__(self,control):
+        self.control=control
+
+    def all(self,interface):
+        answer=self.control.ask("wifi")
+        return [Network(ssid) for ssid in answer.split("\t") if ssid]
+
+#Returns the value after a command line option or the default if it wasn't given
+def getOption(name,default):
+    if(name in sys.argv[1:-1]):
+        return sys.argv[sys.argv.index(name)+1]
+    return default
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,format='%(message)s')
+    main()
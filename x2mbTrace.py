@@ -0,0 +1,167 @@
+#
+# @file		        : x2mbTrace.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	This file records every Modbus transaction the tester makes so the
+#       time spent on the bus can be seen. Latencies are kept per register
+#       in log scaled histograms (the same idea as an HDR histogram) so
+#       percentiles can be printed without keeping every value. A summary
+#       table is printed at the end of each board and each batch.
+#
+# Usage:
+#   Called from the X2 PCB Tester Code
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import collections
+import math
+import threading
+
+#Transaction outcomes
+OK="ok"
+TIMEOUT="timeout" #Nothing (or too little) came back
+CRC="crc" #A response came back corrupted
+EXCEPTION="exception" #The slave answered with a Modbus exception
+BAD_FRAME="bad frame" #A valid frame that didn't match the request
+SKIPPED="skipped" #Not sent because the circuit breaker was open
+
+#Latency histogram with buckets that grow with the value so every bucket has the same relative error
+class LatencyHistogram:
+    lowest=0.0001 #Values at or below 100us share the first bucket
+    resolution=0.02 #Each bucket is 2% wider than the one before it
+
+    def __init__(self):
+        self.counts={} #{ bucket index : count }
+        self.count=0
+        self.total=0.0
+        self.max=0.0
+
+    def _index(self,value):
+        if(value<=self.lowest):
+            return 0
+        return int(math.log(value/self.lowest)/math.log(1+self.resolution))+1
+
+    #Upper edge of a bucket
+    def _value(self,index):
+        return self.lowest*(1+self.resolution)**index
+
+    def record(self,value):
+        index=self._index(value)
+        self.counts[index]=self.counts.get(index,0)+1
+        self.count+=1
+        self.total+=value
+        self.max=max(self.max,value)
+
+    #Value at a percentile (0-100) or None if nothing was recorded
+    def percentile(self,percent):
+        if(self.count==0):
+            return None
+        target=max(1,int(math.ceil(self.count*percent/100.0)))
+        seen=0
+        for index in sorted(self.counts):
+            seen+=self.counts[index]
+            if(seen>=target):
+                return min(self.max,self._value(index))
+        return self.max
+
+    def mean(self):
+        if(self.count==0):
+            return None
+        return self.total/self.count
+
+#Totals for one register on one slave
+class TraceEntry:
+    def __init__(self):
+        self.outcomes=collections.Counter() #{ outcome : count }
+        self.retries=0 #Attempts after the first
+        self.bytesSent=0
+        self.bytesReceived=0
+        self.busTime=0.0 #Seconds spent on every attempt, including timeouts
+        self.latency=LatencyHistogram() #Latency of attempts that got a response
+
+    def record(self,sent,received,latency,attempt,outcome):
+        self.outcomes[outcome]+=1
+        if(attempt>0):
+            self.retries+=1
+        self.bytesSent+=sent
+        self.bytesReceived+=received
+        self.busTime+=latency
+        if(outcome in (OK,CRC,EXCEPTION,BAD_FRAME)):
+            self.latency.record(latency)
+
+#Records Modbus transactions for the current board and for the whole batch
+class Tracer:
+    recentLength=1000 #Number of individual transactions kept for the current board
+
+    def __init__(self):
+        self.board={} #{ (Slave address, Key, Function code) : TraceEntry }
+        self.batch={}
+        self.recent=collections.deque(maxlen=self.recentLength) #Most recent transactions on the current board
+        self.boards=0 #Boards finished in this batch
+        self.lock=threading.Lock() #Boards tested at the same time share the tracer
+
+    #Records one attempt at a transaction
+    def record(self,key,address,functionCode,sent,received,latency,attempt,outcome):
+        with self.lock:
+            self.recent.append([key,address,functionCode,sent,received,latency,attempt,outcome])
+            for totals in (self.board,self.batch):
+                entry=totals.get((address,key,functionCode))
+                if(entry is None):
+                    entry=TraceEntry()
+                    totals[(address,key,functionCode)]=entry
+                entry.record(sent,received,latency,attempt,outcome)
+
+    #Returns the summary table for the board and starts a new one
+    def endBoard(self):
+        with self.lock:
+            table=summaryTable(self.board,"Modbus transactions for this board")
+            self.board={}
+            self.recent.clear()
+            self.boards+=1
+        return table
+
+    #Returns the summary table for every board in the batch
+    def endBatch(self):
+        return summaryTable(self.batch,"Modbus transactions for this batch (%d boards)" % self.boards)
+
+#Formats the totals as a table with the most bus time first
+def summaryTable(totals,title):
+    lines=[title,
+           "%-18s %5s %3s %6s %6s %6s %6s %5s %5s %5s %9s %9s %9s %9s" %
+           ("Key","Slave","FC","Tries","Retry","Tmout","CRC","Exc","Skip","Bad","p50 ms","p99 ms","Max ms","Bus s")]
+    busTime=0.0
+    for [address,key,functionCode] in sorted(totals,key=lambda k: -totals[k].busTime):
+        entry=totals[(address,key,functionCode)]
+        busTime+=entry.busTime
+        lines.append("%-18s %5d %3d %6d %6d %6d %6d %5d %5d %5d %9s %9s %9s %9.3f" %
+                     (key,address,functionCode,sum(entry.outcomes.values()),entry.retries,
+                      entry.outcomes[TIMEOUT],entry.outcomes[CRC],entry.outcomes[EXCEPTION],
+                      entry.outcomes[SKIPPED],entry.outcomes[BAD_FRAME],
+                      milliseconds(entry.latency.percentile(50)),milliseconds(entry.latency.percentile(99)),
+                      milliseconds(entry.latency.max if entry.latency.count else None),entry.busTime))
+    lines.append("Total time on the bus: %.3f seconds" % busTime)
+    return "\n".join(lines)
+
+#Formats a latency in seconds as milliseconds for the tables
+def milliseconds(value):
+    if(value is None):
+        return "-"
+    return "%.1f" % (value*1000)
@@ -0,0 +1,528 @@
+#
+# @file		        : x2mbTransport.py
+# Project		: X2 Tester
+# Author		: agent
+# Created on	        : Oct 18, 2026
+# Version		: 1.0
+#
+# Copyright (C) 2026 NexSens Technology, Inc.  All Rights Reserved.
+#
+# THIS SOURCE CODE FILE, DOCUMENTATION, AND INFORMATION THEREON ARE THE
+# PROPERTY OF NEXSENS TECHNOLOGY, INCORPORATED.  ALL UNAUTHORIZED USE
+# AND REPRODUCTION ARE STRICTLY PROHIBITED.
+#
+# --------------------------------------------------------------------------
+# Description:
+#	This file holds the Modbus RTU framing used to talk to the X2 and the
+#       passthrough T-Node. Every request in the register map is static, so
+#       the request frames are built once at startup and reused. Responses
+#       are validated with a table driven CRC16. A single bus object owns
+#       the serial port and queues requests for every slave on it.
+#
+# Usage:
+#   Called from the X2 PCB Tester Code
+#
+# Revision Log:
+# --------------------------------------------------------------------------
+# MM/DD/YY hh:mm Who	Description
+# --------------------------------------------------------------------------
+# 10/18/26 09:00 agent	Created
+# --------------------------------------------------------------------------
+#
+
+#Imports
+import os
+import select
+import serial
+import socket
+import struct
+import threading
+import time
+import x2mbRegisters as Reg
+
+#Modbus function codes used by the tester
+FC_READ_INPUT=4
+FC_WRITE_MULTIPLE=16
+FC_READ_WRITE=23 #Writes registers then reads registers in the same request
+FC_GATEWAY_TIMEOUT=65 #User defined code answered by x2mbGateway.py itself to set the client's timeout (ms)
+
+#Exception codes
+ILLEGAL_FUNCTION=1 #The slave doesn't have the function code
+ILLEGAL_DATA_VALUE=3 #The request is malformed
+SERVER_DEVICE_FAILURE=4 #The request couldn't be handled
+
+#Shortest request PDU (function code and fixed fields) for each function code expectedResponseLength knows
+minimumPduLength={3:5,4:5,5:5,6:5,15:6,16:6,23:10}
+
+#Precompiled headers for the fixed parts of a frame
+_readHeader=struct.Struct('>BBHH') #Address, function code, register, number of registers
+_writeHeader=struct.Struct('>BBHHB') #Address, function code, register, number of registers, byte count
+_writeReadHeader=struct.Struct('>BBHHHHB') #Address, function code, read register, # to read, write register, # to write, byte count
+_crcPacker=struct.Struct('<H') #CRC is sent low byte first
+mbapHeader=struct.Struct('>HHHB') #Modbus TCP: transaction ID, protocol ID, length, unit ID
+gatewayTimeoutPdu=struct.Struct('>BH') #FC_GATEWAY_TIMEOUT, timeout (ms)
+
+#Build the CRC16 (Modbus polynomial 0xA001) lookup table once at import
+def _buildCrcTable():
+    table=[]
+    for i in range(0,256):
+        crc=i
+        for k in range(0,8):
+            if(crc & 1):
+                crc=(crc>>1)^0xA001
+            else:
+                crc=crc>>1
+        table.append(crc)
+    return tuple(table)
+crcTable=_buildCrcTable()
+
+#Calculates the Modbus CRC16 of a bytes like object using the lookup table
+def calculateCrc(data):
+    crc=0xFFFF
+    for byte in data:
+        crc=(crc>>8)^crcTable[(crc^byte)&0xFF]
+    return crc
+
+#Adds the CRC to the end of a frame
+def appendCrc(frame):
+    return frame+_crcPacker.pack(calculateCrc(frame))
+
+#Checks the CRC on a full frame. Running the CRC over a frame that includes
+#its own CRC always gives 0 if nothing was corrupted
+def checkCrc(frame):
+    return len(frame)>=4 and calculateCrc(frame)==0
+
+#Dictionary of ready to send frames
+#     { (Slave address, Function code, Register #, # of Registers) : [(Request bytes), (Expected response length)] }
+#Read entries hold the full request. Write entries hold the header only since the values change per call.
+frameCache={}
+
+#Builds the frame cache for every mbReg entry on each of the given slave addresses
+#This is called once at startup so no frames need to be built during testing
+def buildFrameCache(slaveAddresses):
+    for address in slaveAddresses:
+        for register in Reg.mbReg.values():
+            if(register.placeholder):
+                continue
+            if("r" in register.access):
+                getReadFrame(address,register.reg,register.numReg)
+            if("w" in register.access):
+                getWriteHeader(address,register.reg,register.numReg)
+        getReadFrame(address,Reg.telemetryStart,Reg.telemetryNumReg) #Snapshot block read
+    return len(frameCache)
+
+#Returns the request and expected response length for a read. Built and cached on first use.
+def getReadFrame(address,reg,numReg,functionCode=FC_READ_INPUT):
+    cacheKey=(address,functionCode,reg,numReg)
+    entry=frameCache.get(cacheKey)
+    if(entry is None):
+        request=appendCrc(_readHeader.pack(address,functionCode,reg,numReg))
+        entry=[request,5+2*numReg] #Address, function code, byte count, data, CRC
+        frameCache[cacheKey]=entry
+    return entry
+
+#Returns the header, value packer and expected response length for a write. Built and cached on first use.
+def getWriteHeader(address,reg,numReg):
+    cacheKey=(address,FC_WRITE_MULTIPLE,reg,numReg)
+    entry=frameCache.get(cacheKey)
+    if(entry is None):
+        header=_writeHeader.pack(address,FC_WRITE_MULTIPLE,reg,numReg,2*numReg)
+        entry=[header,8,struct.Struct('>%dH' % numReg)] #Response echoes address, function code, register, number of registers, CRC
+        frameCache[cacheKey]=entry
+    return entry
+
+#Builds a complete write request from the cached header
+def getWriteFrame(address,reg,values):
+    [header,responseLength,packer]=getWriteHeader(address,reg,len(values))
+    return [appendCrc(header+packer.pack(*values)),responseLength]
+
+#Returns the header, value packer and expected response length for a write then read. Built and cached on first use.
+def getWriteReadHeader(address,writeReg,writeNumReg,readReg,readNumReg):
+    cacheKey=(address,FC_READ_WRITE,writeReg,writeNumReg,readReg,readNumReg)
+    entry=frameCache.get(cacheKey)
+    if(entry is None):
+        header=_writeReadHeader.pack(address,FC_READ_WRITE,readReg,readNumReg,writeReg,writeNumReg,2*writeNumReg)
+        entry=[header,5+2*readNumReg,struct.Struct('>%dH' % writeNumReg)] #Response is the same as a read of the read registers
+        frameCache[cacheKey]=entry
+    return entry
+
+#Builds a complete write then read request from the cached header
+#The slave does the write before the read, so the read sees the new values
+def getWriteReadFrame(address,writeReg,values,readReg,readNumReg):
+    [header,responseLength,packer]=getWriteReadHeader(address,writeReg,len(values),readReg,readNumReg)
+    return [appendCrc(header+packer.pack(*values)),responseLength]
+
+#Works out the expected response length for any request this transport can send
+#Returns None for function codes that aren't supported
+#The request must be at least minimumPduLength long after the slave address
+def expectedResponseLength(request):
+    functionCode=request[1]
+    if(functionCode in (3,4)): #Read holding/input registers
+        return 5+2*((request[4]<<8)|request[5])
+    if(functionCode in (5,6,15,16)): #Writes echo back a fixed length response
+        return 8
+    if(functionCode==23): #Read/write multiple registers
+        return 5+2*((request[4]<<8)|request[5])
+    return None
+
+#Minimum silent period between frames (3.5 character times, 11 bits per character)
+#Above 19200 baud the Modbus spec fixes it at 1.75ms
+def silentPeriod(baudrate):
+    if(baudrate>19200):
+        return 0.00175
+    return 3.5*11/float(baudrate)
+
+latestReadTimes={} #Last time a byte was seen on each port
+staleFrames={} #Number of late frames from earlier transactions discarded on each port
+maxFrameLength=256 #Largest Modbus RTU frame
+pollInterval=0.01 #Fixed port timeout (seconds). Reads wait this long before the request's deadline is checked again.
+
+#Raised when the slave answers with a Modbus exception response
+class SlaveException(ValueError):
+    def __init__(self,code):
+        ValueError.__init__(self,"The slave reported exception code %d" % code)
+        self.code=code
+
+#Raised when a response comes back corrupted
+class CrcError(ValueError):
+    pass
+
+#Sends a request and returns the validated response
+#Raises IOError if nothing (or too little) came back and ValueError if the response is corrupt or an exception
+#The timeout (seconds) is the deadline for the whole response. It defaults to the port's timeout.
+#The port's timeout is never changed here, since pyserial reconfigures the port (tcsetattr) every time
+#it is set. Open the port with a short timeout such as pollInterval so reads don't run past the deadline.
+#If a receive buffer (bytearray of maxFrameLength) is given the response is read into it and returned as a
+#memoryview of the buffer, which is only valid until the buffer is used for the next request
+def transact(serialPort,request,responseLength,timeout=None,buffer=None):
+    if(timeout is None):
+        timeout=serialPort.timeout
+    if(buffer is None):
+        buffer=bytearray(maxFrameLength)
+    view=memoryview(buffer)
+
+    waitForSilence(serialPort)
+    serialPort.write(request)
+    deadline=time.time()+timeout
+
+    #Read the minimum frame first so exception responses don't wait out the timeout
+    #Keep reading if a late frame from an earlier request arrives ahead of the response
+    length=_readUntil(serialPort,view[0:5],deadline)
+    complete=(length==5) #A short read means the deadline passed
+    while True:
+        [start,end]=findResponse(view[0:length],request,responseLength)
+        if(end or not complete):
+            break
+        needed=max(1,start+responseLength-length)
+        if(length+needed>maxFrameLength):
+            break
+        received=_readUntil(serialPort,view[length:length+needed],deadline)
+        length+=received
+        complete=(received==needed)
+    latestReadTimes[serialPort.port]=time.time()
+    if(end):
+        if(start):
+            countStaleFrames(serialPort.port,view[0:start])
+        response=view[start:end]
+    else:
+        response=view[start:length] or view[0:length] #Let checkResponse report what went wrong
+    return checkResponse(request,response,responseLength)
+
+#Reads into the view until it is full or the deadline has passed and returns the number of bytes read
+#The bytes go straight from the port's file descriptor into the view. pyserial's readinto reads into a
+#new bytes object and copies that into the view.
+def _readUntil(serialPort,view,deadline):
+    fileNumber=serialPort.fileno()
+    length=0
+    while(length<len(view)):
+        waitTime=deadline-time.time()
+        if(waitTime<=0 or not select.select([fileNumber],[],[],waitTime)[0]):
+            break
+        try:
+            received=os.readv(fileNumber,[view[length:]])
+        except BlockingIOError: #The port is opened without blocking, so another reader may have taken the bytes
+            continue
+        if(received==0):
+            raise serial.SerialException("The port was readable but returned no data (device disconnected?)")
+        length+=received
+    return length
+
+#Waits until the bus has been quiet for the t3.5 silent period so the slave sees a new frame
+#Anything that arrives while waiting is a late answer to an earlier request and is discarded
+def waitForSilence(serialPort):
+    silent=silentPeriod(serialPort.baudrate)
+    late=b''
+    while True:
+        waitTime=silent-(time.time()-latestReadTimes.get(serialPort.port,0))
+        if(waitTime>0):
+            time.sleep(waitTime)
+        waiting=serialPort.in_waiting
+        if(not waiting):
+            break
+        late=late+serialPort.read(waiting)
+        latestReadTimes[serialPort.port]=time.time() #The silent period starts over from the last byte
+    if(late):
+        countStaleFrames(serialPort.port,late)
+
+#Finds the response to a request in the bytes read so far
+#Returns [start, end] of the response or [start, None] if it isn't complete yet, where start is
+#the first byte that could still be the response. Bytes before start are late frames or noise.
+def findResponse(buffer,request,responseLength):
+    address=request[0]
+    functionCode=request[1]
+    for start in range(0,len(buffer)):
+        if(buffer[start]!=address):
+            continue
+        remaining=len(buffer)-start
+        if(remaining<2):
+            return [start,None]
+        if(buffer[start+1]==(functionCode|0x80)):
+            length=5 #Exception response
+        elif(buffer[start+1]==functionCode):
+            length=responseLength
+        else:
+            continue
+        if(remaining<length):
+            return [start,None]
+        if(checkCrc(buffer[start:start+length])):
+            return [start,start+length]
+    return [len(buffer),None]
+
+#Counts the complete frames (by CRC) in bytes that were discarded and adds them to the port's total
+def countStaleFrames(port,data):
+    count=0
+    start=0
+    while(start+4<=len(data)):
+        functionCode=data[start+1]
+        if(functionCode&0x80):
+            length=5
+        elif(functionCode in (3,4,23)):
+            length=5+data[start+2]
+        else:
+            length=8
+        if(start+length<=len(data) and checkCrc(data[start:start+length])):
+            count+=1
+            start+=length
+        else:
+            start+=1
+    staleFrames[port]=staleFrames.get(port,0)+count
+    return count
+
+#Validates a response against the request that was sent and returns it
+def checkResponse(request,response,responseLength):
+    if(len(response)==0):
+        raise IOError("No communication with the instrument (no answer)")
+    if(not checkCrc(response)):
+        raise CrcError("CRC check failed on response of %d bytes" % len(response))
+    if(response[0]!=request[0]):
+        raise ValueError("Response came from slave %d instead of %d" % (response[0],request[0]))
+    if(response[1]==(request[1]|0x80)):
+        raise SlaveException(response[2])
+    if(response[1]!=request[1] or len(response)!=responseLength):
+        raise ValueError("Unexpected response to function code %d" % request[1])
+    return response
+
+#Queues requests from different threads so they are sent in the order they arrived
+class BusQueue:
+    def __init__(self):
+        self._queue=threading.Condition()
+        self._nextTicket=0 #Ticket handed to the next request that arrives
+        self._serving=0 #Ticket of the request that may use the bus
+
+    #Wait for this request's turn on the bus
+    def acquire(self):
+        with self._queue:
+            ticket=self._nextTicket
+            self._nextTicket+=1
+            while(ticket!=self._serving):
+                self._queue.wait()
+
+    #Hand the bus to the next request in line
+    def release(self):
+        with self._queue:
+            self._serving+=1
+            self._queue.notify_all()
+
+#Owns the serial port and sends requests for any slave address on it
+class MbBus(BusQueue):
+    def __init__(self,port,baudrate=19200,parity='N',bytesize=8,stopbits=1,timeout=0.5):
+        BusQueue.__init__(self)
+        self.timeout=timeout #Used when a request doesn't give its own
+        self.serial=serial.Serial(port,baudrate=baudrate,parity=parity,bytesize=bytesize,stopbits=stopbits,timeout=pollInterval)
+        self._buffers=threading.local() #Receive buffer for each thread that uses the bus
+
+    #Sends a request with its own timeout and returns the validated response
+    #The response is a memoryview of this thread's receive buffer so it must be decoded before the
+    #thread sends another request
+    def transact(self,request,responseLength,timeout):
+        if(timeout is None):
+            timeout=self.timeout
+        buffer=getattr(self._buffers,"buffer",None)
+        if(buffer is None):
+            buffer=bytearray(maxFrameLength)
+            self._buffers.buffer=buffer
+        self.acquire()
+        try:
+            return transact(self.serial,request,responseLength,timeout,buffer)
+        finally:
+            self.release()
+
+    #Number of late frames that have been discarded since the port was opened
+    def staleFrameCount(self):
+        return staleFrames.get(self.serial.port,0)
+
+    def close(self):
+        self.serial.close()
+
+#Sends requests through the Modbus TCP gateway (x2mbGateway.py) instead of opening the port
+#The request frames are the same RTU frames used on the serial bus. They are converted to
+#Modbus TCP on the way out and the response is converted back so it is checked the same way.
+#Modbus TCP has no timeout field, so whenever the request's timeout changes it is first sent
+#to the gateway with the user defined function code FC_GATEWAY_TIMEOUT, which the gateway
+#answers itself. Other Modbus TCP clients never send it and get the gateway's default.
+class MbTcpBus(BusQueue):
+    queueAllowance=10 #Extra seconds to wait for requests from other clients ahead in the gateway's queue
+
+    def __init__(self,host='localhost',port=5020):
+        BusQueue.__init__(self)
+        self.socket=socket.create_connection((host,port))
+        self.socket.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+        self.transactionId=0
+        self.gatewayTimeout=None #Timeout (ms) the gateway is using for this connection (None=its default)
+
+    #Sends a request with its own timeout and returns the validated response
+    def transact(self,request,responseLength,timeout):
+        self.acquire()
+        try:
+            timeoutMs=max(1,min(0xFFFF,int(timeout*1000)))
+            if(timeoutMs!=self.gatewayTimeout):
+                timeoutPdu=gatewayTimeoutPdu.pack(FC_GATEWAY_TIMEOUT,timeoutMs)
+                if(self._exchange(request[0],timeoutPdu,timeout)[1]!=timeoutPdu):
+                    raise IOError("The Modbus TCP gateway didn't accept the timeout")
+                self.gatewayTimeout=timeoutMs
+            [unit,responsePdu]=self._exchange(request[0],request[1:-2],timeout) #Strip the slave address and CRC
+        finally:
+            self.release()
+
+        if(responsePdu[0]&0x80 and responsePdu[1] in (0x0A,0x0B)): #Gateway path unavailable or target did not respond
+            raise IOError("No communication with the instrument (no answer)")
+        return checkResponse(request,appendCrc(bytes([unit])+responsePdu),responseLength)
+
+    #Sends one PDU and returns [unit, response PDU] for its transaction
+    def _exchange(self,unit,pdu,timeout):
+        self.transactionId=(self.transactionId+1)&0xFFFF
+        self.socket.sendall(mbapHeader.pack(self.transactionId,0,len(pdu)+1,unit)+pdu)
+
+        self.socket.settimeout(timeout+self.queueAllowance)
+        while True:
+            try:
+                [transactionId,protocol,length,unit]=mbapHeader.unpack(self._receive(mbapHeader.size))
+                responsePdu=self._receive(length-1)
+            except socket.timeout:
+                raise IOError("No answer from the Modbus TCP gateway")
+            if(transactionId==self.transactionId):
+                return [unit,responsePdu] #Anything else is a late answer to an earlier request
+
+    #Reads exactly the number of bytes asked for
+    def _receive(self,count):
+        data=b''
+        while(len(data)<count):
+            chunk=self.socket.recv(count-len(data))
+            if(not chunk):
+                raise IOError("The Modbus TCP gateway closed the connection")
+            data+=chunk
+        return data
+
+    #Late frames are discarded by the gateway, which owns the serial port
+    def staleFrameCount(self):
+        return 0
+
+    def close(self):
+        self.socket.close()
+
+#A single slave on a bus. Each device keeps its own timeout so switching
+#between devices never needs the port reconfigured.
+class MbDevice:
+    def __init__(self,bus,address,timeout=0.5):
+        if(address<0 or address>255): #Extended range (0-255) so the X2 universal address (252) can be used
+            raise ValueError("The slave address must be 0-255, not %d" % address)
+        self.bus=bus
+        self.address=address
+        self.timeout=timeout
+        self.writeRead=None #Whether the slave has function code 23 (None until it has been tried)
+
+#Shadow copy of the X2's switch bank (0x7500-0x750B) so several switches can be changed in one write
+#and switches that are already in the requested state aren't written again
+#A state is None when it isn't known, which is the case after a power cycle or a failed write
+class SwitchBank:
+    def __init__(self,verifyInterval=0):
+        self.start=Reg.switchBankStart
+        self.state=[None]*Reg.switchBankNumReg
+        self.verifyInterval=verifyInterval #Read the bank back after this many changes (0=never)
+        self.changes=0 #Changes since the bank was last read back
+        self.skipped=0 #Switch writes that weren't sent because the switch was already in that state
+        self.drifted=0 #Switches found in a different state than the shadow when read back
+
+    #Forget every state. Called when the board's power is cycled.
+    def invalidate(self):
+        self.state=[None]*len(self.state)
+
+    #Forget one switch that the board may have changed by itself (the Wi-Fi after a magnet wake)
+    def forget(self,key):
+        self.state[Reg.mbReg[key].reg-self.start]=None
+
+    #Returns the known state of a switch or None if it isn't known
+    def value(self,key):
+        return self.state[Reg.mbReg[key].reg-self.start]
+
+    #True if the bank should be read back before the next change
+    def verifyDue(self):
+        return self.verifyInterval>0 and self.changes>=self.verifyInterval
+
+    #Replaces the shadow with the states read back from the board
+    def verify(self,values):
+        for index in range(0,len(values)):
+            if(self.state[index] is not None and self.state[index]!=values[index]):
+                self.drifted+=1
+        self.state=list(values)
+        self.changes=0
+
+    #Works out the writes needed to apply the changes { "Key" : value }
+    #Returns [[first register, [values]], ...] using as few writes as possible. Switches between two
+    #changes are rewritten with their current state, so a write is only split where a state isn't known.
+    def plan(self,changes):
+        self.changes+=1
+        desired=list(self.state)
+        changed=[]
+        for key in changes:
+            if(key not in Reg.switchBank):
+                raise ValueError("%s is not in the switch bank" % key)
+            index=Reg.mbReg[key].reg-self.start
+            if(self.state[index]==int(changes[key])):
+                self.skipped+=1 #Already in that state
+                continue
+            desired[index]=int(changes[key])
+            changed.append(index)
+        changed.sort()
+
+        writes=[]
+        first=None
+        for index in changed:
+            if(first is not None and None not in desired[last+1:index]):
+                last=index #Extend the current write over the known states in between
+            else:
+                if(first is not None):
+                    writes.append([self.start+first,desired[first:last+1]])
+                first=index
+                last=index
+        if(first is not None):
+            writes.append([self.start+first,desired[first:last+1]])
+        return writes
+
+    #Records the result of a write from the plan
+    def update(self,reg,values,success):
+        index=reg-self.start
+        if(success):
+            self.state[index:index+len(values)]=values
+        else:
+            self.state[index:index+len(values)]=[None]*len(values) #The board may or may not have switched